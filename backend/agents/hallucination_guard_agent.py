@@ -1,4 +1,3 @@
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import StructuredTool
@@ -7,19 +6,29 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
+from model_router import get_model_router
+from instrumentation import instrument_tools
+from context_packing import context_budget, fit_sections, truncate_to_tokens
+from reranker import get_reranker
 from typing import Dict, List
+from .run_context import AgentRunContext
+import asyncio
 
 
 class HallucinationGuardAgent:
     def __init__(self, vector_store=None):
-        self.llm = ChatOpenAI(
-            model=Config.LLM_MODEL,
-            temperature=0.0  # Zero temperature for deterministic fact-checking
-        )
+        router = get_model_router()
+        # Zero temperature for deterministic fact-checking
+        self.llm = router.agent_llm("hallucination_guard", temperature=0.0)
+        # Tool sub-calls run on their routed model
+        self.tool_llms = router.tool_llms(["verify_claim_against_source"], temperature=0.0)
         self.vector_store = vector_store
-        self._verification_log = []
-        self._flagged_claims = []
-        self.tools = self._build_tools()
+        self.reranker = get_reranker()
+        self._run = AgentRunContext("hallucination_guard_run", lambda: {
+            "verification_log": [],
+            "flagged_claims": []
+        })
+        self.tools = instrument_tools(self._build_tools())
         self.agent_executor = self._build_agent()
 
     def _build_tools(self) -> list:
@@ -37,56 +46,39 @@ class HallucinationGuardAgent:
             reason: str = Field(description="Why this claim is flagged (e.g., 'no source document mentions this threshold', 'regulation number does not match')")
             severity: str = Field(description="Severity of the issue: 'minor' (wording imprecise), 'major' (claim not in sources), 'critical' (contradicts sources)")
 
-        verification_log = self._verification_log
-        flagged = self._flagged_claims
-
-        def verify_claim_against_source(claim: str, source_text: str) -> str:
-            """Verify a specific claim against source document text. Returns whether the claim is SUPPORTED, PARTIALLY SUPPORTED, or UNSUPPORTED with explanation."""
-            prompt = f"""You are a strict fact-checker. Verify this claim against the source text.
-
-CLAIM: {claim}
-
-SOURCE TEXT:
-{source_text[:2000]}
-
-Rules:
-- SUPPORTED: The claim is directly stated or clearly implied by the source
-- PARTIALLY SUPPORTED: The source mentions related concepts but the specific claim has details not in the source
-- UNSUPPORTED: The source does not contain information supporting this claim
-- CONTRADICTED: The source explicitly contradicts this claim
+        run = self._run
 
-Return your verdict as: VERDICT: [SUPPORTED/PARTIALLY SUPPORTED/UNSUPPORTED/CONTRADICTED]
-Then explain your reasoning with specific quotes from the source."""
+        def record_verification(claim: str, response) -> str:
+            entry = self._log_entry(claim, response)
+            run.current["verification_log"].append(entry)
+            return entry["response"]
 
-            response = self.llm.invoke(prompt)
-            content = response.content if hasattr(response, 'content') else str(response)
-
-            verdict = "unknown"
-            for v in ["SUPPORTED", "PARTIALLY SUPPORTED", "UNSUPPORTED", "CONTRADICTED"]:
-                if v in content.upper():
-                    verdict = v
-                    break
+        def format_evidence(claim: str, docs) -> str:
+            if not docs:
+                return f"No evidence found in document store for: {claim}"
+            results = []
+            for i, doc in enumerate(self.reranker.pack(claim, docs, Config.RERANK_TOKEN_BUDGETS["hallucination_guard_tool"])):
+                source = doc.metadata.get("filename", "unknown")
+                results.append(f"[Evidence {i+1}] ({source}):\n{doc.page_content}")
+            return "\n\n".join(results)
 
-            verification_log.append({
-                "claim": claim[:200],
-                "verdict": verdict,
-                "details": content[:500]
-            })
+        def verify_claim_against_source(claim: str, source_text: str) -> str:
+            """Verify a specific claim against source document text. Returns whether the claim is SUPPORTED, PARTIALLY SUPPORTED, or UNSUPPORTED with explanation."""
+            return record_verification(claim, self.tool_llms["verify_claim_against_source"].invoke(self._verify_prompt(claim, source_text)))
 
-            return content
+        async def averify_claim_against_source(claim: str, source_text: str) -> str:
+            return record_verification(claim, await self.tool_llms["verify_claim_against_source"].ainvoke(self._verify_prompt(claim, source_text)))
 
         def search_for_evidence(claim: str) -> str:
             """Search the regulatory document store for evidence supporting or refuting a claim. Use this when the provided source text doesn't cover the claim."""
             if not self.vector_store:
                 return "No vector store available. Cannot search for additional evidence."
-            docs = self.vector_store.search(claim, k=3)
-            if not docs:
-                return f"No evidence found in document store for: {claim}"
-            results = []
-            for i, doc in enumerate(docs):
-                source = doc.metadata.get("filename", "unknown")
-                results.append(f"[Evidence {i+1}] ({source}):\n{doc.page_content[:500]}")
-            return "\n\n".join(results)
+            return format_evidence(claim, self.vector_store.search(claim, k=3))
+
+        async def asearch_for_evidence(claim: str) -> str:
+            if not self.vector_store:
+                return "No vector store available. Cannot search for additional evidence."
+            return await asyncio.to_thread(format_evidence, claim, await self.vector_store.asearch(claim, k=3))
 
         def flag_unsupported_claim(claim: str, reason: str, severity: str) -> str:
             """Flag a claim that cannot be verified or is contradicted by sources. This adds it to the verification report as a warning."""
@@ -95,30 +87,75 @@ Then explain your reasoning with specific quotes from the source."""
                 "reason": reason,
                 "severity": severity
             }
+            flagged = run.current["flagged_claims"]
             flagged.append(entry)
             return f"⚠️ FLAGGED ({severity}): \"{claim[:100]}...\"\nReason: {reason}\nTotal flagged claims: {len(flagged)}"
 
+        async def aflag_unsupported_claim(claim: str, reason: str, severity: str) -> str:
+            return flag_unsupported_claim(claim, reason, severity)
+
         return [
             StructuredTool.from_function(
                 func=verify_claim_against_source,
+                coroutine=averify_claim_against_source,
                 name="verify_claim_against_source",
                 description="Verify a specific claim against source document text. Returns SUPPORTED, PARTIALLY SUPPORTED, UNSUPPORTED, or CONTRADICTED.",
                 args_schema=VerifyClaimInput
             ),
             StructuredTool.from_function(
                 func=search_for_evidence,
+                coroutine=asearch_for_evidence,
                 name="search_for_evidence",
                 description="Search the document store for evidence supporting or refuting a claim. Use when source text doesn't cover the claim.",
                 args_schema=SearchEvidenceInput
             ),
             StructuredTool.from_function(
                 func=flag_unsupported_claim,
+                coroutine=aflag_unsupported_claim,
                 name="flag_unsupported_claim",
                 description="Flag an unsupported or contradicted claim with severity level. Adds it to the verification report as a warning.",
                 args_schema=FlagClaimInput
             ),
         ]
 
+    def _verify_prompt(self, claim: str, source_text: str) -> str:
+        model = self.tool_llms["verify_claim_against_source"].model_name
+        source_text = truncate_to_tokens(source_text, context_budget(model, Config.TOOL_CONTEXT_SHARE), model)
+        return f"""You are a strict fact-checker. Verify this claim against the source text.
+
+CLAIM: {claim}
+
+SOURCE TEXT:
+{source_text}
+
+Rules:
+- SUPPORTED: The claim is directly stated or clearly implied by the source
+- PARTIALLY SUPPORTED: The source mentions related concepts but the specific claim has details not in the source
+- UNSUPPORTED: The source does not contain information supporting this claim
+- CONTRADICTED: The source explicitly contradicts this claim
+
+Return your verdict as: VERDICT: [SUPPORTED/PARTIALLY SUPPORTED/UNSUPPORTED/CONTRADICTED]
+Then explain your reasoning with specific quotes from the source."""
+
+    @staticmethod
+    def _log_entry(claim: str, response) -> Dict:
+        """Parse a fact-check response into a verification log entry"""
+        content = response.content if hasattr(response, 'content') else str(response)
+
+        # Check longer verdicts first: "SUPPORTED" is a substring of the others
+        verdict = "unknown"
+        for v in ["PARTIALLY SUPPORTED", "UNSUPPORTED", "CONTRADICTED", "SUPPORTED"]:
+            if v in content.upper():
+                verdict = v
+                break
+
+        return {
+            "claim": claim[:200],
+            "verdict": verdict,
+            "details": content[:500],
+            "response": content
+        }
+
     def _build_agent(self) -> AgentExecutor:
         """Build the ReAct agent"""
         prompt = ChatPromptTemplate.from_messages([
@@ -147,35 +184,93 @@ Be thorough but practical — verify the most important claims first (regulation
             handle_parsing_errors=True
         )
 
-    def verify_facts(self, claims: str, source_documents: List, context: str) -> Dict:
-        """Run the hallucination guard agent"""
-        self._verification_log = []
-        self._flagged_claims = []
+    def _evidence_text(self, claim: str, docs: List) -> str:
+        return "\n\n".join(
+            f"({doc.metadata.get('filename', 'unknown')}): {doc.page_content}"
+            for doc in self.reranker.pack(claim, docs, Config.RERANK_TOKEN_BUDGETS["hallucination_guard_tool"])
+        )
+
+    def _reverify_result(self, claims: List[Dict], entries: List[Dict]) -> Dict:
+        still_flagged = [
+            claim for claim, entry in zip(claims, entries)
+            if entry["verdict"] in ("UNSUPPORTED", "CONTRADICTED", "unknown")
+        ]
+        return {
+            "verification_log": [{k: v for k, v in e.items() if k != "response"} for e in entries],
+            "flagged_claims": still_flagged,
+            "agent": "HallucinationGuardAgent",
+            "status": "completed"
+        }
+
+    def reverify_claims(self, claims: List[Dict], evidence: List[List]) -> Dict:
+        """
+        Re-check only the given flagged claims against freshly retrieved evidence.
+
+        One direct fact-check call per claim instead of a full agent run.
+        `evidence[i]` holds the documents retrieved for `claims[i]`.
+        """
+        entries = [
+            self._log_entry(claim["claim"], self.tool_llms["verify_claim_against_source"].invoke(self._verify_prompt(claim["claim"], self._evidence_text(claim["claim"], docs))))
+            for claim, docs in zip(claims, evidence)
+        ]
+        return self._reverify_result(claims, entries)
 
+    async def areverify_claims(self, claims: List[Dict], evidence: List[List]) -> Dict:
+        """Async variant of reverify_claims: claims are checked concurrently"""
+        evidence_texts = await asyncio.gather(*[
+            asyncio.to_thread(self._evidence_text, claim["claim"], docs) for claim, docs in zip(claims, evidence)
+        ])
+        responses = await asyncio.gather(*[
+            self.tool_llms["verify_claim_against_source"].ainvoke(self._verify_prompt(claim["claim"], text))
+            for claim, text in zip(claims, evidence_texts)
+        ])
+        entries = [self._log_entry(claim["claim"], response) for claim, response in zip(claims, responses)]
+        return self._reverify_result(claims, entries)
+
+    def _build_input(self, claims: str, source_documents: List, context: str) -> str:
+        sources = self.reranker.pack(claims, source_documents, Config.RERANK_TOKEN_BUDGETS["hallucination_guard"])
         sources_text = "\n\n".join([
-            f"Source {i+1} ({doc.metadata.get('filename', 'unknown')}):\n{doc.page_content[:600]}"
-            for i, doc in enumerate(source_documents[:5])
+            f"Source {i+1} ({doc.metadata.get('filename', 'unknown')}):\n{doc.page_content}"
+            for i, doc in enumerate(sources)
         ])
+        fitted = fit_sections(
+            {"claims": claims, "context": context},
+            {"claims": 8, "context": 3},
+            context_budget(self.llm.model_name),
+            self.llm.model_name
+        )
 
-        input_text = f"""Verify the following compliance analysis claims against the source documents.
+        return f"""Verify the following compliance analysis claims against the source documents.
 
 CLAIMS TO VERIFY:
-{claims[:4000]}
+{fitted["claims"]}
 
 SOURCE DOCUMENTS:
 {sources_text}
 
 ADDITIONAL CONTEXT:
-{context[:1500]}
+{fitted["context"]}
 
 Systematically verify each significant claim. Flag anything unsupported."""
 
-        result = self.agent_executor.invoke({"input": input_text})
-
+    def _build_result(self, result: Dict, run: Dict) -> Dict:
         return {
             "verification": result["output"],
-            "verification_log": self._verification_log,
-            "flagged_claims": self._flagged_claims,
+            "verification_log": [{k: v for k, v in e.items() if k != "response"} for e in run["verification_log"]],
+            "flagged_claims": run["flagged_claims"],
             "agent": "HallucinationGuardAgent",
             "status": "completed"
         }
+
+    def verify_facts(self, claims: str, source_documents: List, context: str) -> Dict:
+        """Run the hallucination guard agent"""
+        with self._run.bind() as run:
+            result = self.agent_executor.invoke({"input": self._build_input(claims, source_documents, context)})
+        return self._build_result(result, run)
+
+    async def averify_facts(self, claims: str, source_documents: List, context: str) -> Dict:
+        """Async variant of verify_facts"""
+        agent_input = await asyncio.to_thread(self._build_input, claims, source_documents, context)
+        with self._run.bind() as run:
+            result = await self.agent_executor.ainvoke({"input": agent_input})
+        return self._build_result(result, run)
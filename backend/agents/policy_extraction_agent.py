@@ -1,29 +1,40 @@
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
-from typing import Dict
+from model_router import get_model_router
+from instrumentation import instrument_tools
+from context_packing import context_budget, truncate_to_tokens
+from reranker import get_reranker
+from knowledge_base import format_threshold
+from typing import Dict, List, Optional
+from .run_context import AgentRunContext
 
 
 class PolicyExtractionAgent:
     def __init__(self, vector_store=None):
-        self.llm = ChatOpenAI(
-            model=Config.LLM_MODEL,
-            temperature=Config.TEMPERATURE
-        )
+        router = get_model_router()
+        self.llm = router.agent_llm("policy_extractor")
+        # Tool sub-calls run on their routed (usually smaller) model
+        self.tool_llms = router.tool_llms(["extract_regulations", "extract_thresholds"])
         self.vector_store = vector_store
-        self._extracted_data = {
+        # Facts precomputed at ingest, looked up by the retrieved chunks' IDs
+        self.knowledge_base = getattr(vector_store, "knowledge_base", None)
+        self.reranker = get_reranker()
+        self._run = AgentRunContext("policy_extraction_run", lambda: {
             "regulations": [],
             "policies": [],
             "thresholds": [],
-            "citations": []
-        }
-        self.tools = self._build_tools()
+            "citations": [],
+            "chunk_ids": [],
+            "context": ""
+        })
+        self.tools = instrument_tools(self._build_tools())
         self.agent_executor = self._build_agent()
 
     def _build_tools(self) -> list:
@@ -39,76 +50,144 @@ class PolicyExtractionAgent:
         class ExtractThresholdsInput(BaseModel):
             context: str = Field(description="Text to extract numerical thresholds and limits from")
 
-        extracted = self._extracted_data
+        run = self._run
 
-        def extract_regulations(context: str, regulation_type: str) -> str:
-            """Extract specific regulations of a given type from regulatory text. Identifies regulation names, section numbers, and requirements."""
-            prompt = f"""Extract all {regulation_type} regulations from this text. For each regulation found, provide:
+        def fit_tool_context(tool: str, context: str) -> str:
+            model = self.tool_llms[tool].model_name
+            return truncate_to_tokens(context, context_budget(model, Config.TOOL_CONTEXT_SHARE), model)
+
+        def regulations_prompt(context: str, regulation_type: str) -> str:
+            context = fit_tool_context("extract_regulations", context)
+            return f"""Extract all {regulation_type} regulations from this text. For each regulation found, provide:
 - Regulation name and number
 - Key requirements
 - Applicable entities/transactions
 
 Text:
-{context[:3000]}
+{context}
 
 Return a structured list of regulations found. If none found for this type, say "No {regulation_type} regulations found in this context." """
 
-            response = self.llm.invoke(prompt)
+        def thresholds_prompt(context: str) -> str:
+            context = fit_tool_context("extract_thresholds", context)
+            return f"""Extract ALL numerical thresholds, limits, and deadlines from this regulatory text:
+
+{context}
+
+For each threshold found, provide:
+- The specific number/amount
+- What it applies to
+- The regulation it comes from
+- Consequences of exceeding it
+
+If no thresholds found, say "No numerical thresholds found." """
+
+        def record_regulations(regulation_type: str, response) -> str:
             content = response.content if hasattr(response, 'content') else str(response)
-            extracted["regulations"].append({"type": regulation_type, "findings": content})
+            run.current["regulations"].append({"type": regulation_type, "findings": content})
             return content
 
-        def cross_reference_regulation(regulation_name: str) -> str:
-            """Search the vector store for additional context about a specific regulation. Use this to find related rules, amendments, or enforcement guidance."""
-            if not self.vector_store:
-                return f"No vector store available. Using extracted context only for {regulation_name}."
-            docs = self.vector_store.search(regulation_name, k=3)
+        def record_thresholds(response) -> str:
+            content = response.content if hasattr(response, 'content') else str(response)
+            run.current["thresholds"].append(content)
+            return content
+
+        def format_cross_reference(regulation_name: str, docs) -> str:
             if not docs:
                 return f"No additional documents found for {regulation_name}."
+            docs = self.reranker.pack(regulation_name, docs, Config.RERANK_TOKEN_BUDGETS["policy_extractor"])
             results = []
             for i, doc in enumerate(docs):
                 source = doc.metadata.get("filename", "unknown")
-                results.append(f"[{source}]: {doc.page_content[:400]}")
-            extracted["citations"].extend([
+                results.append(f"[{source}]: {doc.page_content}")
+            run.current["citations"].extend([
                 {"regulation": regulation_name, "source": doc.metadata.get("filename", "unknown")}
                 for doc in docs
             ])
             return f"Cross-reference results for {regulation_name}:\n\n" + "\n\n".join(results)
 
-        def extract_thresholds(context: str) -> str:
-            """Extract numerical thresholds, limits, and deadlines from regulatory text. Identifies dollar amounts, time limits, percentage requirements, etc."""
-            prompt = f"""Extract ALL numerical thresholds, limits, and deadlines from this regulatory text:
+        def retrieved(context: str) -> bool:
+            # Knowledge base facts describe the retrieved chunks, so they only
+            # answer for the context the agent was given, not text of its own
+            return " ".join(context.split()) == " ".join(run.current["context"].split())
 
-{context[:3000]}
+        def known_regulations(context: str, regulation_type: str) -> Optional[str]:
+            if not retrieved(context):
+                return None
+            facts = self._knowledge(run.current["chunk_ids"], regulation_type)
+            if facts is None:
+                return None
+            if not facts["regulations"]:
+                return f"No {regulation_type} regulations found in this context."
+            return self._format_regulations(facts["regulations"])
 
-For each threshold found, provide:
-- The specific number/amount
-- What it applies to
-- The regulation it comes from
-- Consequences of exceeding it
+        def known_thresholds(context: str) -> Optional[str]:
+            if not retrieved(context):
+                return None
+            facts = self._knowledge(run.current["chunk_ids"])
+            if facts is None:
+                return None
+            if not facts["thresholds"]:
+                return "No numerical thresholds found."
+            return "\n".join(self._format_thresholds(facts["thresholds"]))
 
-If no thresholds found, say "No numerical thresholds found." """
+        def extract_regulations(context: str, regulation_type: str) -> str:
+            """Extract specific regulations of a given type from regulatory text. Identifies regulation names, section numbers, and requirements."""
+            known = known_regulations(context, regulation_type)
+            if known is not None:
+                return record_regulations(regulation_type, known)
+            response = self.tool_llms["extract_regulations"].invoke(regulations_prompt(context, regulation_type))
+            return record_regulations(regulation_type, response)
 
-            response = self.llm.invoke(prompt)
-            content = response.content if hasattr(response, 'content') else str(response)
-            extracted["thresholds"].append(content)
-            return content
+        async def aextract_regulations(context: str, regulation_type: str) -> str:
+            known = known_regulations(context, regulation_type)
+            if known is not None:
+                return record_regulations(regulation_type, known)
+            response = await self.tool_llms["extract_regulations"].ainvoke(regulations_prompt(context, regulation_type))
+            return record_regulations(regulation_type, response)
+
+        def cross_reference_regulation(regulation_name: str) -> str:
+            """Search the vector store for additional context about a specific regulation. Use this to find related rules, amendments, or enforcement guidance."""
+            if not self.vector_store:
+                return f"No vector store available. Using extracted context only for {regulation_name}."
+            return format_cross_reference(regulation_name, self.vector_store.search(regulation_name, k=3))
+
+        async def across_reference_regulation(regulation_name: str) -> str:
+            if not self.vector_store:
+                return f"No vector store available. Using extracted context only for {regulation_name}."
+            return await asyncio.to_thread(format_cross_reference, regulation_name, await self.vector_store.asearch(regulation_name, k=3))
+
+        def extract_thresholds(context: str) -> str:
+            """Extract numerical thresholds, limits, and deadlines from regulatory text. Identifies dollar amounts, time limits, percentage requirements, etc."""
+            known = known_thresholds(context)
+            if known is not None:
+                return record_thresholds(known)
+            return record_thresholds(self.tool_llms["extract_thresholds"].invoke(thresholds_prompt(context)))
+
+        async def aextract_thresholds(context: str) -> str:
+            known = known_thresholds(context)
+            if known is not None:
+                return record_thresholds(known)
+            return record_thresholds(await self.tool_llms["extract_thresholds"].ainvoke(thresholds_prompt(context)))
 
         return [
             StructuredTool.from_function(
                 func=extract_regulations,
+                coroutine=aextract_regulations,
                 name="extract_regulations",
                 description="Extract specific regulations of a given type (AML, KYC, BSA, etc.) from regulatory text.",
                 args_schema=ExtractRegulationsInput
             ),
             StructuredTool.from_function(
                 func=cross_reference_regulation,
+                coroutine=across_reference_regulation,
                 name="cross_reference_regulation",
                 description="Search the document store for additional context about a specific regulation. Use to find related rules or enforcement guidance.",
                 args_schema=CrossReferenceInput
             ),
             StructuredTool.from_function(
                 func=extract_thresholds,
+                coroutine=aextract_thresholds,
                 name="extract_thresholds",
                 description="Extract numerical thresholds, dollar limits, time deadlines, and percentage requirements from regulatory text.",
                 args_schema=ExtractThresholdsInput
@@ -142,29 +221,115 @@ Always cite specific regulation sections and numbers when possible."""),
             handle_parsing_errors=True
         )
 
-    def extract_policies(self, context: str, query: str) -> Dict:
-        """Run the policy extraction agent"""
-        self._extracted_data = {
-            "regulations": [],
-            "policies": [],
-            "thresholds": [],
-            "citations": []
-        }
+    def _fit_context(self, context: str) -> str:
+        return truncate_to_tokens(context, context_budget(self.llm.model_name), self.llm.model_name)
 
-        input_text = f"""Extract all applicable policies and regulations from the following context.
+    def _build_input(self, context: str, query: str) -> str:
+        return f"""Extract all applicable policies and regulations from the following context.
 
 Compliance query: {query}
 
 Regulatory context:
-{context[:4000]}
+{context}
 
 Identify: applicable regulations (by type), specific policy requirements, numerical thresholds, and provide citations."""
 
-        result = self.agent_executor.invoke({"input": input_text})
+    def _knowledge(self, chunk_ids: Optional[List], regulation_type: Optional[str] = None) -> Optional[Dict]:
+        """Knowledge base facts for the retrieved chunks, or None unless every
+        chunk has been through ingest-time extraction"""
+        if self.knowledge_base is None or not chunk_ids or None in chunk_ids:
+            return None
+        facts = self.knowledge_base.lookup(chunk_ids, regulation_type)
+        return facts if facts["covered"] == len(set(chunk_ids)) else None
+
+    @staticmethod
+    def _format_regulations(regulations: List[Dict]) -> str:
+        return "\n".join(
+            f"- [{r['type']}] {r['name']}" + (f": {r['requirement']}" if r["requirement"] else "")
+            + f" (source: {r['source'] or 'unknown'})"
+            for r in regulations
+        )
+
+    @staticmethod
+    def _format_thresholds(thresholds: List[Dict]) -> List[str]:
+        lines = []
+        for t in thresholds:
+            details = "; ".join(part for part in (t["regulation"], f"source: {t['source'] or 'unknown'}") if part)
+            lines.append(f"- {format_threshold(t)}: {t['applies_to'] or 'unspecified'} ({details})")
+        return lines
+
+    def _knowledge_result(self, chunk_ids: Optional[List]) -> Optional[Dict]:
+        """Policy extraction answered from the knowledge base alone, when it
+        covers the retrieved context and holds regulations or thresholds for it"""
+        if not Config.POLICY_KNOWLEDGE_FAST_PATH:
+            return None
+        facts = self._knowledge(chunk_ids)
+        if facts is None or not (facts["regulations"] or facts["thresholds"]):
+            return None
 
+        sections = []
+        regulations_by_type: Dict[str, List[Dict]] = {}
+        for regulation in facts["regulations"]:
+            regulations_by_type.setdefault(regulation["type"], []).append(regulation)
+        if facts["regulations"]:
+            sections.append("Applicable regulations:\n" + self._format_regulations(facts["regulations"]))
+        thresholds = self._format_thresholds(facts["thresholds"])
+        if thresholds:
+            sections.append("Numerical thresholds:\n" + "\n".join(thresholds))
+        if facts["citations"]:
+            sections.append("Citations: " + ", ".join(
+                f"{c['regulation']} ({c['source'] or 'unknown'})" for c in facts["citations"]
+            ))
+
+        extracted_data = {
+            "regulations": [
+                {"type": rtype, "findings": self._format_regulations(regulations)}
+                for rtype, regulations in regulations_by_type.items()
+            ],
+            "policies": [],
+            "thresholds": thresholds,
+            "citations": facts["citations"],
+        }
+        return self._build_result({"output": "\n\n".join(sections)}, extracted_data, mode="knowledge_base")
+
+    def _build_result(self, result: Dict, extracted_data: Dict, mode: str = "agent") -> Dict:
+        extracted_data.pop("chunk_ids", None)
+        extracted_data.pop("context", None)
         return {
             "extracted_policies": result["output"],
-            "structured_data": self._extracted_data,
+            "structured_data": extracted_data,
+            "extraction_mode": mode,
             "agent": "PolicyExtractionAgent",
             "status": "completed"
         }
+
+    def extract_policies(self, context: str, query: str, chunk_ids: Optional[List] = None) -> Dict:
+        """Run the policy extraction agent
+
+        When `chunk_ids` (the retrieved chunks behind `context`) are all in
+        the knowledge base, the result is a lookup instead of an agent run;
+        otherwise the agent's extraction tools still answer from the
+        knowledge base when called on the retrieved context and it covers
+        every chunk; any other text goes to the tool LLM.
+        """
+        known = self._knowledge_result(chunk_ids)
+        if known is not None:
+            return known
+        context = self._fit_context(context)
+        with self._run.bind() as extracted:
+            extracted["chunk_ids"] = list(chunk_ids or [])
+            extracted["context"] = context
+            result = self.agent_executor.invoke({"input": self._build_input(context, query)})
+        return self._build_result(result, extracted)
+
+    async def aextract_policies(self, context: str, query: str, chunk_ids: Optional[List] = None) -> Dict:
+        """Async variant of extract_policies"""
+        known = await asyncio.to_thread(self._knowledge_result, chunk_ids)
+        if known is not None:
+            return known
+        context = await asyncio.to_thread(self._fit_context, context)
+        with self._run.bind() as extracted:
+            extracted["chunk_ids"] = list(chunk_ids or [])
+            extracted["context"] = context
+            result = await self.agent_executor.ainvoke({"input": self._build_input(context, query)})
+        return self._build_result(result, extracted)
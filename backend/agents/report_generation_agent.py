@@ -1,24 +1,31 @@
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
+import asyncio
+import re
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
-from typing import Dict
+from model_router import get_model_router
+from instrumentation import instrument_tools
+from context_packing import context_budget, fit_sections, truncate_to_tokens
+from reranker import get_reranker
+from typing import Callable, Dict, Iterator, Optional
+from .run_context import AgentRunContext
 
 
 class ReportGenerationAgent:
     def __init__(self, vector_store=None):
-        self.llm = ChatOpenAI(
-            model=Config.LLM_MODEL,
-            temperature=Config.TEMPERATURE
-        )
+        router = get_model_router()
+        self.llm = router.agent_llm("report_generator")
+        # Tool sub-calls run on their routed (usually smaller) model
+        self.tool_llms = router.tool_llms(["compile_section"])
         self.vector_store = vector_store
-        self._report_sections = {}
-        self.tools = self._build_tools()
+        self.reranker = get_reranker()
+        self._run = AgentRunContext("report_generation_run", dict)
+        self.tools = instrument_tools(self._build_tools())
         self.agent_executor = self._build_agent()
 
     def _build_tools(self) -> list:
@@ -34,10 +41,11 @@ class ReportGenerationAgent:
         class AssembleReportInput(BaseModel):
             include_sections: str = Field(description="Comma-separated list of section names to include in the final report")
 
-        sections = self._report_sections
+        run = self._run
 
-        def compile_section(section_name: str, content: str) -> str:
-            """Compile a specific section of the compliance report. The agent should call this for each section, providing the relevant data. The tool formats it professionally."""
+        def section_prompt(section_name: str, content: str) -> str:
+            model = self.tool_llms["compile_section"].model_name
+            content = truncate_to_tokens(content, context_budget(model, Config.TOOL_CONTEXT_SHARE), model)
             section_prompts = {
                 "executive_summary": "Write a concise executive summary (3-5 sentences) of the compliance analysis findings.",
                 "applicable_regulations": "List all applicable regulations with their full citations and key requirements.",
@@ -52,31 +60,48 @@ class ReportGenerationAgent:
                 f"Write the {section_name} section of a compliance report."
             )
 
-            prompt = f"""{instruction}
+            return f"""{instruction}
 
 Based on this data:
-{content[:2500]}
+{content}
 
 Format professionally with clear structure. Use bullet points where appropriate."""
 
-            response = self.llm.invoke(prompt)
+        def record_section(section_name: str, response) -> str:
             formatted = response.content if hasattr(response, 'content') else str(response)
-            sections[section_name] = formatted
+            run.current[section_name] = formatted
+            on_event = run.current.get("_on_event")
+            if on_event:
+                on_event("section", {"section": section_name, "content": formatted})
             return f"Section '{section_name}' compiled successfully.\n\nPreview:\n{formatted[:500]}..."
 
-        def lookup_citation(regulation_reference: str) -> str:
-            """Look up the full citation and context for a regulation reference. Use this to ensure citations in the report are accurate and complete."""
-            if not self.vector_store:
-                return f"Using standard citation format for {regulation_reference}."
-            docs = self.vector_store.search(regulation_reference, k=2)
+        def format_citation(regulation_reference: str, docs) -> str:
             if not docs:
                 return f"No additional citation context found for {regulation_reference}. Use standard citation format."
             results = []
-            for doc in docs:
+            for doc in self.reranker.pack(regulation_reference, docs, Config.RERANK_TOKEN_BUDGETS["report_generator"]):
                 source = doc.metadata.get("filename", "unknown")
-                results.append(f"[{source}]: {doc.page_content[:300]}")
+                results.append(f"[{source}]: {doc.page_content}")
             return f"Citation context for {regulation_reference}:\n" + "\n".join(results)
 
+        def compile_section(section_name: str, content: str) -> str:
+            """Compile a specific section of the compliance report. The agent should call this for each section, providing the relevant data. The tool formats it professionally."""
+            return record_section(section_name, self.tool_llms["compile_section"].invoke(section_prompt(section_name, content)))
+
+        async def acompile_section(section_name: str, content: str) -> str:
+            return record_section(section_name, await self.tool_llms["compile_section"].ainvoke(section_prompt(section_name, content)))
+
+        def lookup_citation(regulation_reference: str) -> str:
+            """Look up the full citation and context for a regulation reference. Use this to ensure citations in the report are accurate and complete."""
+            if not self.vector_store:
+                return f"Using standard citation format for {regulation_reference}."
+            return format_citation(regulation_reference, self.vector_store.search(regulation_reference, k=2))
+
+        async def alookup_citation(regulation_reference: str) -> str:
+            if not self.vector_store:
+                return f"Using standard citation format for {regulation_reference}."
+            return await asyncio.to_thread(format_citation, regulation_reference, await self.vector_store.asearch(regulation_reference, k=2))
+
         def assemble_report(include_sections: str) -> str:
             """Assemble the final report from compiled sections. Call this after all individual sections have been compiled."""
             section_names = [s.strip() for s in include_sections.split(",")]
@@ -90,6 +115,7 @@ Format professionally with clear structure. Use bullet points where appropriate.
                 "recommendations": "Recommendations"
             }
 
+            sections = run.current
             report_parts = ["# Compliance Analysis Report\n"]
             for name in section_names:
                 if name in sections:
@@ -102,21 +128,27 @@ Format professionally with clear structure. Use bullet points where appropriate.
             sections["_final"] = final
             return final
 
+        async def aassemble_report(include_sections: str) -> str:
+            return assemble_report(include_sections)
+
         return [
             StructuredTool.from_function(
                 func=compile_section,
+                coroutine=acompile_section,
                 name="compile_section",
                 description="Compile a specific section of the compliance report. Call this for each section (executive_summary, applicable_regulations, risk_assessment, violations, remediation_steps, recommendations).",
                 args_schema=CompileSectionInput
             ),
             StructuredTool.from_function(
                 func=lookup_citation,
+                coroutine=alookup_citation,
                 name="lookup_citation",
                 description="Look up the full citation and context for a regulation reference to ensure accuracy.",
                 args_schema=LookupCitationInput
             ),
             StructuredTool.from_function(
                 func=assemble_report,
+                coroutine=aassemble_report,
                 name="assemble_report",
                 description="Assemble the final report from all compiled sections. Call this LAST after all sections are compiled.",
                 args_schema=AssembleReportInput
@@ -156,32 +188,68 @@ Compile sections in this order: applicable_regulations → violations → risk_a
             handle_parsing_errors=True
         )
 
-    def generate_report(self, query: str, extracted_policies: str, risk_assessment: str, verification: str) -> Dict:
-        """Run the report generation agent"""
-        self._report_sections = {}
-
-        input_text = f"""Generate a comprehensive compliance report based on these findings:
+    def _build_input(self, query: str, extracted_policies: str, risk_assessment: str, verification: str) -> str:
+        fitted = fit_sections(
+            {"policies": extracted_policies, "risk": risk_assessment, "verification": verification},
+            {"policies": 3, "risk": 2, "verification": 2},
+            context_budget(self.llm.model_name),
+            self.llm.model_name
+        )
+        return f"""Generate a comprehensive compliance report based on these findings:
 
 ORIGINAL QUERY: {query}
 
 EXTRACTED POLICIES AND REGULATIONS:
-{extracted_policies[:3000]}
+{fitted["policies"]}
 
 RISK ASSESSMENT:
-{risk_assessment[:2000]}
+{fitted["risk"]}
 
 VERIFICATION RESULTS:
-{verification[:2000]}
+{fitted["verification"]}
 
 Build the report section by section, look up citations for accuracy, then assemble the final report."""
 
-        result = self.agent_executor.invoke({"input": input_text})
-
-        final_report = self._report_sections.get("_final", result["output"])
+    def _build_result(self, result: Dict, sections: Dict) -> Dict:
+        final_report = sections.get("_final", result["output"])
 
         return {
             "final_report": final_report,
-            "sections": {k: v for k, v in self._report_sections.items() if not k.startswith("_")},
+            "sections": {k: v for k, v in sections.items() if not k.startswith("_")},
             "agent": "ReportGenerationAgent",
             "status": "completed"
         }
+
+    @staticmethod
+    def _report_chunks(report: str) -> Iterator[str]:
+        """The report split before each section heading; the chunks join back to the report"""
+        return (chunk for chunk in re.split(r"(?=\n## )", report) if chunk)
+
+    def _finish(self, result: Dict, sections: Dict, on_event: Optional[Callable[[str, Dict], None]]) -> Dict:
+        built = self._build_result(result, sections)
+        if on_event:
+            for chunk in self._report_chunks(built["final_report"]):
+                on_event("token", {"content": chunk})
+        return built
+
+    def generate_report(self, query: str, extracted_policies: str, risk_assessment: str, verification: str,
+                        on_event: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """Run the report generation agent
+
+        `on_event(event, data)` receives a "section" event as each section is
+        compiled and, once the report is final, "token" events whose contents
+        join to exactly `final_report`.
+        """
+        with self._run.bind() as sections:
+            sections["_on_event"] = on_event
+            result = self.agent_executor.invoke({"input": self._build_input(query, extracted_policies, risk_assessment, verification)})
+        return self._finish(result, sections, on_event)
+
+    async def agenerate_report(self, query: str, extracted_policies: str, risk_assessment: str, verification: str,
+                               on_event: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """Async variant of generate_report"""
+        agent_input = await asyncio.to_thread(self._build_input, query, extracted_policies, risk_assessment, verification)
+        with self._run.bind() as sections:
+            sections["_on_event"] = on_event
+            result = await self.agent_executor.ainvoke({"input": agent_input})
+        return self._finish(result, sections, on_event)
@@ -1,25 +1,31 @@
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from vector_store import VectorStoreManager
 from config import Config
+from model_router import get_model_router
+from instrumentation import instrument_tools
+from reranker import get_reranker
+from context_packing import fit_sections
 from typing import List, Dict
+from .run_context import AgentRunContext
 
 
 class RetrieverAgent:
     def __init__(self, vector_store: VectorStoreManager):
-        self.llm = ChatOpenAI(
-            model=Config.LLM_MODEL,
-            temperature=Config.TEMPERATURE
-        )
+        router = get_model_router()
+        self.llm = router.agent_llm("retriever")
+        # Tool sub-calls run on their routed (usually smaller) model
+        self.tool_llms = router.tool_llms(["refine_query"])
         self.vector_store = vector_store
-        self._collected_docs = []
-        self.tools = self._build_tools()
+        self.reranker = get_reranker()
+        self._run = AgentRunContext("retriever_run", lambda: {"collected_docs": []})
+        self.tools = instrument_tools(self._build_tools())
         self.agent_executor = self._build_agent()
 
     def _build_tools(self) -> list:
@@ -39,61 +45,90 @@ class RetrieverAgent:
             context: str = Field(description="Additional context to refine the query (e.g., transaction type, region, regulation area)")
 
         vs = self.vector_store
-        collected = self._collected_docs
+        run = self._run
+        reranker = self.reranker
 
-        def vector_search(query: str, k: int = 5) -> str:
-            """Search the regulatory document vector store for relevant documents. Returns document content and metadata."""
-            docs = vs.search(query, k=k)
+        def format_docs(query: str, docs) -> str:
             if not docs:
                 return "No documents found for this query."
-            collected.extend(docs)
+            run.current["collected_docs"].extend(docs)
             results = []
-            for i, doc in enumerate(docs):
+            for i, doc in enumerate(reranker.pack(query, docs, Config.RERANK_TOKEN_BUDGETS["retriever_tool"])):
                 source = doc.metadata.get("filename", "unknown")
-                results.append(f"[Doc {i+1}] (source: {source})\n{doc.page_content[:600]}")
+                results.append(f"[Doc {i+1}] (source: {source})\n{doc.page_content}")
             return "\n\n---\n\n".join(results)
 
-        def scored_search(query: str, k: int = 5, min_score: float = 0.0) -> str:
-            """Search with similarity scores to assess retrieval quality. Use this to judge if results are relevant enough or if you need to refine your query."""
-            results = vs.search_with_score(query, k=k)
+        def format_scored(results, min_score: float) -> str:
             if not results:
                 return "No documents found."
-            output = []
-            for i, (doc, score) in enumerate(results):
-                if score >= min_score:
-                    collected.append(doc)
-                    source = doc.metadata.get("filename", "unknown")
-                    output.append(f"[Doc {i+1}] Score: {score:.4f} (source: {source})\n{doc.page_content[:600]}")
-            if not output:
+            kept = [(i, doc, score) for i, (doc, score) in enumerate(results) if score >= min_score]
+            if not kept:
                 return f"No documents met the minimum score threshold of {min_score}."
+            # Results stay in score order; the tool budget is shared across them,
+            # short chunks handing their unused share to longer ones
+            contents = fit_sections(
+                {i: doc.page_content for i, doc, _ in kept},
+                {},
+                Config.RERANK_TOKEN_BUDGETS["retriever_tool"],
+                self.llm.model_name
+            )
+            output = []
+            for i, doc, score in kept:
+                run.current["collected_docs"].append(doc)
+                source = doc.metadata.get("filename", "unknown")
+                output.append(f"[Doc {i+1}] Score: {score:.4f} (source: {source})\n{contents[i]}")
             return "\n\n---\n\n".join(output)
 
-        def refine_query(original_query: str, context: str) -> str:
-            """Rewrite a search query to improve retrieval results. Use this when initial search results are poor or too broad."""
-            refine_prompt = f"""Rewrite this regulatory document search query to be more specific and effective.
+        def refine_prompt(original_query: str, context: str) -> str:
+            return f"""Rewrite this regulatory document search query to be more specific and effective.
 
 Original query: {original_query}
 Additional context: {context}
 
 Return ONLY the refined query string, nothing else."""
-            response = self.llm.invoke(refine_prompt)
+
+        def vector_search(query: str, k: int = 5) -> str:
+            """Search the regulatory document store for relevant documents. Returns document content and metadata."""
+            return format_docs(query, vs.hybrid_search(query, k=k))
+
+        async def avector_search(query: str, k: int = 5) -> str:
+            # Reranking and token counting are CPU-bound; keep them off the event loop
+            return await asyncio.to_thread(format_docs, query, await vs.ahybrid_search(query, k=k))
+
+        def scored_search(query: str, k: int = 5, min_score: float = 0.0) -> str:
+            """Search with similarity scores to assess retrieval quality. Use this to judge if results are relevant enough or if you need to refine your query."""
+            return format_scored(vs.search_with_score(query, k=k), min_score)
+
+        async def ascored_search(query: str, k: int = 5, min_score: float = 0.0) -> str:
+            return await asyncio.to_thread(format_scored, await vs.asearch_with_score(query, k=k), min_score)
+
+        def refine_query(original_query: str, context: str) -> str:
+            """Rewrite a search query to improve retrieval results. Use this when initial search results are poor or too broad."""
+            response = self.tool_llms["refine_query"].invoke(refine_prompt(original_query, context))
+            return f"Refined query: {response.content}"
+
+        async def arefine_query(original_query: str, context: str) -> str:
+            response = await self.tool_llms["refine_query"].ainvoke(refine_prompt(original_query, context))
             return f"Refined query: {response.content}"
 
         return [
             StructuredTool.from_function(
                 func=vector_search,
+                coroutine=avector_search,
                 name="vector_search",
-                description="Search the regulatory document vector store for relevant documents. Returns document content and metadata.",
+                description="Search the regulatory documents by meaning and exact terms (citations like '31 CFR 1010.311', amounts like '$10,000'). Returns document content and metadata.",
                 args_schema=SearchInput
             ),
             StructuredTool.from_function(
                 func=scored_search,
+                coroutine=ascored_search,
                 name="scored_search",
                 description="Search with similarity scores to assess retrieval quality. Use this to judge if results are relevant enough or if you need to refine your query.",
                 args_schema=ScoredSearchInput
             ),
             StructuredTool.from_function(
                 func=refine_query,
+                coroutine=arefine_query,
                 name="refine_query",
                 description="Rewrite a search query to improve retrieval results. Use when initial results are poor or too broad.",
                 args_schema=RefineQueryInput
@@ -108,7 +143,7 @@ Return ONLY the refined query string, nothing else."""
 Your job is to find the most relevant regulatory documents for a given compliance query.
 
 Strategy:
-1. Start with a scored_search to assess the quality of results for the initial query
+1. Start with vector_search, which matches exact citations and amounts as well as meaning; use scored_search when you need to judge result quality
 2. If scores are low or results seem off-topic, use refine_query to improve the search
 3. Try different search angles — search for the regulation name, the transaction type, the jurisdiction
 4. Aim to collect 3-7 highly relevant documents covering different aspects of the query
@@ -128,11 +163,8 @@ Always explain your reasoning about why results are or aren't relevant."""),
             handle_parsing_errors=True
         )
 
-    def retrieve_relevant_context(self, query: str, transaction_data: Dict = None) -> Dict:
-        """Run the retriever agent to find relevant documents"""
-        self._collected_docs = []
-
-        # Build input with transaction context
+    def _build_input(self, query: str, transaction_data: Dict = None) -> str:
+        """Build agent input with transaction context"""
         input_text = f"Find regulatory documents relevant to this compliance query: {query}"
         if transaction_data:
             tx_details = []
@@ -146,21 +178,94 @@ Always explain your reasoning about why results are or aren't relevant."""),
                 tx_details.append(f"Customer type: {transaction_data['customer_type']}")
             if tx_details:
                 input_text += f"\n\nTransaction context:\n" + "\n".join(tx_details)
+        return input_text
+
+    @staticmethod
+    def _fast_path_queries(query: str, transaction_data: Dict = None) -> List[str]:
+        """Deterministic search angles: the query itself plus one per transaction field"""
+        tx = transaction_data or {}
+        queries = [query]
+        if tx.get("type"):
+            queries.append(f"{tx['type']} transaction reporting requirements: {query}")
+        if tx.get("region"):
+            queries.append(f"{tx['region']} regulations for {tx.get('type') or 'financial'} transactions")
+        if tx.get("customer_type"):
+            queries.append(f"{tx['customer_type']} customer due diligence requirements")
+        return queries
 
-        self.agent_executor.invoke({"input": input_text})
+    @staticmethod
+    def _relevance(distance: float) -> float:
+        """Cosine similarity from Chroma's squared L2 distance (embeddings are unit length)"""
+        return 1.0 - distance / 2.0
 
-        # Deduplicate collected docs by content
+    def _fast_path_docs(self, scored: List[List[tuple]]) -> List:
+        """Documents from a multi-query search that clear the relevance threshold"""
+        return [
+            doc
+            for results in scored
+            for doc, distance in results
+            if self._relevance(distance) >= Config.RETRIEVER_MIN_RELEVANCE
+        ]
+
+    def _fast_path_sufficient(self, docs: List) -> bool:
+        unique = {doc.metadata.get("chunk_id") or hash(doc.page_content[:200]) for doc in docs}
+        return len(unique) >= Config.RETRIEVER_FAST_PATH_MIN_DOCS
+
+    def _build_result(self, query: str, collected_docs: List, mode: str = "agent") -> Dict:
+        """Deduplicate collected docs by chunk ID, rerank them and pack the best
+        into the downstream context budget"""
         seen = set()
         unique_docs = []
-        for doc in self._collected_docs:
-            content_hash = hash(doc.page_content[:200])
+        for doc in collected_docs:
+            # Chunks carry content-hash IDs since ingestion became idempotent;
+            # fall back to a content prefix for chunks ingested before that
+            content_hash = doc.metadata.get("chunk_id") or hash(doc.page_content[:200])
             if content_hash not in seen:
                 seen.add(content_hash)
                 unique_docs.append(doc)
+        unique_docs = self.reranker.pack(query, unique_docs, Config.RERANK_TOKEN_BUDGETS["retriever_context"])
 
         return {
             "query": query,
             "relevant_documents": unique_docs,
             "document_count": len(unique_docs),
-            "context": "\n\n".join([doc.page_content for doc in unique_docs])
+            "context": "\n\n".join([doc.page_content for doc in unique_docs]),
+            # Chunks stored before content-hash IDs only carry their Chroma ID
+            "chunk_ids": [doc.metadata.get("chunk_id") or doc.id for doc in unique_docs],
+            "retrieval_mode": mode
         }
+
+    def retrieve_relevant_context(self, query: str, transaction_data: Dict = None) -> Dict:
+        """Find relevant documents, trying the deterministic fast path first
+
+        The fast path runs one batched scored search over the query and the
+        transaction fields. The ReAct agent only runs when too few results
+        clear RETRIEVER_MIN_RELEVANCE; the fast-path hits are kept as a seed.
+        """
+        fast_docs = []
+        if Config.RETRIEVER_FAST_PATH:
+            scored = self.vector_store.search_many_with_score(
+                self._fast_path_queries(query, transaction_data), k=Config.RETRIEVER_FAST_PATH_K
+            )
+            fast_docs = self._fast_path_docs(scored)
+            if self._fast_path_sufficient(fast_docs):
+                return self._build_result(query, fast_docs, mode="fast_path")
+        with self._run.bind() as run:
+            run["collected_docs"].extend(fast_docs)
+            self.agent_executor.invoke({"input": self._build_input(query, transaction_data)})
+        return self._build_result(query, run["collected_docs"])
+
+    async def aretrieve_relevant_context(self, query: str, transaction_data: Dict = None) -> Dict:
+        """Async variant of retrieve_relevant_context"""
+        fast_docs = []
+        if Config.RETRIEVER_FAST_PATH:
+            scored = await self.vector_store.asearch_many_with_score(
+                self._fast_path_queries(query, transaction_data), k=Config.RETRIEVER_FAST_PATH_K
+            )
+            fast_docs = self._fast_path_docs(scored)
+            if self._fast_path_sufficient(fast_docs):
+                return await asyncio.to_thread(self._build_result, query, fast_docs, "fast_path")
+        with self._run.bind() as run:
+            run["collected_docs"].extend(fast_docs)
+            await self.agent_executor.ainvoke({"input": self._build_input(query, transaction_data)})
+        return await asyncio.to_thread(self._build_result, query, run["collected_docs"])
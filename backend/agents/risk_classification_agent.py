@@ -1,26 +1,42 @@
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
 import json
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
+from model_router import get_model_router
+from instrumentation import instrument_tools
+from context_packing import context_budget, fit_sections
+from reranker import get_reranker
+from threshold_engine import STRUCTURING_BAND, format_money, get_threshold_engine
+from risk_scoring import RiskScorer
 from typing import Dict, List, Optional
+from .run_context import AgentRunContext
+
+# Regulation areas screened for violation patterns in parallel with extraction
+PRESCREEN_REGULATION_AREAS = ["AML", "reporting"]
 
 
 class RiskClassificationAgent:
     def __init__(self, vector_store=None):
-        self.llm = ChatOpenAI(
-            model=Config.LLM_MODEL,
-            temperature=Config.TEMPERATURE
-        )
+        router = get_model_router()
+        self.llm = router.agent_llm("risk_classifier")
+        # Tool sub-calls run on their routed (usually smaller) model
+        self.tool_llms = router.tool_llms(["check_threshold_violation"])
         self.vector_store = vector_store
-        self._risk_factors = []
-        self._violations = []
-        self.tools = self._build_tools()
+        self.reranker = get_reranker()
+        # Numeric threshold checks are rule-based; the LLM only sees ones it can't parse
+        self.threshold_engine = get_threshold_engine()
+        self.risk_scorer = RiskScorer(self.threshold_engine)
+        self._run = AgentRunContext("risk_classification_run", lambda: {
+            "risk_factors": [],
+            "violations": []
+        })
+        self.tools = instrument_tools(self._build_tools())
         self.agent_executor = self._build_agent()
 
     def _build_tools(self) -> list:
@@ -40,12 +56,10 @@ class RiskClassificationAgent:
             transaction_type: str = Field(description="Type of transaction (e.g., 'wire_transfer', 'cash_deposit', 'account_opening')")
             regulation_area: str = Field(description="Area of regulation (e.g., 'AML', 'KYC', 'sanctions', 'reporting')")
 
-        risk_factors = self._risk_factors
-        violations = self._violations
+        run = self._run
 
-        def check_threshold_violation(amount: str, regulation: str, threshold: str) -> str:
-            """Check if a transaction amount violates a specific regulatory threshold. Compares the amount against known limits and determines if reporting or other action is required."""
-            prompt = f"""Analyze this threshold check:
+        def threshold_prompt(amount: str, regulation: str, threshold: str) -> str:
+            return f"""Analyze this threshold check:
 
 Transaction amount: {amount}
 Regulation: {regulation}
@@ -59,11 +73,11 @@ Determine:
 
 Provide a clear assessment."""
 
-            response = self.llm.invoke(prompt)
+        def record_threshold_check(amount: str, regulation: str, threshold: str, response) -> str:
             content = response.content if hasattr(response, 'content') else str(response)
 
             if "yes" in content.lower()[:100] or "exceed" in content.lower()[:200]:
-                violations.append({
+                run.current["violations"].append({
                     "type": "threshold_violation",
                     "regulation": regulation,
                     "amount": amount,
@@ -73,6 +87,52 @@ Provide a clear assessment."""
 
             return content
 
+        def rule_based_check(amount: str, regulation: str, threshold: str) -> Optional[str]:
+            result = self.threshold_engine.check(amount, threshold, regulation)
+            if result is None:
+                return None
+            exceeds = result["status"] == "exceeds"
+            structuring = result["status"] == "just_below"
+            if structuring:
+                action = "Review for structuring"
+                concern = f"YES - amount is within {STRUCTURING_BAND:.0%} below the threshold"
+            else:
+                action = result["action"] or ("Follow the regulation's reporting requirement" if exceeds else "None")
+                concern = "NO"
+            content = (
+                f"Rule-based threshold check for {regulation}:\n"
+                f"Transaction amount: {format_money(result['amount'], result['currency'])}\n"
+                f"Regulatory threshold: {format_money(result['threshold'], result['currency'])}\n"
+                f"1. Exceeds threshold: {'YES' if exceeds else 'NO'}\n"
+                f"2. {'Reporting trigger, not by itself a violation' if exceeds else 'No reporting trigger'}\n"
+                f"3. Required action: {action}\n"
+                f"4. Structuring concern: {concern}"
+            )
+            if exceeds:
+                run.current["violations"].append({
+                    "type": "threshold_violation",
+                    "regulation": regulation,
+                    "amount": amount,
+                    "threshold": threshold,
+                    "details": content[:300]
+                })
+            return content
+
+        def check_threshold_violation(amount: str, regulation: str, threshold: str) -> str:
+            """Check if a transaction amount violates a specific regulatory threshold. Compares the amount against known limits and determines if reporting or other action is required."""
+            checked = rule_based_check(amount, regulation, threshold)
+            if checked is not None:
+                return checked
+            response = self.tool_llms["check_threshold_violation"].invoke(threshold_prompt(amount, regulation, threshold))
+            return record_threshold_check(amount, regulation, threshold, response)
+
+        async def acheck_threshold_violation(amount: str, regulation: str, threshold: str) -> str:
+            checked = rule_based_check(amount, regulation, threshold)
+            if checked is not None:
+                return checked
+            response = await self.tool_llms["check_threshold_violation"].ainvoke(threshold_prompt(amount, regulation, threshold))
+            return record_threshold_check(amount, regulation, threshold, response)
+
         def assess_risk_factor(factor_name: str, severity: str, evidence: str) -> str:
             """Record and assess a specific risk factor. Use this to build up a comprehensive risk profile by evaluating individual risk dimensions one at a time."""
             factor = {
@@ -80,6 +140,7 @@ Provide a clear assessment."""
                 "severity": severity,
                 "evidence": evidence
             }
+            risk_factors = run.current["risk_factors"]
             risk_factors.append(factor)
 
             severity_scores = {"low": 10, "medium": 30, "high": 60, "critical": 90}
@@ -87,40 +148,61 @@ Provide a clear assessment."""
 
             return f"Risk factor recorded: {factor_name} (severity: {severity}, score contribution: {score}/100)\nEvidence: {evidence}\nTotal risk factors assessed so far: {len(risk_factors)}"
 
+        async def aassess_risk_factor(factor_name: str, severity: str, evidence: str) -> str:
+            return assess_risk_factor(factor_name, severity, evidence)
+
         def search_violation_patterns(transaction_type: str, regulation_area: str) -> str:
             """Search the regulatory knowledge base for known violation patterns and enforcement actions related to a transaction type and regulation area."""
             if not self.vector_store:
                 return f"Using built-in knowledge for {regulation_area} violations related to {transaction_type}."
-            query = f"{regulation_area} violations enforcement {transaction_type}"
-            docs = self.vector_store.search(query, k=3)
-            if not docs:
-                return f"No specific violation patterns found for {transaction_type} under {regulation_area}."
-            results = []
-            for doc in docs:
-                results.append(doc.page_content[:400])
-            return f"Violation patterns for {transaction_type} ({regulation_area}):\n\n" + "\n\n---\n\n".join(results)
+            query = self._violation_query(transaction_type, regulation_area)
+            return self._format_violation_patterns(transaction_type, regulation_area, self.vector_store.search(query, k=3))
+
+        async def asearch_violation_patterns(transaction_type: str, regulation_area: str) -> str:
+            if not self.vector_store:
+                return f"Using built-in knowledge for {regulation_area} violations related to {transaction_type}."
+            query = self._violation_query(transaction_type, regulation_area)
+            return await asyncio.to_thread(
+                self._format_violation_patterns, transaction_type, regulation_area, await self.vector_store.asearch(query, k=3)
+            )
 
         return [
             StructuredTool.from_function(
                 func=check_threshold_violation,
+                coroutine=acheck_threshold_violation,
                 name="check_threshold_violation",
                 description="Check if a transaction amount violates a specific regulatory threshold. Use for comparing amounts against known limits.",
                 args_schema=ThresholdCheckInput
             ),
             StructuredTool.from_function(
                 func=assess_risk_factor,
+                coroutine=aassess_risk_factor,
                 name="assess_risk_factor",
                 description="Record and assess a specific risk factor. Call this for each risk dimension (e.g., transaction size, geography, customer type, product type).",
                 args_schema=RiskFactorInput
             ),
             StructuredTool.from_function(
                 func=search_violation_patterns,
+                coroutine=asearch_violation_patterns,
                 name="search_violation_patterns",
                 description="Search for known violation patterns and enforcement actions related to a transaction type and regulation area.",
                 args_schema=ViolationSearchInput
             ),
         ]
 
+    @staticmethod
+    def _violation_query(transaction_type: str, regulation_area: str) -> str:
+        return f"{regulation_area} violations enforcement {transaction_type}"
+
+    def _format_violation_patterns(self, transaction_type: str, regulation_area: str, docs) -> str:
+        if not docs:
+            return f"No specific violation patterns found for {transaction_type} under {regulation_area}."
+        query = self._violation_query(transaction_type, regulation_area)
+        results = []
+        for doc in self.reranker.pack(query, docs, Config.RERANK_TOKEN_BUDGETS["risk_classifier"]):
+            results.append(doc.page_content)
+        return f"Violation patterns for {transaction_type} ({regulation_area}):\n\n" + "\n\n---\n\n".join(results)
+
     def _build_agent(self) -> AgentExecutor:
         """Build the ReAct agent"""
         prompt = ChatPromptTemplate.from_messages([
@@ -129,7 +211,7 @@ Provide a clear assessment."""
 Your job is to systematically assess compliance risk by evaluating individual risk factors and checking for violations.
 
 Strategy:
-1. First, search for known violation patterns relevant to the transaction type
+1. First, search for known violation patterns relevant to the transaction type (skip areas already covered by the pre-screening results)
 2. Check specific regulatory thresholds (e.g., $10,000 CTR threshold, $3,000 funds transfer rule)
 3. Assess each risk factor individually using assess_risk_factor:
    - Transaction size risk
@@ -157,11 +239,74 @@ Risk levels:
             handle_parsing_errors=True
         )
 
-    def classify_risk(self, context: str, policies: str, transaction_data: Dict = None) -> Dict:
-        """Run the risk classification agent"""
-        self._risk_factors = []
-        self._violations = []
+    def screen_thresholds(self, transaction_data: Dict = None) -> List[Dict]:
+        """Deterministically screen the transaction amount against the threshold table"""
+        return self.threshold_engine.screen(transaction_data or {})
+
+    def score_batch(self, columns: Dict) -> Dict:
+        """Vectorized LOW/MEDIUM/HIGH/CRITICAL tiers for a columnar batch of transactions,
+        without the agent; `borderline` marks the ones worth a full classify_risk"""
+        return self.risk_scorer.score(columns)
+
+    def _prescreen_patterns(self, transaction_type: str, areas: List[str], results: List[List]) -> List[str]:
+        return [
+            self._format_violation_patterns(transaction_type, area, docs)
+            for area, docs in zip(areas, results)
+        ]
+
+    def _prescreen_areas(self, transaction_data: Dict) -> List[str]:
+        areas = list(PRESCREEN_REGULATION_AREAS)
+        if transaction_data.get("customer_type"):
+            areas.append("KYC")
+        if transaction_data.get("region"):
+            areas.append("sanctions")
+        return areas
+
+    def _build_prescreen(self, transaction_type: str, patterns: List[str], flags: List[Dict]) -> Dict:
+        lines = []
+        for flag in flags:
+            amount = format_money(flag["amount"], flag["currency"])
+            threshold = format_money(flag["threshold"], flag["currency"])
+            if flag["status"] == "exceeds":
+                lines.append(f"- {flag['regulation']}: amount {amount} meets/exceeds {threshold} -> {flag['action']}")
+            else:
+                lines.append(f"- {flag['regulation']}: amount {amount} is just below {threshold} -> {flag['action']}")
+        summary = "Threshold screen:\n" + ("\n".join(lines) if lines else "- No known thresholds triggered.")
+        if patterns:
+            summary += "\n\n" + "\n\n".join(patterns)
+        return {
+            "prescreen": summary,
+            "threshold_flags": flags,
+            "transaction_type": transaction_type,
+        }
 
+    def prescreen(self, transaction_data: Dict = None) -> Dict:
+        """Run the threshold screen and violation pattern lookups that don't depend on extracted policies"""
+        transaction_data = transaction_data or {}
+        transaction_type = transaction_data.get("type") or "general"
+        patterns = []
+        if self.vector_store:
+            areas = self._prescreen_areas(transaction_data)
+            results = self.vector_store.search_many(
+                [self._violation_query(transaction_type, area) for area in areas], k=3
+            )
+            patterns = self._prescreen_patterns(transaction_type, areas, results)
+        return self._build_prescreen(transaction_type, patterns, self.screen_thresholds(transaction_data))
+
+    async def aprescreen(self, transaction_data: Dict = None) -> Dict:
+        """Async variant of prescreen"""
+        transaction_data = transaction_data or {}
+        transaction_type = transaction_data.get("type") or "general"
+        patterns = []
+        if self.vector_store:
+            areas = self._prescreen_areas(transaction_data)
+            results = await self.vector_store.asearch_many(
+                [self._violation_query(transaction_type, area) for area in areas], k=3
+            )
+            patterns = await asyncio.to_thread(self._prescreen_patterns, transaction_type, areas, results)
+        return self._build_prescreen(transaction_type, patterns, self.screen_thresholds(transaction_data))
+
+    def _build_input(self, context: str, policies: str, transaction_data: Dict = None, prescreen: str = "") -> str:
         transaction_info = ""
         if transaction_data:
             parts = []
@@ -175,25 +320,52 @@ Risk levels:
                 parts.append(f"Customer: {transaction_data['customer_type']}")
             transaction_info = "\n".join(parts)
 
-        input_text = f"""Assess the compliance risk for this transaction:
+        # Same 2:3:2 weighting the prompt used before, measured in tokens
+        fitted = fit_sections(
+            {"prescreen": prescreen, "policies": policies, "context": context},
+            {"prescreen": 2, "policies": 3, "context": 2},
+            context_budget(self.llm.model_name),
+            self.llm.model_name
+        )
+
+        prescreen_section = ""
+        if prescreen:
+            prescreen_section = f"""
+Pre-screening Results (violation patterns already searched, thresholds already screened):
+{fitted["prescreen"]}
+"""
+
+        return f"""Assess the compliance risk for this transaction:
 
 Transaction Details:
 {transaction_info if transaction_info else "No specific transaction data provided."}
 
 Applicable Policies and Regulations:
-{policies[:3000]}
+{fitted["policies"]}
 
 Regulatory Context:
-{context[:2000]}
-
+{fitted["context"]}
+{prescreen_section}
 Systematically evaluate all risk factors, check relevant thresholds, and provide a final risk classification."""
 
-        result = self.agent_executor.invoke({"input": input_text})
-
+    def _build_result(self, result: Dict, run: Dict) -> Dict:
         return {
             "risk_assessment": result["output"],
-            "risk_factors": self._risk_factors,
-            "violations": self._violations,
+            "risk_factors": run["risk_factors"],
+            "violations": run["violations"],
             "agent": "RiskClassificationAgent",
             "status": "completed"
         }
+
+    def classify_risk(self, context: str, policies: str, transaction_data: Dict = None, prescreen: str = "") -> Dict:
+        """Run the risk classification agent"""
+        with self._run.bind() as run:
+            result = self.agent_executor.invoke({"input": self._build_input(context, policies, transaction_data, prescreen)})
+        return self._build_result(result, run)
+
+    async def aclassify_risk(self, context: str, policies: str, transaction_data: Dict = None, prescreen: str = "") -> Dict:
+        """Async variant of classify_risk"""
+        agent_input = await asyncio.to_thread(self._build_input, context, policies, transaction_data, prescreen)
+        with self._run.bind() as run:
+            result = await self.agent_executor.ainvoke({"input": agent_input})
+        return self._build_result(result, run)
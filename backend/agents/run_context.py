@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict
+
+
+class AgentRunContext:
+    """Per-invocation scratch state for an agent's tools.
+
+    Tools and AgentExecutors are built once per agent; instead of closing over
+    instance attributes, tools read their scratch state from this context. Each
+    call to `bind()` installs a fresh state in a ContextVar, so concurrent runs
+    in threads or asyncio tasks never see each other's results.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Dict]):
+        self._var: ContextVar = ContextVar(name)
+        self._factory = factory
+
+    @contextmanager
+    def bind(self):
+        """Install fresh scratch state for the duration of one agent run"""
+        state = self._factory()
+        token = self._var.set(state)
+        try:
+            yield state
+        finally:
+            self._var.reset(token)
+
+    @property
+    def current(self) -> Dict:
+        """Scratch state of the run the caller belongs to"""
+        try:
+            return self._var.get()
+        except LookupError:
+            raise RuntimeError(
+                f"{self._var.name}: agent tools invoked outside of an agent run"
+            ) from None
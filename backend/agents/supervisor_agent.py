@@ -1,20 +1,48 @@
-from langgraph.graph import StateGraph, END
-from typing import Dict, List, TypedDict, Annotated
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableLambda
+from typing import Callable, Dict, List, TypedDict, Annotated
 import operator
+import re
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from document_tags import jurisdiction_filter
+from instrumentation import record_retry, timed
 
 class AgentState(TypedDict):
     query: str
     transaction_data: Dict
     retrieved_context: str
+    retrieved_chunk_ids: List
     extracted_policies: str
+    risk_prescreen: str
     risk_assessment: str
+    source_documents: List
     verification: str
+    flagged_claims: List[Dict]
     final_report: str
     agent_history: Annotated[List[str], operator.add]
     current_agent: str
     retry_count: int
     max_retries: int
     hallucination_detected: bool
+    route: str
+    search_filter: Dict
+
+# Intermediate results streamed to clients as soon as the producing node finishes
+STREAMED_FIELDS = ["risk_prescreen", "extracted_policies", "risk_assessment", "verification"]
+
+# Keywords in the verification output that indicate unsupported/unverified claims
+HALLUCINATION_KEYWORDS = [
+    "unsupported",
+    "not supported",
+    "no evidence",
+    "cannot verify",
+    "unverified",
+    "confidence: 0",
+    "confidence: low"
+]
 
 class SupervisorAgent:
     def __init__(self, retriever, policy_extractor, risk_classifier, hallucination_guard, report_generator):
@@ -26,133 +54,314 @@ class SupervisorAgent:
         self.workflow = self._build_workflow()
 
     def _build_workflow(self) -> StateGraph:
-        """Build LangGraph workflow orchestrating 5 specialized agents"""
+        """Build LangGraph workflow orchestrating 5 specialized agents
+
+        Stages that only depend on the request run in parallel with retrieval:
+        the risk pre-screen (violation pattern lookups + threshold screen) and
+        the hallucination guard's source document search. Nodes return partial
+        state updates, so parallel branches merge without conflicting writes.
+        """
         workflow = StateGraph(AgentState)
 
-        # Add nodes for each agent
-        workflow.add_node("retriever", self._retriever_node)
-        workflow.add_node("policy_extractor", self._policy_extractor_node)
-        workflow.add_node("risk_classifier", self._risk_classifier_node)
-        workflow.add_node("hallucination_guard", self._hallucination_guard_node)
-        workflow.add_node("report_generator", self._report_generator_node)
+        # Add nodes for each agent (sync and async implementations, so the
+        # compiled graph supports both invoke and ainvoke)
+        workflow.add_node("retriever", self._node("retriever", self._retriever_node, self._aretriever_node))
+        workflow.add_node("policy_extractor", self._node("policy_extractor", self._policy_extractor_node, self._apolicy_extractor_node))
+        workflow.add_node("risk_prescreen", self._node("risk_prescreen", self._risk_prescreen_node, self._arisk_prescreen_node))
+        workflow.add_node("risk_classifier", self._node("risk_classifier", self._risk_classifier_node, self._arisk_classifier_node))
+        workflow.add_node("guard_sources", self._node("guard_sources", self._guard_sources_node, self._aguard_sources_node))
+        workflow.add_node("hallucination_guard", self._node("hallucination_guard", self._hallucination_guard_node, self._ahallucination_guard_node))
+        workflow.add_node("targeted_retry", self._node("targeted_retry", self._targeted_retry_node, self._atargeted_retry_node))
+        workflow.add_node("report_generator", self._node("report_generator", self._report_generator_node, self._areport_generator_node))
 
-        # Set entry point
-        workflow.set_entry_point("retriever")
+        # Fan out: independent stages start together
+        workflow.add_edge(START, "retriever")
+        workflow.add_edge(START, "risk_prescreen")
+        workflow.add_edge(START, "guard_sources")
+        workflow.add_edge("guard_sources", END)
 
-        # Add edges: sequential pipeline
+        # Dependent stages stay in order; risk classification joins extraction and pre-screen
         workflow.add_edge("retriever", "policy_extractor")
-        workflow.add_edge("policy_extractor", "risk_classifier")
+        workflow.add_edge(["policy_extractor", "risk_prescreen"], "risk_classifier")
         workflow.add_edge("risk_classifier", "hallucination_guard")
 
-        # CONDITIONAL EDGE: Route based on hallucination detection
-        workflow.add_conditional_edges(
-            "hallucination_guard",
-            self._should_retry_or_finalize,
-            {
-                "retry": "retriever",           # Loop back to retriever
-                "finalize": "report_generator"   # Continue to report generation
-            }
-        )
+        # CONDITIONAL EDGES: Route based on hallucination detection. A retry
+        # only re-checks the flagged claims; everything else is reused.
+        for node in ("hallucination_guard", "targeted_retry"):
+            workflow.add_conditional_edges(
+                node,
+                self._should_retry_or_finalize,
+                {
+                    "retry": "targeted_retry",       # Re-verify flagged claims with extra evidence
+                    "finalize": "report_generator"   # Continue to report generation
+                }
+            )
 
         workflow.add_edge("report_generator", END)
 
         return workflow.compile()
 
-    def _retriever_node(self, state: AgentState) -> AgentState:
+    def _node(self, name: str, func: Callable, afunc: Callable) -> RunnableLambda:
+        """Wrap a node so it is timed as a stage and every search it makes is
+        scoped to the request's metadata filter"""
+        vs = self.retriever.vector_store
+
+        def run(state: AgentState) -> Dict:
+            with timed("stage", name), vs.scoped_filter(state.get("search_filter")):
+                return func(state)
+
+        async def arun(state: AgentState) -> Dict:
+            with timed("stage", name), vs.scoped_filter(state.get("search_filter")):
+                return await afunc(state)
+
+        return RunnableLambda(run, afunc=arun)
+
+    def _retriever_node(self, state: AgentState) -> Dict:
         """Retriever agent node"""
         result = self.retriever.retrieve_relevant_context(
             state["query"],
             state.get("transaction_data", {})
         )
-        state["retrieved_context"] = result["context"]
-        state["agent_history"].append("RetrieverAgent: Retrieved relevant documents")
-        return state
+        return {
+            "retrieved_context": result["context"],
+            "retrieved_chunk_ids": result["chunk_ids"],
+            "agent_history": [f"RetrieverAgent: Retrieved relevant documents ({result['retrieval_mode']})"]
+        }
 
-    def _policy_extractor_node(self, state: AgentState) -> AgentState:
+    async def _aretriever_node(self, state: AgentState) -> Dict:
+        """Async retriever agent node"""
+        result = await self.retriever.aretrieve_relevant_context(
+            state["query"],
+            state.get("transaction_data", {})
+        )
+        return {
+            "retrieved_context": result["context"],
+            "retrieved_chunk_ids": result["chunk_ids"],
+            "agent_history": [f"RetrieverAgent: Retrieved relevant documents ({result['retrieval_mode']})"]
+        }
+
+    def _policy_extractor_node(self, state: AgentState) -> Dict:
         """Policy extraction agent node"""
         result = self.policy_extractor.extract_policies(
             state["retrieved_context"],
-            state["query"]
+            state["query"],
+            chunk_ids=state.get("retrieved_chunk_ids")
+        )
+        return {
+            "extracted_policies": result["extracted_policies"],
+            "agent_history": [f"PolicyExtractionAgent: Extracted policies ({result['extraction_mode']})"]
+        }
+
+    async def _apolicy_extractor_node(self, state: AgentState) -> Dict:
+        """Async policy extraction agent node"""
+        result = await self.policy_extractor.aextract_policies(
+            state["retrieved_context"],
+            state["query"],
+            chunk_ids=state.get("retrieved_chunk_ids")
         )
-        state["extracted_policies"] = result["extracted_policies"]
-        state["agent_history"].append("PolicyExtractionAgent: Extracted policies")
-        return state
+        return {
+            "extracted_policies": result["extracted_policies"],
+            "agent_history": [f"PolicyExtractionAgent: Extracted policies ({result['extraction_mode']})"]
+        }
+
+    def _risk_prescreen_node(self, state: AgentState) -> Dict:
+        """Risk pre-screen node: only depends on the transaction, so it runs alongside retrieval"""
+        result = self.risk_classifier.prescreen(state.get("transaction_data", {}))
+        return {
+            "risk_prescreen": result["prescreen"],
+            "agent_history": ["RiskClassificationAgent: Pre-screened thresholds and violation patterns"]
+        }
+
+    async def _arisk_prescreen_node(self, state: AgentState) -> Dict:
+        """Async risk pre-screen node"""
+        result = await self.risk_classifier.aprescreen(state.get("transaction_data", {}))
+        return {
+            "risk_prescreen": result["prescreen"],
+            "agent_history": ["RiskClassificationAgent: Pre-screened thresholds and violation patterns"]
+        }
 
-    def _risk_classifier_node(self, state: AgentState) -> AgentState:
+    def _risk_classifier_node(self, state: AgentState) -> Dict:
         """Risk classification agent node"""
         result = self.risk_classifier.classify_risk(
             state["retrieved_context"],
             state["extracted_policies"],
-            state.get("transaction_data", {})
+            state.get("transaction_data", {}),
+            state.get("risk_prescreen", "")
         )
-        state["risk_assessment"] = result["risk_assessment"]
-        state["agent_history"].append("RiskClassificationAgent: Classified risk")
-        return state
+        return {
+            "risk_assessment": result["risk_assessment"],
+            "agent_history": ["RiskClassificationAgent: Classified risk"]
+        }
 
-    def _hallucination_guard_node(self, state: AgentState) -> AgentState:
-        """Hallucination guard agent node"""
-        # Get source documents from retriever
-        docs = self.retriever.vector_store.search(state["query"], k=5)
+    async def _arisk_classifier_node(self, state: AgentState) -> Dict:
+        """Async risk classification agent node"""
+        result = await self.risk_classifier.aclassify_risk(
+            state["retrieved_context"],
+            state["extracted_policies"],
+            state.get("transaction_data", {}),
+            state.get("risk_prescreen", "")
+        )
+        return {
+            "risk_assessment": result["risk_assessment"],
+            "agent_history": ["RiskClassificationAgent: Classified risk"]
+        }
+
+    def _guard_sources_node(self, state: AgentState) -> Dict:
+        """Fetch the hallucination guard's source documents alongside retrieval"""
+        return {"source_documents": self.retriever.vector_store.search(state["query"], k=5)}
 
+    async def _aguard_sources_node(self, state: AgentState) -> Dict:
+        """Async guard source document node"""
+        return {"source_documents": await self.retriever.vector_store.asearch(state["query"], k=5)}
+
+    def _hallucination_guard_node(self, state: AgentState) -> Dict:
+        """Hallucination guard agent node"""
         claims = f"{state['extracted_policies']}\n{state['risk_assessment']}"
         result = self.hallucination_guard.verify_facts(
             claims,
-            docs,
+            state.get("source_documents") or [],
             state["retrieved_context"]
         )
-        state["verification"] = result["verification"]
-        state["agent_history"].append("HallucinationGuardAgent: Verified facts")
-        return state
+        return self._verification_update(state, result["verification"], result["flagged_claims"])
 
-    def _should_retry_or_finalize(self, state: AgentState) -> str:
+    async def _ahallucination_guard_node(self, state: AgentState) -> Dict:
+        """Async hallucination guard agent node"""
+        claims = f"{state['extracted_policies']}\n{state['risk_assessment']}"
+        result = await self.hallucination_guard.averify_facts(
+            claims,
+            state.get("source_documents") or [],
+            state["retrieved_context"]
+        )
+        return self._verification_update(state, result["verification"], result["flagged_claims"])
+
+    def _route_update(self, state: AgentState, flagged_claims: List[Dict]) -> Dict:
         """
-        Conditional routing logic: decide whether to retry (loop back to retriever)
-        or proceed to report generation.
+        Decide whether to retry or proceed to report generation, and record the
+        decision in the state update.
 
-        Returns: "retry" or "finalize"
+        Conditional edge functions can't write state, so the retry bookkeeping
+        happens in the nodes and _should_retry_or_finalize only reads the route.
         """
-        verification = state["verification"]
         retry_count = state["retry_count"]
         max_retries = state["max_retries"]
+        history = []
 
-        # Check if max retries reached - ALWAYS go to finalize
-        if retry_count >= max_retries:
-            state["agent_history"].append(
-                f"⚠️ Max retries ({max_retries}) reached. Proceeding to report generation."
+        if flagged_claims and retry_count < max_retries:
+            # RETRY: Increment retry count and re-check the flagged claims
+            retry_count += 1
+            history.append(
+                f"🔄 Hallucination detected in {len(flagged_claims)} claim(s). "
+                f"Retrying flagged claims (attempt {retry_count}/{max_retries})..."
             )
-            return "finalize"
-
-        # Check if hallucination was detected
-        # Look for keywords that indicate unsupported/unverified claims
-        hallucination_keywords = [
-            "unsupported",
-            "not supported",
-            "no evidence",
-            "cannot verify",
-            "unverified",
-            "confidence: 0",
-            "confidence: low"
-        ]
-
-        has_hallucination = any(
-            keyword.lower() in verification.lower()
-            for keyword in hallucination_keywords
-        )
+            route = "retry"
+        elif flagged_claims:
+            history.append(f"⚠️ Max retries ({max_retries}) reached. Proceeding to report generation.")
+            route = "finalize"
+        else:
+            # PROCEED: No hallucination
+            history.append("✅ Verification passed. Proceeding to report generation.")
+            route = "finalize"
+
+        return {
+            "flagged_claims": flagged_claims,
+            "retry_count": retry_count,
+            "hallucination_detected": bool(flagged_claims),
+            "route": route,
+            "agent_history": history
+        }
 
-        if has_hallucination and retry_count < max_retries:
-            # LOOP BACK: Increment retry count and go back to retriever
-            state["retry_count"] += 1
-            state["hallucination_detected"] = True
-            state["agent_history"].append(
-                f"🔄 Hallucination detected. Retrying (attempt {state['retry_count']}/{max_retries})..."
+    def _verification_update(self, state: AgentState, verification: str, flagged_claims: List[Dict]) -> Dict:
+        """Build the guard node's update from its verification output and flagged claims"""
+        flagged_claims = list(flagged_claims)
+        if not flagged_claims:
+            # The guard didn't flag anything through its tool; fall back to
+            # keyword detection and treat the matching lines as the claims
+            flagged_claims = [
+                {"claim": line.strip(" -*"), "reason": "verification output", "severity": "major"}
+                for line in verification.splitlines()
+                if any(keyword in line.lower() for keyword in HALLUCINATION_KEYWORDS)
+            ]
+
+        update = self._route_update(state, flagged_claims)
+        update["verification"] = verification
+        update["agent_history"] = ["HallucinationGuardAgent: Verified facts"] + update["agent_history"]
+        return update
+
+    @staticmethod
+    def _attribute_claim(claim: str, state: AgentState) -> str:
+        """Attribute a flagged claim to the stage whose output it most overlaps with"""
+        words = set(re.findall(r"\w+", claim.lower()))
+        policy_words = set(re.findall(r"\w+", state["extracted_policies"].lower()))
+        risk_words = set(re.findall(r"\w+", state["risk_assessment"].lower()))
+        if len(words & risk_words) > len(words & policy_words):
+            return "risk_assessment"
+        return "extracted_policies"
+
+    def _retry_update(self, state: AgentState, claims: List[Dict], evidence: List[List], result: Dict) -> Dict:
+        """Merge the re-verification of flagged claims into the existing results"""
+        record_retry("hallucination")
+        known = {doc.page_content for doc in state.get("source_documents") or []}
+        new_docs = []
+        for docs in evidence:
+            for doc in docs:
+                if doc.page_content not in known:
+                    known.add(doc.page_content)
+                    new_docs.append(doc)
+
+        lines = [f"- [{entry['verdict']}] {entry['claim']}" for entry in result["verification_log"]]
+        update = self._route_update(state, result["flagged_claims"])
+        update["verification"] = (
+            f"{state['verification']}\n\nRe-verification of flagged claims "
+            f"(attempt {state['retry_count']}):\n" + "\n".join(lines)
+        )
+        update["source_documents"] = list(state.get("source_documents") or []) + new_docs
+        if new_docs:
+            update["retrieved_context"] = state["retrieved_context"] + "\n\n" + "\n\n".join(
+                doc.page_content for doc in new_docs
             )
+
+        # Claims that still can't be verified are marked in the stage output
+        # that produced them, so the report doesn't present them as fact
+        if update["route"] == "finalize":
+            for claim in update["flagged_claims"]:
+                stage = self._attribute_claim(claim["claim"], state)
+                update[stage] = update.get(stage, state[stage]) + f"\n\n⚠️ Unverified claim: {claim['claim']}"
+
+        resolved = len(claims) - len(result["flagged_claims"])
+        update["agent_history"] = [
+            f"HallucinationGuardAgent: Re-verified {len(claims)} flagged claim(s) with "
+            f"{len(new_docs)} new evidence document(s); {resolved} resolved"
+        ] + update["agent_history"]
+        return update
+
+    def _targeted_retry_node(self, state: AgentState) -> Dict:
+        """Targeted retry node: fetch evidence for the flagged claims only and re-verify just those"""
+        claims = state["flagged_claims"]
+        vs = self.retriever.vector_store
+        evidence = vs.search_many([claim["claim"] for claim in claims], k=3)
+        result = self.hallucination_guard.reverify_claims(claims, evidence)
+        return self._retry_update(state, claims, evidence, result)
+
+    async def _atargeted_retry_node(self, state: AgentState) -> Dict:
+        """Async targeted retry node"""
+        claims = state["flagged_claims"]
+        vs = self.retriever.vector_store
+        evidence = await vs.asearch_many([claim["claim"] for claim in claims], k=3)
+        result = await self.hallucination_guard.areverify_claims(claims, evidence)
+        return self._retry_update(state, claims, evidence, result)
+
+    def _should_retry_or_finalize(self, state: AgentState) -> str:
+        """
+        Conditional routing logic: decide whether to retry (re-check the
+        flagged claims) or proceed to report generation.
+
+        Returns: "retry" or "finalize"
+        """
+        if state.get("route") == "retry":
             return "retry"
-        else:
-            # PROCEED: No hallucination or max retries reached
-            state["agent_history"].append("✅ Verification passed. Proceeding to report generation.")
-            return "finalize"
+        return "finalize"
 
-    def _report_generator_node(self, state: AgentState) -> AgentState:
+    def _report_generator_node(self, state: AgentState) -> Dict:
         """Report generation agent node"""
         result = self.report_generator.generate_report(
             state["query"],
@@ -160,26 +369,92 @@ class SupervisorAgent:
             state["risk_assessment"],
             state["verification"]
         )
-        state["final_report"] = result["final_report"]
-        state["agent_history"].append("ReportGenerationAgent: Generated final compliance report")
-        return state
+        return {
+            "final_report": result["final_report"],
+            "agent_history": ["ReportGenerationAgent: Generated final compliance report"]
+        }
 
-    def process(self, query: str, transaction_data: Dict = None) -> Dict:
-        """Process a compliance query through the multi-agent workflow"""
-        initial_state = {
+    async def _areport_generator_node(self, state: AgentState) -> Dict:
+        """Async report generation agent node; report sections and the final
+        report are relayed to astream through the custom stream"""
+        writer = get_stream_writer()
+        result = await self.report_generator.agenerate_report(
+            state["query"],
+            state["extracted_policies"],
+            state["risk_assessment"],
+            state["verification"],
+            on_event=lambda event, data: writer((event, data))
+        )
+        return {
+            "final_report": result["final_report"],
+            "agent_history": ["ReportGenerationAgent: Generated final compliance report"]
+        }
+
+    def _initial_state(self, query: str, transaction_data: Dict = None) -> AgentState:
+        return {
             "query": query,
             "transaction_data": transaction_data or {},
             "retrieved_context": "",
+            "retrieved_chunk_ids": [],
             "extracted_policies": "",
+            "risk_prescreen": "",
             "risk_assessment": "",
+            "source_documents": [],
             "verification": "",
+            "flagged_claims": [],
             "final_report": "",
             "agent_history": [],
             "current_agent": "supervisor",
             "retry_count": 0,
             "max_retries": 2,  # Allow up to 2 retries (3 total attempts)
-            "hallucination_detected": False
+            "hallucination_detected": False,
+            "route": "",
+            # Searches stay within the transaction's jurisdiction plus international/general documents
+            "search_filter": jurisdiction_filter((transaction_data or {}).get("region")) or {}
         }
 
-        result = self.workflow.invoke(initial_state)
-        return result
+    def process(self, query: str, transaction_data: Dict = None) -> Dict:
+        """Process a compliance query through the multi-agent workflow"""
+        return self.workflow.invoke(self._initial_state(query, transaction_data))
+
+    async def aprocess(self, query: str, transaction_data: Dict = None) -> Dict:
+        """Async variant of process: drives the workflow with ainvoke so LLM
+        round-trips yield to the event loop instead of blocking the worker"""
+        return await self.workflow.ainvoke(self._initial_state(query, transaction_data))
+
+    async def astream(self, query: str, transaction_data: Dict = None):
+        """
+        Stream the workflow as (event, data) pairs while it runs.
+
+        Yields an "agent" event per agent_history entry, one event per
+        intermediate result in STREAMED_FIELDS, a "section" event as each
+        report section is compiled, "token" events that join to the final
+        report, and a closing "final" event carrying the same fields
+        process() returns. The report agent's own reasoning and tool-call
+        tokens are not streamed.
+        """
+        state = self._initial_state(query, transaction_data)
+        async for mode, chunk in self.workflow.astream(state, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                event, data = chunk
+                yield event, data
+                continue
+
+            for node, update in chunk.items():
+                if not update:
+                    continue
+                for entry in update.get("agent_history", []):
+                    state["agent_history"].append(entry)
+                    yield "agent", {"node": node, "message": entry}
+                for field in STREAMED_FIELDS:
+                    if field in update:
+                        yield field, {"node": node, field: update[field]}
+                state.update({k: v for k, v in update.items() if k != "agent_history"})
+
+        yield "final", {
+            "final_report": state["final_report"],
+            "risk_assessment": state["risk_assessment"],
+            "extracted_policies": state["extracted_policies"],
+            "verification": state["verification"],
+            "agent_history": state["agent_history"]
+        }
@@ -0,0 +1,342 @@
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import time
+import uuid
+from config import Config
+from document_tags import jurisdiction_filter, normalize_jurisdiction
+from instrumentation import timed
+from jobs import BatchJobStore
+from risk_scoring import narrative_tier, to_columns
+from threshold_engine import REGION_CURRENCIES, parse_money
+
+TRANSACTION_FIELDS = ("type", "region", "customer_type")
+USD_AMOUNT_PATTERN = re.compile(r"\$\s?(\d[\d,]*(?:\.\d+)?)")
+LIST_MARKER = re.compile(r"^[\s\-*•#\d.)]+")
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """"csv" or "jsonl" from an upload's filename or content type (JSONL by default)"""
+    name = (filename or "").lower()
+    if name.endswith(".csv") or (content_type or "").startswith("text/csv"):
+        return "csv"
+    return "jsonl"
+
+
+def parse_transactions(source: Union[str, Iterable[str]], fmt: str = "jsonl") -> Iterator[Dict]:
+    """Transactions from JSONL (one object per line) or CSV with a header row, read
+    lazily from a string or any iterable of lines (e.g. a text file).
+    Unparseable JSONL lines come back as {"_error": ...} so they are reported, not dropped."""
+    lines = io.StringIO(source) if isinstance(source, str) else source
+    if fmt == "csv":
+        for row in csv.DictReader(lines):
+            yield {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"_error": f"line {number}: {e.msg}"}
+            continue
+        yield record if isinstance(record, dict) else {"_error": f"line {number}: not a JSON object"}
+
+
+def _transaction_id(transaction: Dict):
+    return transaction.get("id") or transaction.get("transaction_id")
+
+
+def group_key(transaction: Dict) -> Tuple[str, str, str]:
+    """Shared regulatory context of a transaction: (type, jurisdiction, customer type)"""
+    return (
+        str(transaction.get("type") or "general").strip().lower(),
+        normalize_jurisdiction(transaction.get("region")) or "",
+        str(transaction.get("customer_type") or "").strip().lower(),
+    )
+
+
+def group_transactions(transactions: Iterable[Dict], max_transactions: Optional[int] = None) -> Dict:
+    """
+    Group transactions by group_key as they are read.
+
+    Returns `groups` ({key: [(index, transaction)]}), the `invalid` (index,
+    record) pairs and the `count` read. Reading stops at max_transactions + 1,
+    so a `count` over the limit means the batch is too large.
+    """
+    if max_transactions is not None:
+        transactions = itertools.islice(transactions, max_transactions + 1)
+    groups: Dict[Tuple[str, str, str], List[Tuple[int, Dict]]] = {}
+    invalid: List[Tuple[int, Dict]] = []
+    count = 0
+    for index, transaction in enumerate(transactions):
+        count += 1
+        if "_error" in transaction:
+            invalid.append((index, transaction))
+        else:
+            groups.setdefault(group_key(transaction), []).append((index, transaction))
+    return {"groups": groups, "invalid": invalid, "count": count}
+
+
+def extracted_thresholds(structured_data: Dict) -> List[Dict]:
+    """USD amounts from the policy extractor's threshold findings, one per amount,
+    labelled with the line that states it"""
+    thresholds = {}
+    for finding in structured_data.get("thresholds", []):
+        for line in str(finding).splitlines():
+            label = LIST_MARKER.sub("", line).replace("**", "").strip()
+            for match in USD_AMOUNT_PATTERN.finditer(line):
+                amount = float(match.group(1).replace(",", ""))
+                if amount > 0 and amount not in thresholds:
+                    thresholds[amount] = {"regulation": label[:200], "threshold": amount}
+    return sorted(thresholds.values(), key=lambda t: t["threshold"])
+
+
+class BatchScreener:
+    """
+    Screens files of transactions with one retrieval and policy extraction per group.
+
+    Transactions are grouped by (type, region, customer_type); each group's
+    regulatory context is retrieved and its policies extracted once, with
+    searches scoped to the group's jurisdiction, and groups run concurrently
+    up to BATCH_GROUP_CONCURRENCY. Every transaction in a group is then
+    screened by the threshold engine against its table plus the USD
+    thresholds the policy extractor found for the group.
+
+    Risk tiers for the whole batch come from one pass of the risk
+    classifier's vectorized scoring; only borderline transactions (up to
+    RISK_AGENT_MAX_PER_BATCH) are sent to the risk classification agent for
+    a narrative assessment.
+
+    Batches written to file are tracked in a BatchJobStore.
+    """
+
+    def __init__(self, retriever, policy_extractor, risk_classifier, jobs: BatchJobStore):
+        self.retriever = retriever
+        self.policy_extractor = policy_extractor
+        self.risk_classifier = risk_classifier
+        self.vector_store = retriever.vector_store
+        self.jobs = jobs
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _group_query(key: Tuple[str, str, str]) -> str:
+        tx_type, region, customer_type = key
+        query = f"Which reporting thresholds and compliance requirements apply to {tx_type.replace('_', ' ')} transactions"
+        if customer_type:
+            query += f" by {customer_type} customers"
+        if region:
+            query += f" in {region}"
+        return query + "?"
+
+    async def _group_context(self, key: Tuple[str, str, str], query: Optional[str]) -> Dict:
+        tx_type, region, customer_type = key
+        query = query or self._group_query(key)
+        representative = {"type": tx_type, "region": region, "customer_type": customer_type}
+        with timed("batch", "group_context"), self.vector_store.scoped_filter(jurisdiction_filter(region) or {}):
+            retrieval = await self.retriever.aretrieve_relevant_context(query, representative)
+            policies = await self.policy_extractor.aextract_policies(
+                retrieval["context"], query, chunk_ids=retrieval["chunk_ids"]
+            )
+        return {
+            "query": query,
+            "context": retrieval["context"],
+            "document_count": retrieval["document_count"],
+            "retrieval_mode": retrieval["retrieval_mode"],
+            "extraction_mode": policies["extraction_mode"],
+            "sources": sorted({doc.metadata.get("filename", "unknown") for doc in retrieval["relevant_documents"]}),
+            "extracted_policies": policies["extracted_policies"],
+            "thresholds": extracted_thresholds(policies["structured_data"]),
+        }
+
+    def screen(self, transaction: Dict, context: Dict) -> Dict:
+        """Rule-based threshold screen of one transaction against its group's context"""
+        engine = self.risk_classifier.threshold_engine
+        flags = self.risk_classifier.screen_thresholds(transaction)
+        money = parse_money(transaction.get("amount"))
+        amount = None
+        if money is not None:
+            currency = money[1] or REGION_CURRENCIES.get(normalize_jurisdiction(transaction.get("region")) or "", "USD")
+            amount = engine.convert(money[0], currency, "USD")
+        if amount is not None:
+            known = {flag["threshold"] for flag in flags if flag["currency"] == "USD"}
+            for threshold in context["thresholds"]:
+                limit = threshold["threshold"]
+                if limit in known:
+                    continue
+                status = engine.status(amount, limit)
+                if status is not None:
+                    action = "Review extracted requirement" if status == "exceeds" else "Review for structuring"
+                    flags.append({**threshold, "currency": "USD", "amount": round(amount, 2), "status": status, "action": action})
+
+        if money is None:
+            status = "review"
+        elif any(flag["status"] == "exceeds" for flag in flags):
+            status = "flagged"
+        elif flags:
+            status = "review"
+        else:
+            status = "clear"
+        return {"status": status, "amount": money[0] if money else None, "threshold_flags": flags}
+
+    @staticmethod
+    def _risk_fields(risk: Dict, index: int) -> Dict:
+        return {
+            "risk_score": round(float(risk["score"][index]), 1),
+            "risk_tier": str(risk["tier"][index]),
+            "risk_source": "vectorized",
+        }
+
+    async def _classify(self, record: Dict, transaction: Dict, context: Dict, semaphore: asyncio.Semaphore) -> Dict:
+        """Replace a borderline record's vectorized tier with the agent's classification"""
+        async with semaphore:
+            try:
+                with timed("batch", "agent_classification"):
+                    result = await self.risk_classifier.aclassify_risk(
+                        context["context"], context["extracted_policies"], transaction
+                    )
+            except Exception as e:
+                record["risk_error"] = str(e)
+                return record
+        record.update({
+            "risk_tier": narrative_tier(result["risk_assessment"]) or record["risk_tier"],
+            "risk_source": "agent",
+            "risk_assessment": result["risk_assessment"],
+            "risk_factors": result["risk_factors"],
+        })
+        return record
+
+    async def screen_batch(self, batch: Dict, query: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Yield one record per group ("group"), per transaction ("transaction")
+        and a closing "summary", as each group finishes.
+
+        `batch` comes from group_transactions. Transaction records keep the
+        input order index and the input's `id`/`transaction_id`, since groups
+        complete out of order. Records escalated to the risk agent are yielded
+        when their classification finishes, while other groups keep streaming.
+        """
+        start = time.perf_counter()
+        groups, invalid, count = batch["groups"], batch["invalid"], batch["count"]
+        # One vectorized scoring pass over every valid transaction; risk doesn't
+        # depend on the group's retrieved context. `rows` maps input index to row.
+        members = [member for group in groups.values() for member in group]
+        rows = {index: row for row, (index, _) in enumerate(members)}
+        with timed("batch", "risk_scoring"):
+            risk = await asyncio.to_thread(
+                self.risk_classifier.score_batch, to_columns([transaction for _, transaction in members])
+            )
+        del members
+
+        statuses: Dict[str, int] = {}
+        tiers: Dict[str, int] = {}
+        agent_classified = 0
+
+        def tally(record: Dict) -> Dict:
+            statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+            if "risk_tier" in record:
+                tiers[record["risk_tier"]] = tiers.get(record["risk_tier"], 0) + 1
+            return record
+
+        for index, transaction in invalid:
+            yield tally({"kind": "transaction", "index": index, "status": "invalid", "error": transaction["_error"]})
+
+        semaphore = asyncio.Semaphore(Config.BATCH_GROUP_CONCURRENCY)
+        agent_semaphore = asyncio.Semaphore(Config.BATCH_GROUP_CONCURRENCY)
+        agent_budget = Config.RISK_AGENT_MAX_PER_BATCH
+
+        async def run_group(key):
+            async with semaphore:
+                try:
+                    return key, await self._group_context(key, query), None
+                except Exception as e:
+                    return key, None, str(e)
+
+        # Groups and agent escalations finish in any order; escalated records
+        # are held back until their classification is done, without stopping
+        # the other groups from streaming
+        group_tasks = {asyncio.ensure_future(run_group(key)) for key in groups}
+        pending = set(group_tasks)
+        failed_groups = 0
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task not in group_tasks:
+                        record = task.result()
+                        agent_classified += record["risk_source"] == "agent"
+                        yield tally(record)
+                        continue
+
+                    key, context, error = task.result()
+                    group = dict(zip(TRANSACTION_FIELDS, key))
+                    if error is not None:
+                        failed_groups += 1
+                        yield {"kind": "group", "group": group, "transactions": len(groups[key]), "error": error}
+                        for index, transaction in groups[key]:
+                            yield tally({"kind": "transaction", "index": index, "id": _transaction_id(transaction),
+                                         "group": group, "status": "error", "error": error,
+                                         **self._risk_fields(risk, rows[index])})
+                        continue
+
+                    yield {"kind": "group", "group": group, "transactions": len(groups[key]),
+                           **{field: value for field, value in context.items() if field != "context"}}
+                    with timed("batch", "screen"):
+                        records = [
+                            {"kind": "transaction", "index": index, "id": _transaction_id(transaction),
+                             "group": group, **self.screen(transaction, context), **self._risk_fields(risk, rows[index])}
+                            for index, transaction in groups[key]
+                        ]
+                    for record, (index, transaction) in zip(records, groups[key]):
+                        if risk["borderline"][rows[index]] and agent_budget > 0:
+                            agent_budget -= 1
+                            pending.add(asyncio.ensure_future(
+                                self._classify(record, transaction, context, agent_semaphore)
+                            ))
+                        else:
+                            yield tally(record)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        yield {
+            "kind": "summary",
+            "transactions": count,
+            "groups": len(groups),
+            "failed_groups": failed_groups,
+            "statuses": statuses,
+            "risk_tiers": tiers,
+            "agent_classified": agent_classified,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def start_file_job(self, batch: Dict, query: Optional[str] = None) -> Dict:
+        """Screen a grouped batch in the background, writing the records as JSONL to BATCH_OUTPUT_DIRECTORY"""
+        batch_id = uuid.uuid4().hex
+        os.makedirs(Config.BATCH_OUTPUT_DIRECTORY, exist_ok=True)
+        output_file = os.path.join(Config.BATCH_OUTPUT_DIRECTORY, f"{batch_id}.jsonl")
+        job = self.jobs.create(batch_id, output_file, batch["count"])
+        self._tasks[batch_id] = asyncio.create_task(self._write(batch_id, output_file, batch, query))
+        return job
+
+    async def _write(self, batch_id: str, output_file: str, batch: Dict, query: Optional[str]):
+        try:
+            summary = None
+            with open(output_file, "w") as out:
+                async for record in self.screen_batch(batch, query):
+                    out.write(json.dumps(record, default=str) + "\n")
+                    if record["kind"] == "summary":
+                        summary = record
+            self.jobs.finish(batch_id, "completed", summary=summary)
+        except Exception as e:
+            self.jobs.finish(batch_id, "failed", error=str(e))
+        finally:
+            self._tasks.pop(batch_id, None)
+
+    def get_job(self, batch_id: str) -> Optional[Dict]:
+        return self.jobs.get(batch_id)
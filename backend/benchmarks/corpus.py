@@ -0,0 +1,147 @@
+"""
+Seeded corpus of small regulatory PDFs for benchmarks.
+
+Documents are assembled from per-jurisdiction paragraph pools (US BSA,
+EU AMLD/GDPR, UK MLR, FATF) and written as plain single-font PDFs without
+any PDF library, so the same seed always produces byte-identical files.
+
+Run: python -m benchmarks.corpus --out benchmarks/corpus --docs 12 --seed 42
+"""
+from typing import List
+import argparse
+import os
+import random
+import textwrap
+
+PARAGRAPHS = {
+    "us_bsa": [
+        "Under the Bank Secrecy Act, 31 CFR 1010.311 requires each financial institution to file a "
+        "Currency Transaction Report (CTR) with FinCEN for each deposit, withdrawal, exchange of currency "
+        "or other payment or transfer of more than $10,000 in currency.",
+        "Multiple currency transactions totaling more than $10,000 during any one business day are treated "
+        "as a single transaction if the institution has knowledge that they are by or on behalf of the same person.",
+        "Structuring a transaction to evade the $10,000 reporting requirement is prohibited by 31 U.S.C. 5324, "
+        "regardless of whether the underlying funds are lawful.",
+        "A CTR must be filed within 15 calendar days after the date of the transaction.",
+        "Funds transfers of $3,000 or more require the originator's bank to obtain and retain the name, "
+        "address and account number of the originator under 31 CFR 1010.410.",
+        "A Suspicious Activity Report (SAR) must be filed within 30 calendar days of initial detection of facts "
+        "that may constitute a basis for filing, for transactions of at least $5,000.",
+    ],
+    "eu_amld": [
+        "Directive (EU) 2015/849 (AMLD) requires obliged entities to apply customer due diligence when "
+        "carrying out an occasional transaction amounting to EUR 15,000 or more.",
+        "Enhanced due diligence applies to business relationships with politically exposed persons and to "
+        "transactions involving high-risk third countries identified by the Commission.",
+        "Regulation (EU) 2015/847 requires payment service providers to ensure that transfers of funds "
+        "exceeding EUR 1,000 are accompanied by verified information on the payer and the payee.",
+        "Obliged entities shall retain customer due diligence records for five years after the end of the "
+        "business relationship.",
+        "Under the GDPR, personal data processed for anti-money laundering purposes may only be used for "
+        "the prevention of money laundering and terrorist financing.",
+    ],
+    "uk_mlr": [
+        "The Money Laundering Regulations 2017 require relevant persons to apply customer due diligence "
+        "measures when establishing a business relationship or carrying out an occasional transaction of "
+        "EUR 15,000 or more.",
+        "Firms supervised by the FCA must report suspicious activity to the National Crime Agency as soon as "
+        "practicable under the Proceeds of Crime Act 2002.",
+        "Enhanced due diligence applies where a customer is established in a high-risk third country "
+        "listed by HM Treasury.",
+    ],
+    "fatf": [
+        "FATF Recommendation 16 requires countries to ensure that financial institutions include accurate "
+        "originator and beneficiary information on wire transfers of USD/EUR 1,000 or more.",
+        "FATF Recommendation 10 requires customer due diligence when establishing business relations and "
+        "when carrying out occasional transactions above USD/EUR 15,000.",
+        "FATF Recommendation 20 requires financial institutions to report promptly to the financial "
+        "intelligence unit if they suspect that funds are the proceeds of a criminal activity.",
+        "Virtual asset service providers are subject to the same travel rule requirements as other "
+        "financial institutions under the revised FATF standards.",
+    ],
+}
+
+FILLER = [
+    "Institutions shall maintain written policies and procedures approved by senior management.",
+    "Training on these requirements shall be provided to relevant staff at least annually.",
+    "Independent testing of the compliance program shall be conducted on a risk-based schedule.",
+    "Records shall be made available to the competent authority upon request.",
+    "A designated compliance officer is responsible for day-to-day oversight of the program.",
+]
+
+TITLES = {
+    "us_bsa": "Bank Secrecy Act Reporting Requirements",
+    "eu_amld": "EU Anti-Money Laundering Directive Guidance",
+    "uk_mlr": "UK Money Laundering Regulations Summary",
+    "fatf": "FATF Recommendations Overview",
+}
+
+LINES_PER_PAGE = 60
+LINE_WIDTH = 95
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, title: str, paragraphs: List[str]):
+    """Write text as a minimal multi-page PDF (Helvetica, one line per text row)"""
+    lines = [title, ""]
+    for paragraph in paragraphs:
+        lines.extend(textwrap.wrap(paragraph, LINE_WIDTH))
+        lines.append("")
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)]
+
+    objects = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for pid, page_lines in zip(page_ids, pages):
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td\n" + "\n".join(f"({_escape(line)}) Tj T*" for line in page_lines) + "\nET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(bytes(output))
+
+
+def generate(out_dir: str, docs: int = 12, seed: int = 42) -> List[str]:
+    """Write `docs` seeded PDFs to `out_dir` and return their paths"""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    topics = sorted(PARAGRAPHS)
+    paths = []
+    for i in range(docs):
+        topic = topics[i % len(topics)]
+        paragraphs = rng.sample(PARAGRAPHS[topic], k=rng.randint(2, len(PARAGRAPHS[topic])))
+        # Pad some documents to several pages so ingestion batches more than one page
+        paragraphs += [rng.choice(FILLER) for _ in range(rng.randint(2, 40))]
+        rng.shuffle(paragraphs)
+        path = os.path.join(out_dir, f"{topic}_{i:02d}.pdf")
+        write_pdf(path, f"{TITLES[topic]} ({i + 1})", paragraphs)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "corpus"))
+    parser.add_argument("--docs", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for path in generate(args.out, args.docs, args.seed):
+        print(path)
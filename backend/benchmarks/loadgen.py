@@ -0,0 +1,235 @@
+"""
+Load generator for the Compliance Copilot API.
+
+Seeds the index with the benchmark corpus, then drives a seeded mix of
+/api/compliance/analyze, /api/documents/search and /api/documents/upload
+requests at a fixed concurrency. Reports p50/p95/p99 latency and
+requests/sec per endpoint, plus LLM and embedding calls per request when
+pointed at the mock OpenAI server.
+
+Run: python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 --mock-url http://127.0.0.1:8100
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import random
+import time
+import httpx
+
+SCENARIOS = [
+    ("Does this cash deposit require a CTR filing?",
+     {"type": "cash_deposit", "amount": "$15,000", "region": "US", "customer_type": "individual"}),
+    ("Is this cash withdrawal just under the reporting threshold a structuring concern?",
+     {"type": "cash_withdrawal", "amount": "$9,500", "region": "US", "customer_type": "business"}),
+    ("What information must accompany this cross-border wire transfer?",
+     {"type": "wire_transfer", "amount": "EUR 2,500", "region": "EU", "customer_type": "individual"}),
+    ("Which due diligence measures apply to this occasional transaction?",
+     {"type": "occasional_transaction", "amount": "EUR 20,000", "region": "UK", "customer_type": "business"}),
+    ("Does the travel rule apply to this crypto transfer?",
+     {"type": "crypto_transfer", "amount": "$1,200", "region": "INTL", "customer_type": "individual"}),
+]
+
+SEARCHES = [
+    "31 CFR 1010.311 currency transaction report",
+    "FATF Recommendation 16 wire transfer information",
+    "structuring to evade the $10,000 threshold",
+    "customer due diligence occasional transaction EUR 15,000",
+    "suspicious activity report filing deadline",
+    "politically exposed persons enhanced due diligence",
+]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, timeout: float = 300.0) -> Dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = (await client.get(f"/api/documents/jobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(0.25)
+    raise TimeoutError(f"Ingestion job {job_id} did not finish in {timeout}s")
+
+
+async def upload(client: httpx.AsyncClient, path: str) -> Dict:
+    with open(path, "rb") as f:
+        response = await client.post(
+            "/api/documents/upload",
+            files={"file": (os.path.basename(path), f.read(), "application/pdf")}
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+async def seed_index(client: httpx.AsyncClient, corpus: List[str]):
+    """Upload the corpus and wait until every document is ingested"""
+    jobs = [await upload(client, path) for path in corpus]
+    for job in jobs:
+        result = await wait_for_job(client, job["job_id"])
+        if result["status"] != "completed":
+            raise RuntimeError(f"Seeding failed for {job['filename']}: {result.get('error')}")
+
+
+async def mock_stats(mock_url: Optional[str]) -> Optional[Dict]:
+    if not mock_url:
+        return None
+    async with httpx.AsyncClient(base_url=mock_url) as client:
+        return (await client.get("/mock/stats")).json()
+
+
+def plan(requests: int, mix: Dict[str, float], corpus: List[str], seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    kinds = list(mix)
+    operations = []
+    for kind in rng.choices(kinds, weights=[mix[k] for k in kinds], k=requests):
+        if kind == "analyze":
+            query, transaction = rng.choice(SCENARIOS)
+            operations.append({"kind": kind, "query": query, "transaction_data": transaction})
+        elif kind == "search":
+            operations.append({"kind": kind, "query": rng.choice(SEARCHES)})
+        else:
+            operations.append({"kind": kind, "path": rng.choice(corpus)})
+    return operations
+
+
+async def execute(client: httpx.AsyncClient, operation: Dict):
+    if operation["kind"] == "analyze":
+        response = await client.post("/api/compliance/analyze", json={
+            "query": operation["query"],
+            "transaction_data": operation["transaction_data"],
+        })
+        response.raise_for_status()
+    elif operation["kind"] == "search":
+        response = await client.get("/api/documents/search", params={"query": operation["query"], "k": 5})
+        response.raise_for_status()
+    else:
+        await upload(client, operation["path"])
+
+
+async def run(base_url: str, mock_url: Optional[str], corpus_dir: str, concurrency: int,
+              requests: int, mix: Dict[str, float], seed: int, skip_seed: bool = False,
+              timeout: float = 300.0) -> Dict:
+    corpus = sorted(glob.glob(os.path.join(corpus_dir, "*.pdf")))
+    if not corpus:
+        raise SystemExit(f"No PDFs in {corpus_dir}; generate them with python -m benchmarks.corpus")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        if not skip_seed:
+            await seed_index(client, corpus)
+
+        operations = plan(requests, mix, corpus, seed)
+        queue: asyncio.Queue = asyncio.Queue()
+        for operation in operations:
+            queue.put_nowait(operation)
+        latencies: Dict[str, List[float]] = {kind: [] for kind in mix}
+        errors: Dict[str, int] = {kind: 0 for kind in mix}
+
+        async def worker():
+            while True:
+                try:
+                    operation = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    await execute(client, operation)
+                    latencies[operation["kind"]].append(time.perf_counter() - start)
+                except Exception:
+                    errors[operation["kind"]] += 1
+
+        before = await mock_stats(mock_url)
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        after = await mock_stats(mock_url)
+
+    report = {
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(sum(len(v) for v in latencies.values()) / elapsed, 3) if elapsed else 0.0,
+        "endpoints": {
+            kind: {
+                "count": len(values),
+                "errors": errors[kind],
+                "p50_ms": round(percentile(values, 50) * 1000, 1) if values else None,
+                "p95_ms": round(percentile(values, 95) * 1000, 1) if values else None,
+                "p99_ms": round(percentile(values, 99) * 1000, 1) if values else None,
+                "requests_per_sec": round(len(values) / elapsed, 3) if elapsed else 0.0,
+            }
+            for kind, values in latencies.items()
+        },
+    }
+    if before is not None and after is not None:
+        # Chat calls only come from analyses; embeddings from every endpoint
+        analyses = len(latencies.get("analyze", [])) or None
+        completed = sum(len(v) for v in latencies.values()) or None
+        chat_calls = after["chat_calls"] - before["chat_calls"]
+        embedding_calls = after["embedding_calls"] - before["embedding_calls"]
+        report["llm"] = {
+            "chat_calls": chat_calls,
+            "embedding_calls": embedding_calls,
+            "chat_calls_per_analysis": round(chat_calls / analyses, 2) if analyses else None,
+            "embedding_calls_per_request": round(embedding_calls / completed, 2) if completed else None,
+        }
+    return report
+
+
+def print_report(report: Dict):
+    print(f"\n{report['requests']} requests at concurrency {report['concurrency']} "
+          f"in {report['seconds']}s ({report['requests_per_sec']} req/s)\n")
+    print(f"{'endpoint':<10}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for kind, stats in report["endpoints"].items():
+        print(f"{kind:<10}{stats['count']:>7}{stats['errors']:>8}{str(stats['p50_ms']):>10}"
+              f"{str(stats['p95_ms']):>10}{str(stats['p99_ms']):>10}{stats['requests_per_sec']:>9}")
+    if "llm" in report:
+        llm = report["llm"]
+        print(f"\nLLM calls per analysis: {llm['chat_calls_per_analysis']}  "
+              f"(chat {llm['chat_calls']}, embeddings {llm['embedding_calls']}, "
+              f"embedding calls per request {llm['embedding_calls_per_request']})")
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        kind, weight = part.split("=")
+        if kind not in ("analyze", "search", "upload"):
+            raise argparse.ArgumentTypeError(f"Unknown request kind: {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("analyze=0.4,search=0.5,upload=0.1"),
+                        help="Weights per request kind, e.g. analyze=0.4,search=0.5,upload=0.1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), "corpus"))
+    parser.add_argument("--skip-seed", action="store_true", help="Don't upload the corpus before the run")
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mock-url", help="Mock OpenAI server, for LLM calls per request")
+    add_arguments(parser)
+    args = parser.parse_args()
+    result = asyncio.run(run(args.base_url, args.mock_url, args.corpus, args.concurrency,
+                             args.requests, args.mix, args.seed, args.skip_seed))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
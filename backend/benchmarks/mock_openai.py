@@ -0,0 +1,249 @@
+"""
+OpenAI-compatible stand-in for offline benchmarks.
+
+Serves /v1/chat/completions (plain, tool-calling and streamed) and
+/v1/embeddings with configurable latency. Agent runs follow a fixed script
+of tool calls per agent, picked by the tools in the request, so a full
+analysis exercises every tool path without a live model. /mock/stats
+reports call counts for computing LLM calls per request.
+
+Run: python -m benchmarks.mock_openai --port 8100
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import numpy as np
+
+CHAT_LATENCY_MS = float(os.getenv("MOCK_CHAT_LATENCY_MS", 200))
+EMBEDDING_LATENCY_MS = float(os.getenv("MOCK_EMBEDDING_LATENCY_MS", 50))
+LATENCY_JITTER = float(os.getenv("MOCK_LATENCY_JITTER", 0.2))
+EMBEDDING_DIMENSIONS = int(os.getenv("MOCK_EMBEDDING_DIMENSIONS", 1536))
+
+# Tool calls each agent makes, keyed by a tool only that agent has; "{input}"
+# is replaced by the start of the agent's input message
+TOOL_SCRIPTS = {
+    "vector_search": [
+        ("vector_search", {"query": "{input}", "k": 5}),
+    ],
+    "extract_regulations": [
+        ("extract_regulations", {"context": "{input}", "regulation_type": "AML"}),
+        ("extract_thresholds", {"context": "{input}"}),
+    ],
+    "check_threshold_violation": [
+        ("check_threshold_violation", {"amount": "$15,000", "regulation": "BSA CTR filing", "threshold": "$10,000"}),
+        ("assess_risk_factor", {"factor_name": "high_value_transaction", "severity": "medium", "evidence": "Amount exceeds the CTR threshold"}),
+    ],
+    "verify_claim_against_source": [
+        ("verify_claim_against_source", {"claim": "CTR filing is required for cash over $10,000", "source_text": "{input}"}),
+    ],
+    "compile_section": [
+        ("compile_section", {"section_name": "executive_summary", "content": "{input}"}),
+        ("assemble_report", {"include_sections": "executive_summary"}),
+    ],
+}
+
+FINAL_ANSWERS = {
+    "vector_search": "Collected the regulatory documents relevant to the query.",
+    "extract_regulations": "Applicable: Bank Secrecy Act, 31 CFR 1010.311 (CTR for cash over $10,000, filed within 15 days).",
+    "check_threshold_violation": "Risk level: MEDIUM. The amount exceeds the $10,000 CTR threshold; a CTR must be filed.",
+    "verify_claim_against_source": "VERDICT: SUPPORTED. The claims match the source documents.",
+    "compile_section": "Compliance report assembled.",
+}
+
+# Replies to plain prompts (tool sub-calls), matched on a marker in the prompt
+PROMPT_REPLIES = [
+    ("VERDICT", "VERDICT: SUPPORTED\nThe source text states this requirement directly."),
+    ("Does the amount exceed the threshold", "YES. The amount exceeds the threshold; this is a reporting trigger. File a CTR within 15 days."),
+    ("Rewrite this regulatory document search query", "BSA currency transaction report 31 CFR 1010.311 cash over $10,000"),
+    ("Extract ALL numerical thresholds", "- $10,000: cash transaction reporting threshold (31 CFR 1010.311)\n- 15 days: CTR filing deadline"),
+    ("regulations from this text", "- Bank Secrecy Act, 31 CFR 1010.311: file a CTR for cash transactions over $10,000"),
+]
+DEFAULT_REPLY = "Findings summarized from the provided data."
+
+app = FastAPI(title="Mock OpenAI")
+_rng = random.Random(int(os.getenv("MOCK_SEED", 7)))
+_stats_lock = threading.Lock()
+_stats = {"chat_calls": 0, "tool_call_responses": 0, "embedding_calls": 0, "embedding_inputs": 0}
+
+
+def _count(**increments):
+    with _stats_lock:
+        for key, value in increments.items():
+            _stats[key] += value
+
+
+async def _delay(latency_ms: float):
+    if latency_ms > 0:
+        jitter = latency_ms * LATENCY_JITTER
+        await asyncio.sleep(max(0.0, latency_ms + _rng.uniform(-jitter, jitter)) / 1000)
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _plan(body: dict):
+    """Next scripted step for an agent turn: (tool name, arguments) or (None, final text)"""
+    tools = [tool["function"]["name"] for tool in body.get("tools") or []]
+    script_key = next((name for name in tools if name in TOOL_SCRIPTS), None)
+    messages = body.get("messages", [])
+    if script_key is None:
+        prompt = _text(messages[-1].get("content")) if messages else ""
+        reply = next((reply for marker, reply in PROMPT_REPLIES if marker in prompt), DEFAULT_REPLY)
+        return None, reply
+
+    user_input = next((_text(m.get("content")) for m in messages if m.get("role") == "user"), "")[:400]
+    step = sum(1 for m in messages if m.get("role") == "assistant" and m.get("tool_calls"))
+    script = TOOL_SCRIPTS[script_key]
+    if step >= len(script):
+        return None, FINAL_ANSWERS[script_key]
+    name, arguments = script[step]
+    arguments = {k: v.replace("{input}", user_input) if isinstance(v, str) else v for k, v in arguments.items()}
+    return name, arguments
+
+
+def _completion(body: dict, name, payload) -> dict:
+    prompt_tokens = sum(_tokens(_text(m.get("content"))) for m in body.get("messages", []))
+    if name is None:
+        message = {"role": "assistant", "content": payload}
+        finish_reason = "stop"
+        completion_tokens = _tokens(payload)
+    else:
+        message = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(payload)},
+            }],
+        }
+        finish_reason = "tool_calls"
+        completion_tokens = 20
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _stream(body: dict, completion: dict):
+    """Replay a completion as chat.completion.chunk server-sent events"""
+    base = {k: completion[k] for k in ("id", "created", "model")}
+    base["object"] = "chat.completion.chunk"
+    message = completion["choices"][0]["message"]
+
+    def chunk(delta, finish_reason=None):
+        return "data: " + json.dumps(dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])) + "\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    if message.get("tool_calls"):
+        call = message["tool_calls"][0]
+        yield chunk({"tool_calls": [dict(call, index=0)]})
+    else:
+        for word in re.findall(r"\S+\s*", message["content"]):
+            yield chunk({"content": word})
+    yield chunk({}, completion["choices"][0]["finish_reason"])
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield "data: " + json.dumps(dict(base, choices=[], usage=completion["usage"])) + "\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await _delay(CHAT_LATENCY_MS)
+    name, payload = _plan(body)
+    _count(chat_calls=1, tool_call_responses=int(name is not None))
+    completion = _completion(body, name, payload)
+    if body.get("stream"):
+        return StreamingResponse(_stream(body, completion), media_type="text/event-stream")
+    return completion
+
+
+def embed(text: str) -> np.ndarray:
+    """Deterministic hashed bag-of-words vector, so overlapping texts land close together"""
+    vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    for token in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(token.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if not norm:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body["input"]
+    if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+        inputs = [inputs]
+    # Token-id inputs (tiktoken-chunked requests) are embedded by their ids
+    texts = [item if isinstance(item, str) else " ".join(map(str, item)) for item in inputs]
+    await _delay(EMBEDDING_LATENCY_MS)
+    _count(embedding_calls=1, embedding_inputs=len(texts))
+
+    data = []
+    for i, text in enumerate(texts):
+        vector = embed(text)
+        if body.get("encoding_format") == "base64":
+            encoded = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+        else:
+            encoded = vector.tolist()
+        data.append({"object": "embedding", "index": i, "embedding": encoded})
+    tokens = sum(_tokens(text) for text in texts)
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "mock"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+@app.get("/mock/stats")
+async def mock_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+@app.post("/mock/reset")
+async def mock_reset():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+    return {"status": "reset"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
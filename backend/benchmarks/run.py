@@ -0,0 +1,96 @@
+"""
+Offline end-to-end benchmark.
+
+Generates the seeded corpus, starts the mock OpenAI server and the API
+(pointed at the mock through OPENAI_BASE_URL, with all state in a temporary
+directory), runs the load generator and shuts both servers down.
+
+Run from backend/: python -m benchmarks.run --concurrency 8 --requests 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks import corpus, loadgen
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"{url} did not come up in {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-port", type=int, default=8800)
+    parser.add_argument("--mock-port", type=int, default=8100)
+    parser.add_argument("--docs", type=int, default=12, help="Corpus size")
+    loadgen.add_arguments(parser)
+    args = parser.parse_args()
+
+    corpus.generate(args.corpus, args.docs, args.seed)
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+
+    with tempfile.TemporaryDirectory(prefix="compliance-bench-") as state_dir:
+        env = dict(os.environ)
+        env.update({
+            "OPENAI_BASE_URL": f"{mock_url}/v1",
+            "OPENAI_API_KEY": "sk-mock",
+            "CHROMA_PERSIST_DIRECTORY": os.path.join(state_dir, "chroma_db"),
+            "UPLOAD_DIRECTORY": os.path.join(state_dir, "uploads"),
+            "INGEST_JOBS_PATH": os.path.join(state_dir, "ingestion_jobs.sqlite"),
+            "LLM_CACHE_PATH": os.path.join(state_dir, "llm_cache.sqlite"),
+        })
+        # Measure uncached pipeline cost and don't download a reranker model, unless asked to
+        env.setdefault("LLM_CACHE_ENABLED", "false")
+        env.setdefault("RERANKER_ENABLED", "false")
+
+        servers = []
+        try:
+            servers.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.mock_openai", "--port", str(args.mock_port)],
+                cwd=BACKEND_DIR, env=env
+            ))
+            wait_until_up(f"{mock_url}/mock/stats", servers[-1])
+            servers.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.api_port), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env
+            ))
+            wait_until_up(f"{api_url}/health", servers[-1])
+
+            report = asyncio.run(loadgen.run(
+                api_url, mock_url, args.corpus, args.concurrency,
+                args.requests, args.mix, args.seed, args.skip_seed
+            ))
+        finally:
+            for server in reversed(servers):
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+    loadgen.print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
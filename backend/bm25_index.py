@@ -0,0 +1,163 @@
+from collections import Counter
+from langchain_core.documents import Document
+from document_tags import metadata_matches
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+TOKEN_PATTERN = re.compile(r"\d+(?:[.,]\d+)*|[a-z0-9]+")
+THOUSANDS_PATTERN = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word and number tokens for lexical matching.
+
+    Dotted section numbers ("1010.311") stay a single token and grouped
+    amounts are normalized ("$10,000" and "10000.00" both become "10000"),
+    so citations and thresholds match however the document formats them.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if THOUSANDS_PATTERN.fullmatch(token):
+            token = token.replace(",", "")
+        if token[0].isdigit() and re.fullmatch(r"\d+\.0+", token):
+            token = token.split(".")[0]
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    SQLite-backed inverted index scored with Okapi BM25.
+
+    Chunks are added and removed incrementally by chunk ID alongside the
+    Chroma collection. The index keeps each chunk's text and metadata, so
+    lexical hits can be returned without a round trip to Chroma.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id)")
+        self._conn.commit()
+        self._corpus_stats = None
+
+    def _stats(self) -> Tuple[int, float]:
+        """Chunk count and average chunk length; caller holds the lock"""
+        if self._corpus_stats is None:
+            count, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            self._corpus_stats = (count, avg_length or 0.0)
+        return self._corpus_stats
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._stats()[0]
+
+    def add(self, documents: Iterable[Document]) -> int:
+        """Index chunks that aren't indexed yet; returns how many were added"""
+        added = 0
+        with self._lock:
+            for doc in documents:
+                cid = getattr(doc, "id", None) or doc.metadata.get("chunk_id")
+                if not cid:
+                    continue
+                if self._conn.execute("SELECT 1 FROM chunks WHERE chunk_id = ?", (cid,)).fetchone():
+                    continue
+                terms = Counter(tokenize(doc.page_content))
+                self._conn.execute(
+                    "INSERT INTO chunks (chunk_id, length, content, metadata) VALUES (?, ?, ?, ?)",
+                    (cid, sum(terms.values()), doc.page_content, json.dumps(doc.metadata, default=str))
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                    [(term, cid, tf) for term, tf in terms.items()]
+                )
+                added += 1
+            if added:
+                self._conn.commit()
+                self._corpus_stats = None
+        return added
+
+    def delete(self, chunk_ids: Iterable[str]):
+        chunk_ids = [(cid,) for cid in chunk_ids]
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM postings WHERE chunk_id = ?", chunk_ids)
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", chunk_ids)
+            self._conn.commit()
+            self._corpus_stats = None
+
+    def update_metadata(self, chunk_id: str, metadata: Dict):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE chunks SET metadata = ? WHERE chunk_id = ?",
+                (json.dumps(metadata, default=str), chunk_id)
+            )
+            self._conn.commit()
+
+    def search(self, query: str, k: int = 5, where: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """Top-k chunks by BM25 score (higher is better), optionally limited by a metadata filter"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        scores: Dict[str, float] = {}
+        with self._lock:
+            count, avg_length = self._stats()
+            if not count:
+                return []
+            for term in terms:
+                rows = self._conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length FROM postings p "
+                    "JOIN chunks c ON c.chunk_id = p.chunk_id WHERE p.term = ?",
+                    (term,)
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+                for cid, tf, length in rows:
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length) if avg_length else self.k1
+                    scores[cid] = scores.get(cid, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            results = []
+            for cid, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+                content, metadata = self._conn.execute(
+                    "SELECT content, metadata FROM chunks WHERE chunk_id = ?", (cid,)
+                ).fetchone()
+                metadata = json.loads(metadata)
+                if not metadata_matches(metadata, where):
+                    continue
+                results.append((Document(page_content=content, metadata=metadata, id=cid), score))
+                if len(results) >= k:
+                    break
+        return results
@@ -0,0 +1,297 @@
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional, Tuple
+import asyncio
+import importlib.util
+import json
+import re
+import threading
+import time
+import httpx
+from config import Config
+from instrumentation import record_api_call, usage_callback
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from OpenAI reset headers ("20ms", "1s", "6m0s") or a plain number"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _request_model(request: httpx.Request) -> str:
+    """Model named in a JSON request body (the SDK writes it after messages/input)"""
+    try:
+        body = json.loads(request.content)
+    except (httpx.RequestNotRead, ValueError):
+        return "unknown"
+    model = body.get("model") if isinstance(body, dict) else None
+    return model if isinstance(model, str) else "unknown"
+
+
+def _header_int(headers: httpx.Headers, name: str) -> Optional[int]:
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class RateLimitTracker:
+    """
+    Per-model view of the OpenAI rate-limit headers.
+
+    Every response updates the model's remaining request/token budget and
+    reset times; once a budget is exhausted (or a 429 names a retry-after),
+    new requests for that model wait for the reset instead of all hitting
+    the API and failing together.
+    """
+
+    def __init__(self, max_wait_seconds: float = 30.0):
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict] = {}
+
+    def update(self, model: str, status_code: int, headers: httpx.Headers):
+        now = time.monotonic()
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        reset_requests = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        reset_tokens = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        retry_after = parse_duration(headers.get("retry-after-ms"))
+        retry_after = retry_after / 1000 if retry_after is not None else parse_duration(headers.get("retry-after"))
+
+        with self._lock:
+            state = self._models.setdefault(model, {"blocked_until": 0.0, "rate_limited": 0})
+            if remaining_requests is not None:
+                state["remaining_requests"] = remaining_requests
+            if remaining_tokens is not None:
+                state["remaining_tokens"] = remaining_tokens
+            blocked_until = 0.0
+            if remaining_requests == 0 and reset_requests:
+                blocked_until = max(blocked_until, now + reset_requests)
+            if remaining_tokens == 0 and reset_tokens:
+                blocked_until = max(blocked_until, now + reset_tokens)
+            if status_code == 429:
+                state["rate_limited"] += 1
+                blocked_until = max(blocked_until, now + (retry_after or 1.0))
+            if blocked_until:
+                state["blocked_until"] = max(state["blocked_until"], blocked_until)
+
+    def delay(self, model: str) -> float:
+        """Seconds to hold a request for `model` before sending it"""
+        with self._lock:
+            state = self._models.get(model)
+            if not state:
+                return 0.0
+            return min(max(0.0, state["blocked_until"] - time.monotonic()), self.max_wait_seconds)
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model: {
+                    "remaining_requests": state.get("remaining_requests"),
+                    "remaining_tokens": state.get("remaining_tokens"),
+                    "rate_limited": state["rate_limited"],
+                    "blocked_for_seconds": round(max(0.0, state["blocked_until"] - now), 3),
+                }
+                for model, state in self._models.items()
+            }
+
+
+class InFlightLimit:
+    """
+    One cap on in-flight requests, shared by the sync and async transports.
+
+    Backed by a thread semaphore; async callers that find it full wait for a
+    slot on a small dedicated thread pool, so the event loop never blocks and
+    waiting doesn't take threads from the default executor.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        # More waiters than slots can't all be woken at once; the rest queue
+        self._waiters = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="in-flight")
+
+    @contextmanager
+    def hold(self):
+        self._semaphore.acquire()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def ahold(self):
+        if not self._semaphore.acquire(blocking=False):
+            waiter = asyncio.get_running_loop().run_in_executor(self._waiters, self._semaphore.acquire)
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                # The waiting thread still takes a slot; give it back once it does
+                waiter.add_done_callback(lambda _: self._semaphore.release())
+                raise
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+class ThrottledTransport(httpx.BaseTransport):
+    """Caps in-flight requests and waits out exhausted rate limits before sending"""
+
+    def __init__(self, transport: httpx.BaseTransport, in_flight: InFlightLimit, rate_limits: RateLimitTracker):
+        self._transport = transport
+        self._in_flight = in_flight
+        self._rate_limits = rate_limits
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model = _request_model(request)
+        wait = self._rate_limits.delay(model)
+        if wait:
+            time.sleep(wait)
+        with self._in_flight.hold():
+            response = self._transport.handle_request(request)
+        record_api_call(request.url.path, response.status_code)
+        self._rate_limits.update(model, response.status_code, response.headers)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncThrottledTransport(httpx.AsyncBaseTransport):
+    """Async variant of ThrottledTransport"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, in_flight: InFlightLimit, rate_limits: RateLimitTracker):
+        self._transport = transport
+        self._in_flight = in_flight
+        self._rate_limits = rate_limits
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model = _request_model(request)
+        wait = self._rate_limits.delay(model)
+        if wait:
+            await asyncio.sleep(wait)
+        async with self._in_flight.ahold():
+            response = await self._transport.handle_async_request(request)
+        record_api_call(request.url.path, response.status_code)
+        self._rate_limits.update(model, response.status_code, response.headers)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ClientRegistry:
+    """
+    Single source of OpenAI chat and embedding clients.
+
+    All clients share one pooled sync and one pooled async httpx client
+    (HTTP/2 when the `h2` package is installed), so connections and TLS
+    sessions are reused across agents, and one concurrency limit and
+    rate-limit tracker applies to every request to the API.
+    """
+
+    def __init__(self):
+        self.http2 = Config.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+        self.rate_limits = RateLimitTracker(max_wait_seconds=Config.RATE_LIMIT_MAX_WAIT_SECONDS)
+        self.in_flight = InFlightLimit(Config.LLM_MAX_CONCURRENCY)
+        limits = httpx.Limits(
+            max_connections=Config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        timeout = httpx.Timeout(Config.HTTP_TIMEOUT_SECONDS, connect=10.0)
+        self.http_client = httpx.Client(
+            transport=ThrottledTransport(
+                httpx.HTTPTransport(http2=self.http2, limits=limits),
+                self.in_flight,
+                self.rate_limits,
+            ),
+            timeout=timeout,
+        )
+        self.http_async_client = httpx.AsyncClient(
+            transport=AsyncThrottledTransport(
+                httpx.AsyncHTTPTransport(http2=self.http2, limits=limits),
+                self.in_flight,
+                self.rate_limits,
+            ),
+            timeout=timeout,
+        )
+        self._chat: Dict[Tuple, ChatOpenAI] = {}
+        self._embeddings: Dict[str, OpenAIEmbeddings] = {}
+        self._lock = threading.Lock()
+
+    def chat(self, model: str, temperature: float = Config.TEMPERATURE, cache=None) -> ChatOpenAI:
+        """Shared chat client per (model, temperature, cache)"""
+        key = (model, temperature, id(cache) if cache is not None else None)
+        with self._lock:
+            if key not in self._chat:
+                kwargs = {}
+                if cache is not None:
+                    kwargs["cache"] = cache
+                if Config.OPENAI_BASE_URL:
+                    kwargs["base_url"] = Config.OPENAI_BASE_URL
+                self._chat[key] = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    http_client=self.http_client,
+                    http_async_client=self.http_async_client,
+                    callbacks=[usage_callback],
+                    **kwargs
+                )
+            return self._chat[key]
+
+    def embeddings(self, model: str = Config.EMBEDDING_MODEL) -> OpenAIEmbeddings:
+        """Shared embeddings client per model"""
+        with self._lock:
+            if model not in self._embeddings:
+                kwargs = {}
+                if Config.OPENAI_BASE_URL:
+                    # Compatible servers take strings, not pre-tokenized inputs
+                    kwargs = {"base_url": Config.OPENAI_BASE_URL, "check_embedding_ctx_length": False}
+                self._embeddings[model] = OpenAIEmbeddings(
+                    model=model,
+                    http_client=self.http_client,
+                    http_async_client=self.http_async_client,
+                    **kwargs
+                )
+            return self._embeddings[model]
+
+    def stats(self) -> Dict:
+        return {
+            "http2": self.http2,
+            "max_connections": Config.HTTP_MAX_CONNECTIONS,
+            "max_in_flight": Config.LLM_MAX_CONCURRENCY,
+            "rate_limits": self.rate_limits.snapshot(),
+        }
+
+    async def aclose(self):
+        self.http_client.close()
+        await self.http_async_client.aclose()
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Shared client registry for the vector store, caches and agents"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+        return _registry
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -5,12 +6,173 @@ load_dotenv()
 
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    # OpenAI-compatible endpoint to use instead of api.openai.com (e.g. the benchmark mock)
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
     CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+    # Ingested document fingerprints and chunk IDs; kept next to the Chroma data
+    DOCUMENT_REGISTRY_PATH = os.getenv(
+        "DOCUMENT_REGISTRY_PATH",
+        os.path.join(CHROMA_PERSIST_DIRECTORY, "document_registry.sqlite")
+    )
     PORT = int(os.getenv("PORT", 8000))
     ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+    # Seconds between SSE keep-alive comments so proxies don't drop idle streams
+    SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
     
     # Model configurations
     EMBEDDING_MODEL = "text-embedding-3-small"
-    LLM_MODEL = "gpt-4-turbo-preview"
+    LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4-turbo-preview")
     TEMPERATURE = 0.1
 
+    # Tiered model routing. Agent planning loops default to LLM_MODEL; simple
+    # tool sub-calls go to LLM_SMALL_MODEL. Both maps accept JSON overrides
+    # via AGENT_MODELS / TOOL_MODELS, keyed by agent or tool name.
+    LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "gpt-4o-mini")
+    AGENT_MODELS = json.loads(os.getenv("AGENT_MODELS", "{}"))
+    TOOL_MODELS = {
+        "refine_query": LLM_SMALL_MODEL,
+        "extract_regulations": LLM_SMALL_MODEL,
+        "extract_thresholds": LLM_SMALL_MODEL,
+        "check_threshold_violation": LLM_SMALL_MODEL,
+        "compile_section": LLM_SMALL_MODEL,
+        "extract_knowledge": LLM_SMALL_MODEL,
+        "verify_claim_against_source": LLM_MODEL,
+        **json.loads(os.getenv("TOOL_MODELS", "{}")),
+    }
+    # Retry a small-model answer on LLM_MODEL when it looks unsure
+    LLM_ESCALATION_ENABLED = os.getenv("LLM_ESCALATION_ENABLED", "true").lower() == "true"
+    # (input, output) USD per 1M tokens, for per-request cost estimates
+    MODEL_PRICES = {
+        "gpt-4-turbo": [10.0, 30.0],
+        "gpt-4o": [2.5, 10.0],
+        "gpt-4o-mini": [0.15, 0.6],
+        **json.loads(os.getenv("MODEL_PRICES", "{}")),
+    }
+
+    # Shared HTTP connection pool for all OpenAI chat and embedding clients
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", 30))
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", 120))
+    # Requests to the API in flight at once, across the sync and async clients
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+    # Longest a request waits for an exhausted per-model rate limit to reset
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", 30))
+
+    # LRU cache of query embeddings used by vector searches
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+    # Search results cached until the next ingest; 0 disables the cache
+    RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 1024))
+
+    # Hybrid retrieval: BM25 index next to Chroma, fused with reciprocal-rank fusion
+    BM25_INDEX_PATH = os.getenv(
+        "BM25_INDEX_PATH",
+        os.path.join(CHROMA_PERSIST_DIRECTORY, "bm25_index.sqlite")
+    )
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", 60))
+    # Candidates fetched from each retriever per requested result before fusion
+    HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", 4))
+
+    # Retriever fast path: a deterministic multi-query search that skips the agent
+    # loop when enough hits reach RETRIEVER_MIN_RELEVANCE (cosine similarity)
+    RETRIEVER_FAST_PATH = os.getenv("RETRIEVER_FAST_PATH", "true").lower() == "true"
+    RETRIEVER_MIN_RELEVANCE = float(os.getenv("RETRIEVER_MIN_RELEVANCE", 0.45))
+    RETRIEVER_FAST_PATH_K = int(os.getenv("RETRIEVER_FAST_PATH_K", 5))
+    RETRIEVER_FAST_PATH_MIN_DOCS = int(os.getenv("RETRIEVER_FAST_PATH_MIN_DOCS", 3))
+
+    # Reranking: cross-encoder when available, lexical heuristic otherwise
+    RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "true").lower() == "true"
+    RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    # Token budgets for reranked chunks packed into each agent's prompts and tool results
+    RERANK_TOKEN_BUDGETS = {
+        "retriever_context": int(os.getenv("RERANK_BUDGET_RETRIEVER_CONTEXT", 3000)),
+        "retriever_tool": int(os.getenv("RERANK_BUDGET_RETRIEVER_TOOL", 1200)),
+        "policy_extractor": int(os.getenv("RERANK_BUDGET_POLICY_EXTRACTOR", 600)),
+        "risk_classifier": int(os.getenv("RERANK_BUDGET_RISK_CLASSIFIER", 600)),
+        "hallucination_guard": int(os.getenv("RERANK_BUDGET_HALLUCINATION_GUARD", 1500)),
+        "hallucination_guard_tool": int(os.getenv("RERANK_BUDGET_HALLUCINATION_GUARD_TOOL", 600)),
+        "report_generator": int(os.getenv("RERANK_BUDGET_REPORT_GENERATOR", 400)),
+    }
+
+    # Token budget for the retrieved/upstream text in each agent prompt, by model
+    # (JSON object, e.g. {"gpt-4o-mini": 3000}); CONTEXT_TOKEN_BUDGET for other models
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2000))
+    CONTEXT_TOKEN_BUDGETS = json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}"))
+    # Share of the model's budget used by single-purpose tool prompts
+    TOOL_CONTEXT_SHARE = float(os.getenv("TOOL_CONTEXT_SHARE", 0.4))
+
+    # Ingestion embedding pipeline
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))
+    EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+    EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 5))
+    EMBEDDING_BACKOFF_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_SECONDS", 1.0))
+
+    # Background ingestion jobs
+    UPLOAD_DIRECTORY = os.getenv("UPLOAD_DIRECTORY", "./uploads")
+    INGEST_JOBS_PATH = os.getenv("INGEST_JOBS_PATH", "./cache/ingestion_jobs.sqlite")
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+    UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+
+    # Regulations/thresholds/citations extracted per stored chunk by a background worker
+    KNOWLEDGE_BASE_ENABLED = os.getenv("KNOWLEDGE_BASE_ENABLED", "true").lower() == "true"
+    KNOWLEDGE_BASE_PATH = os.getenv("KNOWLEDGE_BASE_PATH", "./cache/knowledge_base.sqlite")
+    KNOWLEDGE_EXTRACTION_CONCURRENCY = int(os.getenv("KNOWLEDGE_EXTRACTION_CONCURRENCY", 4))
+    # Extraction attempts per chunk before it waits for the next startup backfill
+    KNOWLEDGE_EXTRACTION_MAX_ATTEMPTS = int(os.getenv("KNOWLEDGE_EXTRACTION_MAX_ATTEMPTS", 3))
+    # Answer policy extraction from the knowledge base when it covers every retrieved chunk
+    POLICY_KNOWLEDGE_FAST_PATH = os.getenv("POLICY_KNOWLEDGE_FAST_PATH", "true").lower() == "true"
+
+    # Rule-based threshold checks: extra/override thresholds (JSON list) and
+    # static conversion rates for comparing amounts across currencies
+    THRESHOLD_TABLE_PATH = os.getenv("THRESHOLD_TABLE_PATH") or None
+    FX_RATES_TO_USD = {
+        "USD": 1.0,
+        "EUR": 1.08,
+        "GBP": 1.27,
+        **json.loads(os.getenv("FX_RATES_TO_USD", "{}")),
+    }
+
+    # Batch screening: groups analysed at once, input size cap and where file output goes
+    BATCH_GROUP_CONCURRENCY = int(os.getenv("BATCH_GROUP_CONCURRENCY", 4))
+    BATCH_MAX_TRANSACTIONS = int(os.getenv("BATCH_MAX_TRANSACTIONS", 100000))
+    BATCH_OUTPUT_DIRECTORY = os.getenv("BATCH_OUTPUT_DIRECTORY", "./batch_results")
+    BATCH_JOBS_PATH = os.getenv("BATCH_JOBS_PATH", "./cache/batch_jobs.sqlite")
+    # Finished file batches (and their output files) are deleted after this long
+    BATCH_JOB_RETENTION_HOURS = float(os.getenv("BATCH_JOB_RETENTION_HOURS", 24 * 7))
+
+    # Vectorized batch risk scoring: points per risk factor (the sum is clipped
+    # to 0-100). Amount points are interpolated between the USD band edges;
+    # type and customer weights match by keyword, taking the largest.
+    RISK_AMOUNT_BANDS_USD = [[0, 1000, 10000, 100000, 1000000], [0, 5, 10, 20, 30]]
+    RISK_REGION_WEIGHTS = {
+        "US": 0, "EU": 0, "UK": 0, "INTL": 10,
+        **json.loads(os.getenv("RISK_REGION_WEIGHTS", "{}")),
+    }
+    RISK_UNLISTED_REGION_WEIGHT = float(os.getenv("RISK_UNLISTED_REGION_WEIGHT", 15))
+    RISK_TYPE_WEIGHTS = {
+        "crypto": 20, "cash": 10, "wire": 10, "transfer": 5,
+        **json.loads(os.getenv("RISK_TYPE_WEIGHTS", "{}")),
+    }
+    RISK_CUSTOMER_WEIGHTS = {
+        "pep": 30, "shell": 25, "non-profit": 10, "business": 10, "corporate": 10,
+        **json.loads(os.getenv("RISK_CUSTOMER_WEIGHTS", "{}")),
+    }
+    RISK_THRESHOLD_EXCEEDED_WEIGHT = float(os.getenv("RISK_THRESHOLD_EXCEEDED_WEIGHT", 25))
+    RISK_STRUCTURING_WEIGHT = float(os.getenv("RISK_STRUCTURING_WEIGHT", 45))
+    # Scores this close to a tier boundary (and unparseable amounts) go to the
+    # risk classification agent, at most RISK_AGENT_MAX_PER_BATCH per batch
+    RISK_BORDERLINE_MARGIN = float(os.getenv("RISK_BORDERLINE_MARGIN", 3))
+    RISK_AGENT_MAX_PER_BATCH = int(os.getenv("RISK_AGENT_MAX_PER_BATCH", 50))
+
+    # LLM response cache shared by the agents' tool sub-calls
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./cache/llm_cache.sqlite")
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 86400))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+    # Cosine similarity for near-duplicate prompt hits; 0 disables the embedding lookup
+    LLM_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("LLM_CACHE_SIMILARITY_THRESHOLD", 0))
+    # Most recently used entries compared per embedding lookup
+    LLM_CACHE_SEMANTIC_CANDIDATES = int(os.getenv("LLM_CACHE_SEMANTIC_CANDIDATES", 500))
+
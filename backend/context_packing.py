@@ -0,0 +1,114 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Union
+import re
+from config import Config
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+CHUNK_SEPARATOR = "\n\n"
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    """tiktoken encoding for a model (cl100k_base for unknown models), or None when
+    tiktoken or its encoding files (downloaded on first use) are unavailable"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(texts: Union[str, Iterable[str]], model: Optional[str] = None) -> int:
+    """Token count of one text or a list of texts (~4 chars/token without tiktoken)"""
+    if isinstance(texts, str):
+        texts = [texts]
+    encoding = _encoding(model)
+    if encoding is None:
+        return sum(len(text) for text in texts) // 4
+    return sum(len(encoding.encode(text, disallowed_special=())) for text in texts)
+
+
+def _hard_cut(text: str, max_tokens: int, model: Optional[str]) -> str:
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Longest prefix of `text` within `max_tokens`, cut at a chunk boundary
+    (blank line) or, inside the chunk that overflows, at a sentence boundary.
+
+    Only a single sentence longer than the whole budget is cut mid-sentence.
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    kept: List[str] = []
+    used = 0
+    for chunk in text.split(CHUNK_SEPARATOR):
+        separator = count_tokens(CHUNK_SEPARATOR, model) if kept else 0
+        tokens = count_tokens(chunk, model)
+        if used + separator + tokens <= max_tokens:
+            kept.append(chunk)
+            used += separator + tokens
+            continue
+
+        sentences: List[str] = []
+        for sentence in SENTENCE_BOUNDARY.split(chunk):
+            candidate = " ".join(sentences + [sentence])
+            if used + separator + count_tokens(candidate, model) > max_tokens:
+                break
+            sentences.append(sentence)
+        if sentences:
+            kept.append(" ".join(sentences))
+        break
+
+    if not kept:
+        return _hard_cut(text, max_tokens, model)
+    return CHUNK_SEPARATOR.join(kept)
+
+
+def context_budget(model: Optional[str], share: float = 1.0) -> int:
+    """Prompt context budget in tokens for a model, optionally a share of it"""
+    budget = Config.CONTEXT_TOKEN_BUDGETS.get(model or "", Config.CONTEXT_TOKEN_BUDGET)
+    return int(budget * share)
+
+
+def fit_sections(sections: Dict[str, str], shares: Dict[str, float], budget: int,
+                 model: Optional[str] = None) -> Dict[str, str]:
+    """
+    Split a token budget across prompt sections by their shares and truncate each.
+
+    Sections shorter than their share hand the unused tokens to the others,
+    so the budget goes to the text that needs it instead of padding.
+    """
+    tokens = {name: count_tokens(text, model) for name, text in sections.items()}
+    allocation = {name: 0 for name in sections}
+    open_sections = {name for name in sections if tokens[name]}
+    remaining = budget
+    while open_sections and remaining > 0:
+        total_share = sum(shares.get(name, 1.0) for name in open_sections)
+        granted = 0
+        for name in list(open_sections):
+            portion = int(remaining * shares.get(name, 1.0) / total_share)
+            grant = min(portion, tokens[name] - allocation[name])
+            allocation[name] += grant
+            granted += grant
+            if allocation[name] >= tokens[name]:
+                open_sections.discard(name)
+        remaining -= granted
+        if not granted:
+            break
+    return {name: truncate_to_tokens(text, allocation[name], model) for name, text in sections.items()}
@@ -0,0 +1,119 @@
+from typing import Iterable, Optional, Set
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def chunk_id(content: str) -> str:
+    """Content-derived chunk ID: identical chunk text always maps to the same ID"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentRegistry:
+    """
+    Tracks which chunk IDs each ingested document contributed and the
+    fingerprint of the version they came from, so re-ingesting an unchanged
+    document is a no-op and a new version only replaces the chunks that changed.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                doc_key TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (doc_key, chunk_id)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_document_chunks_chunk ON document_chunks(chunk_id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS migrations (
+                name TEXT PRIMARY KEY,
+                completed_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def migration_done(self, name: str) -> bool:
+        """Whether a one-off store migration has completed"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone() is not None
+
+    def mark_migration_done(self, name: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO migrations (name, completed_at) VALUES (?, ?)", (name, time.time())
+            )
+            self._conn.commit()
+
+    def fingerprint(self, doc_key: str) -> Optional[str]:
+        """Fingerprint of the last ingested version of a document"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM documents WHERE doc_key = ?", (doc_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def chunk_ids(self, doc_key: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM document_chunks WHERE doc_key = ?", (doc_key,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def replace(self, doc_key: str, fingerprint: str, chunk_ids: Iterable[str]) -> Set[str]:
+        """
+        Record a new version of a document.
+
+        Returns the chunk IDs of the previous version that no document
+        references anymore and can be deleted from the vector store.
+        """
+        chunk_ids = set(chunk_ids)
+        with self._lock:
+            previous = {
+                row[0] for row in self._conn.execute(
+                    "SELECT chunk_id FROM document_chunks WHERE doc_key = ?", (doc_key,)
+                ).fetchall()
+            }
+            self._conn.execute("DELETE FROM document_chunks WHERE doc_key = ?", (doc_key,))
+            self._conn.executemany(
+                "INSERT INTO document_chunks (doc_key, chunk_id) VALUES (?, ?)",
+                [(doc_key, cid) for cid in chunk_ids]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_key, fingerprint, chunk_count, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (doc_key, fingerprint, len(chunk_ids), time.time())
+            )
+            orphaned = set()
+            for cid in previous - chunk_ids:
+                still_used = self._conn.execute(
+                    "SELECT 1 FROM document_chunks WHERE chunk_id = ? LIMIT 1", (cid,)
+                ).fetchone()
+                if not still_used:
+                    orphaned.add(cid)
+            self._conn.commit()
+        return orphaned
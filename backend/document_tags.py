@@ -0,0 +1,143 @@
+from typing import Dict, Optional
+import re
+
+# Keywords that identify a document's jurisdiction; INTL covers standard setters
+JURISDICTION_KEYWORDS = {
+    "EU": ["GDPR", "AMLD", "European Union", "Directive (EU)", "Regulation (EU)", "EBA", "PSD2", "MiCA"],
+    "US": ["BSA", "Bank Secrecy Act", "FinCEN", "31 CFR", "OFAC", "USA PATRIOT", "U.S.C."],
+    "UK": ["FCA", "Money Laundering Regulations 2017", "Proceeds of Crime Act", "HM Treasury"],
+    "INTL": ["FATF", "Basel Committee", "Wolfsberg", "Egmont"],
+}
+
+REGULATION_FAMILY_KEYWORDS = {
+    "AML": ["anti-money laundering", "money laundering", "AML", "AMLD", "BSA", "suspicious activity", "FATF"],
+    "KYC": ["KYC", "know your customer", "customer due diligence", "beneficial owner"],
+    "SANCTIONS": ["sanctions", "OFAC", "SDN", "asset freeze"],
+    "PRIVACY": ["GDPR", "data protection", "personal data", "privacy"],
+    "PAYMENTS": ["PSD2", "funds transfer", "wire transfer", "travel rule", "payment services"],
+}
+
+EU_MEMBER_STATES = [
+    "AUSTRIA", "BELGIUM", "BULGARIA", "CROATIA", "CYPRUS", "CZECHIA", "CZECH REPUBLIC", "DENMARK",
+    "ESTONIA", "FINLAND", "FRANCE", "GERMANY", "GREECE", "HUNGARY", "IRELAND", "ITALY", "LATVIA",
+    "LITHUANIA", "LUXEMBOURG", "MALTA", "NETHERLANDS", "THE NETHERLANDS", "POLAND", "PORTUGAL",
+    "ROMANIA", "SLOVAKIA", "SLOVENIA", "SPAIN", "SWEDEN",
+]
+
+US_STATES = [
+    "ALABAMA", "ALASKA", "ARIZONA", "ARKANSAS", "CALIFORNIA", "COLORADO", "CONNECTICUT", "DELAWARE",
+    "FLORIDA", "GEORGIA", "HAWAII", "IDAHO", "ILLINOIS", "INDIANA", "IOWA", "KANSAS", "KENTUCKY",
+    "LOUISIANA", "MAINE", "MARYLAND", "MASSACHUSETTS", "MICHIGAN", "MINNESOTA", "MISSISSIPPI",
+    "MISSOURI", "MONTANA", "NEBRASKA", "NEVADA", "NEW HAMPSHIRE", "NEW JERSEY", "NEW MEXICO",
+    "NEW YORK", "NORTH CAROLINA", "NORTH DAKOTA", "OHIO", "OKLAHOMA", "OREGON", "PENNSYLVANIA",
+    "RHODE ISLAND", "SOUTH CAROLINA", "SOUTH DAKOTA", "TENNESSEE", "TEXAS", "UTAH", "VERMONT",
+    "VIRGINIA", "WASHINGTON", "WEST VIRGINIA", "WISCONSIN", "WYOMING", "DISTRICT OF COLUMBIA",
+    "WASHINGTON DC", "PUERTO RICO",
+]
+
+UK_NATIONS = ["ENGLAND", "SCOTLAND", "WALES", "NORTHERN IRELAND", "GREAT BRITAIN", "BRITAIN"]
+
+# Free-text transaction regions mapped onto jurisdiction tags: countries and
+# states map to the bloc whose regulations cover them
+REGION_ALIASES = {
+    "EUROPE": "EU",
+    "EUROPEAN UNION": "EU",
+    "EUROZONE": "EU",
+    "USA": "US",
+    "UNITED STATES": "US",
+    "UNITED STATES OF AMERICA": "US",
+    "AMERICA": "US",
+    "GB": "UK",
+    "UNITED KINGDOM": "UK",
+    "GLOBAL": "INTL",
+    "INTERNATIONAL": "INTL",
+    **{country: "EU" for country in EU_MEMBER_STATES},
+    **{state: "US" for state in US_STATES},
+    **{nation: "UK" for nation in UK_NATIONS},
+}
+
+# Tags that apply regardless of the transaction's region
+UNIVERSAL_JURISDICTIONS = ["INTL", "GENERAL"]
+# Every jurisdiction a document can be tagged with
+KNOWN_JURISDICTIONS = {*JURISDICTION_KEYWORDS, *UNIVERSAL_JURISDICTIONS}
+
+
+def _best_match(text: str, keywords: Dict[str, list], default: str) -> str:
+    counts = {
+        tag: sum(len(re.findall(rf"(?<!\w){re.escape(word)}(?!\w)", text, re.IGNORECASE)) for word in words)
+        for tag, words in keywords.items()
+    }
+    tag, count = max(counts.items(), key=lambda item: item[1])
+    return tag if count else default
+
+
+def detect_tags(text: str) -> Dict[str, str]:
+    """Jurisdiction and regulation family of a document from keyword counts"""
+    return {
+        "jurisdiction": _best_match(text, JURISDICTION_KEYWORDS, "GENERAL"),
+        "regulation_family": _best_match(text, REGULATION_FAMILY_KEYWORDS, "GENERAL"),
+    }
+
+
+def normalize_jurisdiction(region: Optional[str]) -> Optional[str]:
+    """Jurisdiction tag for a free-text region ("Germany" -> "EU", "Austin, Texas" -> "US");
+    regions without a known alias come back upper-cased"""
+    if not region or not region.strip():
+        return None
+    region = " ".join(region.replace(".", "").split()).upper()
+    # "City, State" / "City, Country": the broadest part that names a region wins
+    for part in reversed([part.strip() for part in region.split(",")]):
+        if part in REGION_ALIASES or part in KNOWN_JURISDICTIONS:
+            return REGION_ALIASES.get(part, part)
+    return region
+
+
+def jurisdiction_filter(region: Optional[str]) -> Optional[Dict]:
+    """Chroma `where` clause limiting a search to the region plus universal documents.
+
+    Only regions that map onto a document jurisdiction are filtered on; any
+    other region ("Japan") would match nothing but the universal documents.
+    """
+    jurisdiction = normalize_jurisdiction(region)
+    if jurisdiction not in KNOWN_JURISDICTIONS:
+        return None
+    return {"jurisdiction": {"$in": list(dict.fromkeys([jurisdiction] + UNIVERSAL_JURISDICTIONS))}}
+
+
+def metadata_matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma-style `where` clause against a metadata dict"""
+    if not where:
+        return True
+    for field, condition in where.items():
+        if field == "$and":
+            if not all(metadata_matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(metadata_matches(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+    return True
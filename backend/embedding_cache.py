@@ -0,0 +1,89 @@
+from langchain_core.embeddings import Embeddings
+from collections import OrderedDict
+from typing import Dict, List
+import threading
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client with an in-memory LRU cache for query embeddings.
+
+    Document embeddings (ingestion) pass straight through. Query strings are
+    whitespace-normalized before lookup, and `embed_queries` embeds all cache
+    misses of a batch in a single request.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 2048):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "embedding_calls": 0}
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def _get(self, key: str):
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+            else:
+                self._stats["misses"] += 1
+            return vector
+
+    def _put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._normalize(text)
+        vector = self._get(key)
+        if vector is None:
+            with self._lock:
+                self._stats["embedding_calls"] += 1
+            vector = self.embeddings.embed_query(key)
+            self._put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._normalize(text)
+        vector = self._get(key)
+        if vector is None:
+            with self._lock:
+                self._stats["embedding_calls"] += 1
+            vector = await self.embeddings.aembed_query(key)
+            self._put(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, sending all cache misses in one batched call"""
+        keys = [self._normalize(text) for text in texts]
+        vectors = {key: self._get(key) for key in dict.fromkeys(keys)}
+        misses = [key for key, vector in vectors.items() if vector is None]
+        if misses:
+            with self._lock:
+                self._stats["embedding_calls"] += 1
+            for key, vector in zip(misses, self.embeddings.embed_documents(misses)):
+                vectors[key] = vector
+                self._put(key, vector)
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._cache)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
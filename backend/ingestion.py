@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from langchain_core.documents import Document
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from context_packing import count_tokens
+import random
+import threading
+import time
+import uuid
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for transient 429s; exhausted quota is not worth retrying"""
+    message = str(error).lower()
+    if "insufficient_quota" in message:
+        return False
+    return getattr(error, "status_code", None) == 429 or "429" in message or "rate limit" in message
+
+
+def batched(documents: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    """Group a document stream into lists of at most `size` without materializing it"""
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestionMetrics:
+    """Cumulative embedding throughput counters, used to size batch size and concurrency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.chunks = 0
+        self.tokens = 0
+        self.batches = 0
+        self.retries = 0
+        self.seconds = 0.0
+
+    def record(self, stats: Dict):
+        with self._lock:
+            self.runs += 1
+            self.chunks += stats["chunks"]
+            self.tokens += stats["tokens"]
+            self.batches += stats["batches"]
+            self.retries += stats["retries"]
+            self.seconds += stats["seconds"]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "chunks": self.chunks,
+                "tokens": self.tokens,
+                "batches": self.batches,
+                "retries": self.retries,
+                "seconds": round(self.seconds, 3),
+                "chunks_per_sec": round(self.chunks / self.seconds, 2) if self.seconds else 0.0,
+                "tokens_per_sec": round(self.tokens / self.seconds, 2) if self.seconds else 0.0,
+            }
+
+
+class EmbeddingPipeline:
+    """
+    Embeds document chunks in fixed-size batches with a bounded number of
+    batches in flight, retrying rate-limited batches with exponential backoff,
+    and writes each embedded batch to the Chroma collection as it completes.
+
+    Chunks are pulled from the input iterable only as batch slots free up, so
+    peak memory is bounded by batch_size * concurrency rather than by the
+    size of the document.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        vector_store,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+    ):
+        self.embeddings = embeddings
+        self.vector_store = vector_store
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.metrics = IngestionMetrics()
+
+    def _embed_batch(self, texts: List[str]) -> Dict:
+        retries = 0
+        while True:
+            try:
+                return {"embeddings": self.embeddings.embed_documents(texts), "retries": retries}
+            except Exception as e:
+                if not is_rate_limit_error(e) or retries >= self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** retries)
+                time.sleep(delay + random.uniform(0, delay / 2))
+                retries += 1
+
+    def _write_batch(self, batch: List[Document], ids: List[str], embeddings: List[List[float]]):
+        self.vector_store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[doc.page_content for doc in batch],
+            metadatas=[
+                {k: v for k, v in doc.metadata.items() if v is not None} or None
+                for doc in batch
+            ],
+        )
+
+    def _existing_ids(self, ids: List[str]) -> set:
+        """IDs already stored in the collection"""
+        return set(self.vector_store._collection.get(ids=ids, include=[])["ids"])
+
+    def run(
+        self,
+        documents: Iterable[Document],
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        skip_existing: bool = False,
+        on_stored: Optional[Callable[[List[Document]], None]] = None,
+    ) -> Dict:
+        """Embed and store a stream of chunks; returns the chunk IDs and run statistics
+
+        Chunks keep their `id` when set; others get a random UUID. With
+        `skip_existing`, chunks whose ID is already in the collection are not
+        embedded again. `on_stored` receives each batch of chunks once it is
+        in the collection (written by this run or already there).
+        """
+        ids: List[str] = []
+        stats = {"chunks": 0, "tokens": 0, "batches": 0, "retries": 0, "chunks_total": 0, "chunks_skipped": 0}
+        start = time.perf_counter()
+
+        def complete(in_flight: Dict, return_when) -> None:
+            done, _ = wait(in_flight, return_when=return_when)
+            for future in done:
+                batch, batch_ids = in_flight.pop(future)
+                result = future.result()
+                self._write_batch(batch, batch_ids, result["embeddings"])
+                if on_stored:
+                    on_stored(batch)
+                stats["chunks"] += len(batch)
+                stats["tokens"] += count_tokens([doc.page_content for doc in batch])
+                stats["batches"] += 1
+                stats["retries"] += result["retries"]
+                if on_progress:
+                    on_progress({"chunks_embedded": stats["chunks"], "chunks_total": stats["chunks_total"]})
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight: Dict = {}
+            for batch in batched(documents, self.batch_size):
+                batch_ids = [getattr(doc, "id", None) or str(uuid.uuid4()) for doc in batch]
+                ids.extend(batch_ids)
+                stats["chunks_total"] += len(batch)
+                if skip_existing:
+                    existing = self._existing_ids(batch_ids)
+                    if existing:
+                        stats["chunks_skipped"] += len(existing)
+                        if on_stored:
+                            on_stored([doc for doc, cid in zip(batch, batch_ids) if cid in existing])
+                        kept = [(doc, cid) for doc, cid in zip(batch, batch_ids) if cid not in existing]
+                        if not kept:
+                            continue
+                        batch, batch_ids = [list(x) for x in zip(*kept)]
+                while len(in_flight) >= self.concurrency:
+                    complete(in_flight, FIRST_COMPLETED)
+                future = executor.submit(self._embed_batch, [doc.page_content for doc in batch])
+                in_flight[future] = (batch, batch_ids)
+            while in_flight:
+                complete(in_flight, FIRST_COMPLETED)
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["chunks_per_sec"] = round(stats["chunks"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+        stats["tokens_per_sec"] = round(stats["tokens"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+        self.metrics.record(stats)
+        if on_progress:
+            on_progress(dict(stats, seconds=round(stats["seconds"], 3)))
+        return {"ids": ids, "stats": stats}
@@ -0,0 +1,254 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Histogram
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import functools
+import threading
+import time
+from config import Config
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0, 160.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+TOKEN_BUCKETS = (0, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+COST_BUCKETS = (0.0, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+STAGE_SECONDS = Histogram(
+    "compliance_stage_seconds", "Wall time of workflow nodes, agent tools, searches and ingestion",
+    ["kind", "name"], buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "compliance_request_seconds", "Wall time per instrumented API request", ["endpoint"], buckets=LATENCY_BUCKETS
+)
+REQUEST_LLM_CALLS = Histogram(
+    "compliance_request_llm_calls", "Chat completion API calls per request", ["endpoint"], buckets=COUNT_BUCKETS
+)
+REQUEST_EMBEDDING_CALLS = Histogram(
+    "compliance_request_embedding_calls", "Embedding API calls per request", ["endpoint"], buckets=COUNT_BUCKETS
+)
+REQUEST_TOKENS = Histogram(
+    "compliance_request_tokens", "LLM tokens per request", ["endpoint", "kind"], buckets=TOKEN_BUCKETS
+)
+REQUEST_RETRIES = Histogram(
+    "compliance_request_retries", "Retries per request", ["endpoint", "kind"], buckets=COUNT_BUCKETS
+)
+REQUEST_COST = Histogram(
+    "compliance_request_cost_usd", "Estimated LLM cost per request", ["endpoint"], buckets=COST_BUCKETS
+)
+LLM_TOKENS = Counter("compliance_llm_tokens", "LLM tokens by model", ["model", "kind"])
+API_CALLS = Counter("compliance_openai_api_calls", "OpenAI API calls by endpoint and status", ["api", "status"])
+
+RETRY_KINDS = ("hallucination", "escalation", "api")
+
+
+def _model_price(model: str) -> Optional[List[float]]:
+    """(input, output) USD per 1M tokens, matching dated snapshots by their base name"""
+    if model in Config.MODEL_PRICES:
+        return Config.MODEL_PRICES[model]
+    matches = [name for name in Config.MODEL_PRICES if model.startswith(name)]
+    return Config.MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+class RequestMetrics:
+    """
+    Per-request wall time, LLM usage and retry counters.
+
+    One instance is bound to the request's context by `track_request` and
+    shared (by reference) with every task and worker thread the request
+    spawns, so updates are lock-protected.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._timings: Dict[str, Dict[str, Dict]] = {}
+        self.llm_calls = 0
+        self.llm_cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.embedding_calls = 0
+        self.retries = {kind: 0 for kind in RETRY_KINDS}
+
+    def add_timing(self, kind: str, name: str, seconds: float):
+        with self._lock:
+            entry = self._timings.setdefault(kind, {}).setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+
+    def add_usage(self, model: str, prompt_tokens: int, completion_tokens: int):
+        price = _model_price(model)
+        cost = (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000 if price else 0.0
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost_usd += cost
+
+    def add_cache_hit(self):
+        with self._lock:
+            self.llm_cache_hits += 1
+
+    def add_api_call(self, api: str):
+        with self._lock:
+            if api == "embeddings":
+                self.embedding_calls += 1
+            else:
+                self.llm_calls += 1
+
+    def add_retry(self, kind: str):
+        with self._lock:
+            self.retries[kind] = self.retries.get(kind, 0) + 1
+
+    @property
+    def total_seconds(self) -> float:
+        return (self._end or time.perf_counter()) - self._start
+
+    def finish(self):
+        self._end = time.perf_counter()
+        endpoint = self.endpoint
+        REQUEST_SECONDS.labels(endpoint).observe(self.total_seconds)
+        REQUEST_LLM_CALLS.labels(endpoint).observe(self.llm_calls)
+        REQUEST_EMBEDDING_CALLS.labels(endpoint).observe(self.embedding_calls)
+        REQUEST_TOKENS.labels(endpoint, "prompt").observe(self.prompt_tokens)
+        REQUEST_TOKENS.labels(endpoint, "completion").observe(self.completion_tokens)
+        REQUEST_COST.labels(endpoint).observe(self.cost_usd)
+        for kind, count in self.retries.items():
+            REQUEST_RETRIES.labels(endpoint, kind).observe(count)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            timings = {
+                kind: {
+                    name: {"calls": entry["calls"], "seconds": round(entry["seconds"], 4)}
+                    for name, entry in sorted(entries.items(), key=lambda item: -item[1]["seconds"])
+                }
+                for kind, entries in self._timings.items()
+            }
+            return {
+                "total_seconds": round(self.total_seconds, 4),
+                "stages": timings.get("stage", {}),
+                "tools": timings.get("tool", {}),
+                "search": timings.get("search", {}),
+                "llm_calls": self.llm_calls,
+                "llm_cache_hits": self.llm_cache_hits,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost_usd": round(self.cost_usd, 6),
+                "embedding_calls": self.embedding_calls,
+                "retries": dict(self.retries, total=sum(self.retries.values())),
+            }
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def track_request(endpoint: str):
+    """Bind a fresh RequestMetrics to the current context for the duration of a request"""
+    metrics = RequestMetrics(endpoint)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.finish()
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A streaming body closed from another context (client disconnect)
+            pass
+
+
+@contextmanager
+def timed(kind: str, name: str):
+    """Record the wall time of a block in the stage histogram and the current request, if any.
+    Also usable as a decorator on sync functions."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(kind, name).observe(seconds)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add_timing(kind, name, seconds)
+
+
+def record_retry(kind: str):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_retry(kind)
+
+
+def record_api_call(path: str, status_code: int):
+    """Count an OpenAI HTTP call; rate-limited and 5xx responses are retried by the client"""
+    api = "embeddings" if path.endswith("/embeddings") else "chat"
+    API_CALLS.labels(api, str(status_code)).inc()
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_api_call(api)
+        if status_code == 429 or status_code >= 500:
+            metrics.add_retry("api")
+
+
+def instrument_tools(tools: list) -> list:
+    """Time every call of each StructuredTool's sync and async implementation"""
+    for tool in tools:
+        if tool.func is not None:
+            tool.func = _timed_function(tool.name, tool.func)
+        if tool.coroutine is not None:
+            tool.coroutine = _timed_coroutine(tool.name, tool.coroutine)
+    return tools
+
+
+def _timed_function(name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed("tool", name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _timed_coroutine(name: str, coroutine):
+    @functools.wraps(coroutine)
+    async def wrapper(*args, **kwargs):
+        with timed("tool", name):
+            return await coroutine(*args, **kwargs)
+    return wrapper
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Adds each chat completion's token usage (and estimated cost) to the current request"""
+
+    run_inline = True
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        llm_output = response.llm_output or {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if not usage:
+                    continue
+                metrics = _current.get()
+                # Cache hits replay the original usage with the cost zeroed out
+                if usage.get("total_cost") == 0:
+                    if metrics is not None:
+                        metrics.add_cache_hit()
+                    continue
+                model = message.response_metadata.get("model_name") or llm_output.get("model_name") or "unknown"
+                prompt_tokens = usage.get("input_tokens", 0)
+                completion_tokens = usage.get("output_tokens", 0)
+                LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+                LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+                if metrics is not None:
+                    metrics.add_usage(model, prompt_tokens, completion_tokens)
+
+
+usage_callback = UsageCallbackHandler()
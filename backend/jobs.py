@@ -0,0 +1,241 @@
+from typing import Callable, Dict, List, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_COLUMNS = [
+    "id", "status", "filename", "file_path", "metadata", "pages_parsed",
+    "chunks_embedded", "chunks_total", "document_ids", "error", "created_at", "updated_at"
+]
+
+# Progress keys reported by VectorStoreManager.ingest_pdf that are persisted on the job
+PROGRESS_COLUMNS = ["pages_parsed", "chunks_embedded", "chunks_total"]
+
+BATCH_JOB_COLUMNS = ["id", "status", "output_file", "transactions", "summary", "error", "created_at", "updated_at"]
+
+
+class IngestionJobQueue:
+    """
+    Persistent local queue of document ingestion jobs run by a pool of worker threads.
+
+    Jobs are stored in SQLite, so queued work survives restarts: jobs left
+    "running" by a previous process are re-queued when the pool starts.
+    """
+
+    def __init__(self, path: str, ingest_fn: Callable, workers: int = 2):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ingest_fn = ingest_fn
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT,
+                file_path TEXT NOT NULL,
+                metadata TEXT,
+                pages_parsed INTEGER DEFAULT 0,
+                chunks_embedded INTEGER DEFAULT 0,
+                chunks_total INTEGER DEFAULT 0,
+                document_ids TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON ingestion_jobs(status, created_at)")
+        self._conn.commit()
+
+    def start(self):
+        """Re-queue interrupted jobs and start the worker threads"""
+        with self._lock:
+            self._stopping = False
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (time.time(),)
+            )
+            self._conn.commit()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"ingestion-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers after their current job"""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, file_path: str, filename: str = None, metadata: Dict = None) -> Dict:
+        """Queue a file for ingestion and return the new job"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._wakeup:
+            self._conn.execute(
+                "INSERT INTO ingestion_jobs (id, status, filename, file_path, metadata, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, filename, file_path, json.dumps(metadata or {}), now, now)
+            )
+            self._conn.commit()
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status and progress, or None for an unknown id"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        job["metadata"] = json.loads(job["metadata"] or "{}")
+        job["document_ids"] = json.loads(job["document_ids"] or "[]")
+        del job["file_path"]
+        return job
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+            self._conn.commit()
+
+    def _claim(self) -> Optional[tuple]:
+        """Atomically take the oldest queued job; blocks until one is available"""
+        with self._wakeup:
+            while not self._stopping:
+                row = self._conn.execute(
+                    "SELECT id, file_path, metadata FROM ingestion_jobs "
+                    "WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE ingestion_jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                        (time.time(), row[0])
+                    )
+                    self._conn.commit()
+                    return row
+                self._wakeup.wait(timeout=5.0)
+        return None
+
+    def _work(self):
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                return
+            job_id, file_path, metadata = claimed
+
+            def on_progress(progress: Dict, job_id=job_id):
+                fields = {k: v for k, v in progress.items() if k in PROGRESS_COLUMNS}
+                if fields:
+                    self._update(job_id, **fields)
+
+            try:
+                ids = self.ingest_fn(file_path, json.loads(metadata or "{}"), on_progress)
+                self._update(job_id, status="completed", document_ids=json.dumps(ids or []))
+            except Exception as e:
+                self._update(job_id, status="failed", error=str(e))
+            finally:
+                if os.path.exists(file_path):
+                    os.unlink(file_path)
+
+
+class BatchJobStore:
+    """
+    SQLite record of batch screenings written to file.
+
+    The batch itself runs on the event loop, so a job still "running" when
+    the store is opened was cut short by a restart and is marked failed.
+    Finished jobs older than `retention_seconds` are deleted with their
+    output files whenever a new job is created.
+    """
+
+    def __init__(self, path: str, retention_seconds: float = 7 * 24 * 3600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS batch_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                output_file TEXT NOT NULL,
+                transactions INTEGER DEFAULT 0,
+                summary TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_batch_jobs_status ON batch_jobs(status, updated_at)")
+        self._conn.execute(
+            "UPDATE batch_jobs SET status = 'failed', error = 'Interrupted by a restart', updated_at = ? "
+            "WHERE status = 'running'",
+            (time.time(),)
+        )
+        self._conn.commit()
+
+    def create(self, job_id: str, output_file: str, transactions: int) -> Dict:
+        """Record a new running batch and return it"""
+        self.prune()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO batch_jobs (id, status, output_file, transactions, created_at, updated_at) "
+                "VALUES (?, 'running', ?, ?, ?, ?)",
+                (job_id, output_file, transactions, now, now)
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def finish(self, job_id: str, status: str, summary: Dict = None, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE batch_jobs SET status = ?, summary = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(summary) if summary is not None else None, error, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status and summary, or None for an unknown id"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(BATCH_JOB_COLUMNS)} FROM batch_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        job = dict(zip(BATCH_JOB_COLUMNS, row))
+        job["summary"] = json.loads(job["summary"]) if job["summary"] else None
+        return job
+
+    def prune(self) -> int:
+        """Delete finished jobs past the retention period and their output files"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = self._conn.execute(
+                "SELECT id, output_file FROM batch_jobs WHERE status != 'running' AND updated_at < ?", (cutoff,)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM batch_jobs WHERE id = ?", [(job_id,) for job_id, _ in expired])
+            self._conn.commit()
+        for _, output_file in expired:
+            if os.path.exists(output_file):
+                os.unlink(output_file)
+        return len(expired)
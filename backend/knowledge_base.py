@@ -0,0 +1,380 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Citation forms picked up without an LLM call
+CITATION_PATTERNS = [
+    re.compile(r"\b\d+\s+C\.?F\.?R\.?\s+(?:Part\s+)?\d+(?:\.\d+)*", re.IGNORECASE),
+    re.compile(r"\b\d+\s+U\.?S\.?C\.?\s+§?\s*\d+[a-z]?", re.IGNORECASE),
+    re.compile(r"\b(?:Directive|Regulation)\s+\((?:EU|EC)\)\s+(?:No\s+)?\d{2,4}/\d+"),
+    re.compile(r"\bFATF Recommendation\s+\d+", re.IGNORECASE),
+]
+
+# Chunks without any of these carry no extractable rule, so they skip the LLM
+REGULATORY_SIGNAL = re.compile(
+    r"[$€£]|\b(?:shall|must|require[sd]?|threshold|report(?:ing)?|regulation|directive|recommendation)\b",
+    re.IGNORECASE
+)
+
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£"}
+
+
+def find_citations(text: str) -> List[str]:
+    """Regulation citations in text (CFR, U.S.C., EU acts, FATF Recommendations), in order of appearance"""
+    found = []
+    for pattern in CITATION_PATTERNS:
+        for match in pattern.finditer(text):
+            citation = " ".join(match.group(0).split())
+            if citation not in found:
+                found.append(citation)
+    return found
+
+
+def format_threshold(threshold: Dict) -> str:
+    """"$10,000", "EUR 15,000" or "30 days" for a stored threshold"""
+    value = threshold["value"]
+    number = f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+    currency = threshold.get("currency")
+    if currency:
+        symbol = CURRENCY_SYMBOLS.get(currency)
+        return f"{symbol}{number}" if symbol == "$" else f"{currency} {number}"
+    unit = threshold.get("unit")
+    return f"{number} {unit}" if unit else number
+
+
+def _parse_facts(content: str) -> Dict:
+    """The JSON object in an extraction answer, tolerating code fences and surrounding prose"""
+    start, end = content.find("{"), content.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        facts = json.loads(content[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    return facts if isinstance(facts, dict) else {}
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class KnowledgeBase:
+    """
+    Regulations, thresholds and citations extracted from chunks at ingest time.
+
+    Every row links to the chunk ID it was extracted from, so facts for a
+    retrieved context are a lookup by chunk ID, and chunks removed from the
+    vector store are removed here too. `kb_chunks` records every processed
+    chunk, including ones that stated no facts, so coverage is known.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS kb_chunks (
+                chunk_id TEXT PRIMARY KEY,
+                source TEXT,
+                jurisdiction TEXT,
+                regulation_family TEXT,
+                extracted_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS kb_regulations (
+                chunk_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                regulation_type TEXT NOT NULL,
+                requirement TEXT
+            );
+            CREATE TABLE IF NOT EXISTS kb_thresholds (
+                chunk_id TEXT NOT NULL,
+                value REAL NOT NULL,
+                currency TEXT,
+                unit TEXT,
+                applies_to TEXT,
+                regulation TEXT
+            );
+            CREATE TABLE IF NOT EXISTS kb_citations (
+                chunk_id TEXT NOT NULL,
+                citation TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_kb_regulations_chunk ON kb_regulations(chunk_id);
+            CREATE INDEX IF NOT EXISTS idx_kb_regulations_type ON kb_regulations(regulation_type);
+            CREATE INDEX IF NOT EXISTS idx_kb_thresholds_chunk ON kb_thresholds(chunk_id);
+            CREATE INDEX IF NOT EXISTS idx_kb_citations_chunk ON kb_citations(chunk_id);
+            CREATE INDEX IF NOT EXISTS idx_kb_citations_citation ON kb_citations(citation);
+        """)
+        self._conn.commit()
+
+    def processed(self, chunk_ids: Iterable[str]) -> Set[str]:
+        """The subset of chunk_ids that have been through extraction"""
+        ids = [cid for cid in chunk_ids if cid]
+        found = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT chunk_id FROM kb_chunks WHERE chunk_id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def store(self, chunk_id: str, metadata: Dict, facts: Dict):
+        """Replace the facts recorded for a chunk"""
+        regulations = [
+            (chunk_id, str(r["name"]).strip(), str(r.get("type") or "general").strip().upper(), r.get("requirement"))
+            for r in facts.get("regulations", []) if isinstance(r, dict) and r.get("name")
+        ]
+        thresholds = []
+        for t in facts.get("thresholds", []):
+            value = _number(t.get("value")) if isinstance(t, dict) else None
+            if value is None:
+                continue
+            currency = (t.get("currency") or "").strip().upper() or None
+            thresholds.append((chunk_id, value, currency, t.get("unit"), t.get("applies_to"), t.get("regulation")))
+        citations = [(chunk_id, c) for c in dict.fromkeys(str(c).strip() for c in facts.get("citations", []) if c)]
+
+        with self._lock:
+            self._conn.execute("DELETE FROM kb_regulations WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM kb_thresholds WHERE chunk_id = ?", (chunk_id,))
+            self._conn.execute("DELETE FROM kb_citations WHERE chunk_id = ?", (chunk_id,))
+            self._conn.executemany("INSERT INTO kb_regulations VALUES (?, ?, ?, ?)", regulations)
+            self._conn.executemany("INSERT INTO kb_thresholds VALUES (?, ?, ?, ?, ?, ?)", thresholds)
+            self._conn.executemany("INSERT INTO kb_citations VALUES (?, ?)", citations)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kb_chunks VALUES (?, ?, ?, ?, ?)",
+                (chunk_id, metadata.get("filename"), metadata.get("jurisdiction"),
+                 metadata.get("regulation_family"), time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, chunk_ids: Iterable[str]):
+        ids = [(cid,) for cid in chunk_ids]
+        with self._lock:
+            for table in ("kb_chunks", "kb_regulations", "kb_thresholds", "kb_citations"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE chunk_id = ?", ids)
+            self._conn.commit()
+
+    def lookup(self, chunk_ids: Iterable[str], regulation_type: Optional[str] = None) -> Dict:
+        """
+        Facts extracted from the given chunks, deduplicated across chunks.
+
+        `regulation_type` narrows regulations to one type ("general" or None
+        returns all). `covered` counts the chunks that have been processed.
+        """
+        ids = list(dict.fromkeys(cid for cid in chunk_ids if cid))
+        facts = {"regulations": [], "thresholds": [], "citations": [], "covered": len(self.processed(ids))}
+        if not ids:
+            return facts
+        placeholders = ",".join("?" * len(ids))
+        sources = "(SELECT source FROM kb_chunks c WHERE c.chunk_id = t.chunk_id)"
+        with self._lock:
+            regulation_sql = f"SELECT name, regulation_type, requirement, {sources} FROM kb_regulations t WHERE chunk_id IN ({placeholders})"
+            params = list(ids)
+            if regulation_type and regulation_type.strip().lower() != "general":
+                regulation_sql += " AND regulation_type = ?"
+                params.append(regulation_type.strip().upper())
+            regulations = self._conn.execute(regulation_sql, params).fetchall()
+            thresholds = self._conn.execute(
+                f"SELECT value, currency, unit, applies_to, regulation, {sources} FROM kb_thresholds t "
+                f"WHERE chunk_id IN ({placeholders}) ORDER BY value", ids
+            ).fetchall()
+            citations = self._conn.execute(
+                f"SELECT DISTINCT citation, {sources} FROM kb_citations t WHERE chunk_id IN ({placeholders})", ids
+            ).fetchall()
+
+        seen = set()
+        for name, rtype, requirement, source in regulations:
+            if (name.lower(), rtype) not in seen:
+                seen.add((name.lower(), rtype))
+                facts["regulations"].append({"name": name, "type": rtype, "requirement": requirement, "source": source})
+        seen = set()
+        for value, currency, unit, applies_to, regulation, source in thresholds:
+            key = (value, currency, unit, (applies_to or "").lower())
+            if key not in seen:
+                seen.add(key)
+                facts["thresholds"].append({"value": value, "currency": currency, "unit": unit,
+                                            "applies_to": applies_to, "regulation": regulation, "source": source})
+        seen = set()
+        for citation, source in citations:
+            if citation not in seen:
+                seen.add(citation)
+                facts["citations"].append({"regulation": citation, "source": source})
+        return facts
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("kb_chunks", "kb_regulations", "kb_thresholds", "kb_citations")
+            }
+
+
+class KnowledgeExtractor:
+    """
+    Extracts regulations, thresholds and citations from stored chunks in the background.
+
+    Ingestion only schedules chunk IDs once their embeddings are persisted,
+    so it never waits on the LLM. A worker thread loads scheduled chunks
+    from the vector store in batches (`load_chunks`) and extracts them with
+    at most `concurrency` LLM calls in flight. Chunks already in the
+    knowledge base (chunk IDs are content hashes) are skipped, and chunks
+    without any regulatory signal only get the regex citation pass.
+
+    A chunk whose extraction fails is retried up to `max_attempts` times;
+    after that (or after a restart) it has no KB row, so the startup
+    backfill picks it up again, along with chunks stored before the
+    knowledge base existed.
+    """
+
+    def __init__(self, knowledge_base: KnowledgeBase, llm, load_chunks: Callable[[List[str]], List],
+                 concurrency: int = 4, batch_size: int = 50, max_attempts: int = 3):
+        self.knowledge_base = knowledge_base
+        self.llm = llm
+        self.load_chunks = load_chunks
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: Dict[str, None] = {}
+        self._attempts: Dict[str, int] = {}
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._stats = {"extracted": 0, "llm_calls": 0, "failed": 0}
+
+    @staticmethod
+    def _prompt(text: str) -> str:
+        return f"""Extract the regulatory facts stated in this text. Return only a JSON object:
+{{"regulations": [{{"name": "regulation name and section", "type": "AML|KYC|BSA|GDPR|SOX|FATF|general", "requirement": "what it requires"}}],
+ "thresholds": [{{"value": 10000, "currency": "USD or null", "unit": "null, or e.g. days for deadlines", "applies_to": "what the threshold applies to", "regulation": "regulation it comes from"}}],
+ "citations": ["regulation citations such as 31 CFR 1010.311"]}}
+
+Use empty lists when the text states none. Only include facts stated in the text.
+
+Text:
+{text}"""
+
+    def _extract(self, doc) -> Dict:
+        citations = find_citations(doc.page_content)
+        facts = {}
+        if REGULATORY_SIGNAL.search(doc.page_content):
+            self._count("llm_calls")
+            response = self.llm.invoke(self._prompt(doc.page_content))
+            facts = _parse_facts(response.content if hasattr(response, "content") else str(response))
+        extracted = facts.get("citations") if isinstance(facts.get("citations"), list) else []
+        facts["citations"] = citations + [c for c in extracted if isinstance(c, str) and c not in citations]
+        return facts
+
+    def start(self, backfill: Optional[Callable[[], Iterable[str]]] = None):
+        """Start the background worker; it first schedules the chunk IDs from `backfill`
+        that have no KB row yet"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="knowledge-extraction")
+            self._thread = threading.Thread(target=self._work, args=(backfill,), name="knowledge-extraction", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker after its current batch; unfinished chunks stay without a KB row"""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+            thread, pool = self._thread, self._pool
+            self._thread = self._pool = None
+        if thread is not None:
+            thread.join(timeout)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def schedule(self, chunk_ids: Iterable[str]):
+        """Queue stored chunks for extraction (already extracted ones are skipped when their batch runs)"""
+        with self._wakeup:
+            for cid in chunk_ids:
+                if cid:
+                    self._pending[cid] = None
+            if self._pending:
+                self._wakeup.notify()
+
+    def _next_batch(self) -> Optional[List[str]]:
+        with self._wakeup:
+            while not self._pending and not self._stopping:
+                self._wakeup.wait(timeout=5.0)
+            if self._stopping:
+                return None
+            batch = list(self._pending)[:self.batch_size]
+            for cid in batch:
+                del self._pending[cid]
+            return batch
+
+    def _backfill(self, chunk_ids: Iterable[str]):
+        batch = []
+        for cid in chunk_ids:
+            batch.append(cid)
+            if len(batch) >= 500:
+                self.schedule(set(batch) - self.knowledge_base.processed(batch))
+                batch = []
+        if batch:
+            self.schedule(set(batch) - self.knowledge_base.processed(batch))
+
+    def _work(self, backfill: Optional[Callable[[], Iterable[str]]] = None):
+        if backfill is not None:
+            try:
+                self._backfill(backfill())
+            except Exception:
+                self._count("failed")
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._process(batch)
+            except Exception:
+                # Loading the batch failed; its chunks stay without a KB row
+                self._count("failed", len(batch))
+
+    def _process(self, chunk_ids: List[str]):
+        done = self.knowledge_base.processed(chunk_ids)
+        todo = [cid for cid in chunk_ids if cid not in done]
+        if not todo:
+            return
+        # Chunks deleted since they were scheduled don't come back
+        docs = self.load_chunks(todo)
+        list(self._pool.map(self._run, docs))
+
+    def _run(self, doc):
+        try:
+            self.knowledge_base.store(doc.id, doc.metadata, self._extract(doc))
+        except Exception:
+            self._count("failed")
+            with self._lock:
+                attempts = self._attempts[doc.id] = self._attempts.get(doc.id, 0) + 1
+            if attempts < self.max_attempts:
+                self.schedule([doc.id])
+            return
+        self._count("extracted")
+        with self._lock:
+            self._attempts.pop(doc.id, None)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
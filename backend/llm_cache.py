@@ -0,0 +1,225 @@
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from config import Config
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Content-addressed LLM response cache backed by a local SQLite file.
+
+    Entries are keyed by a hash of the prompt and the LLM string (model name,
+    temperature and other call parameters), so a cached answer is only reused
+    for an identical call. Optionally, a miss on the exact key falls back to
+    an embedding-similarity lookup among the `semantic_candidates` most
+    recently used entries for the same LLM string whose prompts contain the
+    same numbers, so a near-duplicate prompt about a different amount, date
+    or section never reuses an answer.
+    Entries expire after `ttl_seconds` and the least recently used entries are
+    evicted beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 0,
+        max_entries: int = 0,
+        embeddings: Any = None,
+        similarity_threshold: float = 0.0,
+        semantic_candidates: int = 500,
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.semantic_candidates = semantic_candidates
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                llm_string TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                numbers TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")}
+        if "numbers" not in columns:
+            # Entries cached before numbers were recorded never match semantically
+            self._conn.execute("ALTER TABLE llm_cache ADD COLUMN numbers TEXT")
+        self._conn.execute("DROP INDEX IF EXISTS idx_llm_cache_llm")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_semantic ON llm_cache(llm_string, numbers, last_access)"
+        )
+        self._conn.commit()
+        # Prompt embeddings computed on a miss, reused when the response is stored
+        self._pending_embeddings: "OrderedDict[str, bytes]" = OrderedDict()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def semantic(self) -> bool:
+        return self.embeddings is not None and self.similarity_threshold > 0
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _numbers(prompt: str) -> str:
+        """The prompt's numbers in order, thousands separators dropped"""
+        return json.dumps([number.replace(",", "") for number in NUMBER_PATTERN.findall(prompt)])
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - created_at > self.ttl_seconds
+
+    def _embed(self, key: str, prompt: str) -> bytes:
+        with self._lock:
+            embedding = self._pending_embeddings.get(key)
+        if embedding is None:
+            embedding = np.asarray(self.embeddings.embed_query(prompt), dtype=np.float32).tobytes()
+            with self._lock:
+                self._pending_embeddings[key] = embedding
+                while len(self._pending_embeddings) > 256:
+                    self._pending_embeddings.popitem(last=False)
+        return embedding
+
+    def _semantic_lookup(self, key: str, prompt: str, llm_string: str, now: float) -> Optional[str]:
+        query = np.frombuffer(self._embed(key, prompt), dtype=np.float32)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, response, embedding, created_at FROM llm_cache "
+                "WHERE llm_string = ? AND numbers = ? AND embedding IS NOT NULL "
+                "ORDER BY last_access DESC LIMIT ?",
+                (llm_string, self._numbers(prompt), self.semantic_candidates)
+            ).fetchall()
+        rows = [row for row in rows if not self._expired(row[3], now)]
+        if not rows:
+            return None
+        matrix = np.vstack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = matrix @ query / np.where(norms == 0, 1, norms)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, rows[best][0]))
+            self._conn.commit()
+        return rows[best][1]
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Look up a cached response by exact key, then by prompt similarity"""
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self._expired(row[1], now):
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row:
+                self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self._stats["hits"] += 1
+        response = row[0] if row else None
+
+        if response is None and self.semantic:
+            response = self._semantic_lookup(key, prompt, llm_string, now)
+            if response is not None:
+                with self._lock:
+                    self._stats["semantic_hits"] += 1
+
+        if response is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        return [loads(generation) for generation in json.loads(response)]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store a response and evict least recently used entries beyond max_entries"""
+        key = self._key(prompt, llm_string)
+        embedding = self._embed(key, prompt) if self.semantic else None
+        numbers = self._numbers(prompt) if self.semantic else None
+        response = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._lock:
+            self._pending_embeddings.pop(key, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, llm_string, response, embedding, numbers, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, llm_string, response, embedding, numbers, now, now)
+            )
+            if self.max_entries:
+                count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN "
+                        "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._stats["evictions"] += overflow
+            self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove all cached responses"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._pending_embeddings.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["entries"] = entries
+        stats["hit_rate"] = (stats["hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+_llm_cache: Optional[SQLiteLLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[SQLiteLLMCache]:
+    """Shared LLM response cache for all agents, or None when disabled"""
+    global _llm_cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            embeddings = None
+            if Config.LLM_CACHE_SIMILARITY_THRESHOLD > 0:
+                from clients import get_client_registry
+                embeddings = get_client_registry().embeddings(Config.EMBEDDING_MODEL)
+            _llm_cache = SQLiteLLMCache(
+                Config.LLM_CACHE_PATH,
+                ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+                max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+                embeddings=embeddings,
+                similarity_threshold=Config.LLM_CACHE_SIMILARITY_THRESHOLD,
+                semantic_candidates=Config.LLM_CACHE_SEMANTIC_CANDIDATES,
+            )
+        return _llm_cache
@@ -1,11 +1,25 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
 from typing import Optional, Dict
+import aiofiles
+import asyncio
+import csv
+import io
+import json
 import os
-import tempfile
+import uuid
 from config import Config
 from vector_store import VectorStoreManager
+from llm_cache import get_llm_cache
+from model_router import get_model_router
+from clients import get_client_registry
+from instrumentation import track_request
+from jobs import BatchJobStore, IngestionJobQueue
+from batch import BatchScreener, detect_format, group_transactions, parse_transactions
+from document_tags import normalize_jurisdiction
 from agents.retriever_agent import RetrieverAgent
 from agents.policy_extraction_agent import PolicyExtractionAgent
 from agents.risk_classification_agent import RiskClassificationAgent
@@ -43,6 +57,30 @@ supervisor = SupervisorAgent(
     report_generator
 )
 
+batch_screener = BatchScreener(
+    retriever_agent,
+    policy_extractor,
+    risk_classifier,
+    BatchJobStore(Config.BATCH_JOBS_PATH, retention_seconds=Config.BATCH_JOB_RETENTION_HOURS * 3600)
+)
+
+ingestion_jobs = IngestionJobQueue(
+    Config.INGEST_JOBS_PATH,
+    vector_store.ingest_pdf,
+    workers=Config.INGEST_WORKERS
+)
+
+@app.on_event("startup")
+async def start_ingestion_workers():
+    ingestion_jobs.start()
+    vector_store.start_knowledge_extraction()
+
+@app.on_event("shutdown")
+async def stop_ingestion_workers():
+    ingestion_jobs.stop()
+    vector_store.stop_knowledge_extraction()
+    await get_client_registry().aclose()
+
 class ComplianceQuery(BaseModel):
     query: str
     transaction_data: Optional[Dict] = None
@@ -53,6 +91,7 @@ class ComplianceResponse(BaseModel):
     extracted_policies: str
     verification: str
     agent_history: list
+    timings: Optional[Dict] = None
 
 @app.get("/")
 async def root():
@@ -66,55 +105,202 @@ async def health():
 async def analyze_compliance(query: ComplianceQuery):
     """Main endpoint for compliance analysis"""
     try:
-        result = supervisor.process(
-            query.query,
-            query.transaction_data
-        )
+        with track_request("analyze") as metrics:
+            result = await supervisor.aprocess(
+                query.query,
+                query.transaction_data
+            )
         return ComplianceResponse(
             final_report=result["final_report"],
             risk_assessment=result["risk_assessment"],
             extracted_policies=result["extracted_policies"],
             verification=result["verification"],
-            agent_history=result["agent_history"]
+            agent_history=result["agent_history"],
+            timings=metrics.summary()
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/documents/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Upload and ingest regulatory documents"""
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _analysis_events(query: ComplianceQuery):
+    """Relay supervisor stream events as SSE, with keep-alive comments while agents are busy"""
+    yield _sse("start", {"query": query.query})
+
+    with track_request("analyze_stream") as metrics:
+        stream = supervisor.astream(query.query, query.transaction_data).__aiter__()
+        next_event = asyncio.ensure_future(stream.__anext__())
+        try:
+            while True:
+                done, _ = await asyncio.wait({next_event}, timeout=Config.SSE_HEARTBEAT_SECONDS)
+                if not done:
+                    yield ": keep-alive\n\n"
+                    continue
+                try:
+                    event, data = next_event.result()
+                except StopAsyncIteration:
+                    break
+                if event == "final":
+                    data["timings"] = metrics.summary()
+                yield _sse(event, data)
+                next_event = asyncio.ensure_future(stream.__anext__())
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            next_event.cancel()
+            await stream.aclose()
+
+@app.post("/api/compliance/analyze/stream")
+async def analyze_compliance_stream(query: ComplianceQuery):
+    """Streaming compliance analysis (Server-Sent Events)"""
+    return StreamingResponse(
+        _analysis_events(query),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Disable proxy buffering (nginx)
+        }
+    )
+
+def _read_batch(upload: UploadFile, fmt: str) -> Dict:
+    """Parse and group an upload line by line from its spooled file"""
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        return group_transactions(parse_transactions(text, fmt), Config.BATCH_MAX_TRANSACTIONS)
+    finally:
+        # Leave the upload's file open for FastAPI to close
+        text.detach()
+
+async def _batch_records(batch: Dict, query: Optional[str]):
+    with track_request("batch"):
+        async for record in batch_screener.screen_batch(batch, query):
+            yield json.dumps(record, default=str) + "\n"
+
+@app.post("/api/compliance/batch")
+async def analyze_batch(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    output: str = Form("stream"),
+    query: Optional[str] = Form(None)
+):
+    """Screen a JSONL or CSV file of transactions
+
+    Transactions sharing (type, region, customer_type) share one retrieval
+    and policy extraction. With `output=stream` the results come back as
+    NDJSON while groups finish; with `output=file` the batch runs in the
+    background and is written to a JSONL file (see /api/compliance/batch/{id}).
+    """
+    fmt = (format or detect_format(file.filename, file.content_type)).lower()
+    if fmt not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail=f"Unsupported batch format: {fmt}")
+    if output not in ("stream", "file"):
+        raise HTTPException(status_code=400, detail=f"Unsupported output: {output}")
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
-        
-        # Ingest into vector store
+        batch = await asyncio.to_thread(_read_batch, file, fmt)
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse batch: {e}")
+    if batch["count"] > Config.BATCH_MAX_TRANSACTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has more than {Config.BATCH_MAX_TRANSACTIONS} transactions"
+        )
+
+    if output == "file":
+        return JSONResponse(batch_screener.start_file_job(batch, query), status_code=202)
+    return StreamingResponse(_batch_records(batch, query), media_type="application/x-ndjson")
+
+@app.get("/api/compliance/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """Status and summary of a batch written to file"""
+    job = batch_screener.get_job(batch_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    return job
+
+@app.get("/api/compliance/batch/{batch_id}/results")
+async def get_batch_results(batch_id: str):
+    """JSONL results of a completed file batch"""
+    job = batch_screener.get_job(batch_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Batch is {job['status']}")
+    return FileResponse(job["output_file"], media_type="application/x-ndjson", filename=f"{batch_id}.jsonl")
+
+@app.post("/api/documents/upload", status_code=202)
+async def upload_document(
+    file: UploadFile = File(...),
+    jurisdiction: Optional[str] = Form(None),
+    regulation_family: Optional[str] = Form(None)
+):
+    """Upload a regulatory document and queue it for ingestion
+
+    `jurisdiction` (e.g. EU, US, INTL) and `regulation_family` (e.g. AML,
+    KYC, SANCTIONS) tag every chunk; when omitted they are detected from
+    the document.
+    """
+    try:
+        # Save the upload where the ingestion workers can pick it up
+        os.makedirs(Config.UPLOAD_DIRECTORY, exist_ok=True)
+        file_path = os.path.join(Config.UPLOAD_DIRECTORY, f"{uuid.uuid4().hex}.pdf")
+        # Stream the upload to disk in chunks instead of reading it into memory
+        async with aiofiles.open(file_path, "wb") as out:
+            while chunk := await file.read(Config.UPLOAD_CHUNK_BYTES):
+                await out.write(chunk)
+
         metadata = {
             "filename": file.filename,
-            "content_type": file.content_type
+            "content_type": file.content_type,
+            "jurisdiction": normalize_jurisdiction(jurisdiction),
+            "regulation_family": regulation_family.strip().upper() if regulation_family and regulation_family.strip() else None
         }
-        ids = vector_store.ingest_pdf(tmp_path, metadata)
-        
-        # Clean up
-        os.unlink(tmp_path)
-        
+        job = ingestion_jobs.enqueue(file_path, file.filename, metadata)
+
         return {
-            "message": "Document ingested successfully",
-            "document_ids": ids if ids else [],
+            "message": "Document queued for ingestion",
+            "job_id": job["id"],
+            "status": job["status"],
             "filename": file.filename
         }
     except Exception as e:
-        import traceback
-        error_detail = f"{str(e)}\n{traceback.format_exc()}"
-        raise HTTPException(status_code=500, detail=error_detail)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Status and progress (pages parsed, chunks embedded) of an ingestion job"""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job: {job_id}")
+    return job
+
+@app.get("/api/documents/ingest/stats")
+async def ingestion_stats():
+    """Embedding throughput metrics (chunks/sec, tokens/sec) across ingestions"""
+    return vector_store.ingestion_stats()
+
+@app.get("/api/knowledge/stats")
+async def knowledge_stats():
+    """Chunks, regulations, thresholds and citations in the ingest-time knowledge base"""
+    return vector_store.knowledge_stats()
 
 @app.get("/api/documents/search")
-async def search_documents(query: str, k: int = 5):
-    """Search documents in vector store"""
+async def search_documents(
+    query: str,
+    k: int = 5,
+    jurisdiction: Optional[str] = None,
+    regulation_family: Optional[str] = None
+):
+    """Search documents in vector store, optionally filtered by jurisdiction/regulation family"""
     try:
-        docs = vector_store.search(query, k=k)
+        clauses = []
+        if jurisdiction:
+            clauses.append({"jurisdiction": normalize_jurisdiction(jurisdiction)})
+        if regulation_family:
+            clauses.append({"regulation_family": regulation_family.strip().upper()})
+        where = {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+        with track_request("search"):
+            docs = await vector_store.asearch(query, k=k, filter=where)
         return {
             "query": query,
             "results": [
@@ -128,6 +314,31 @@ async def search_documents(query: str, k: int = 5):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss statistics for the shared caches"""
+    llm_cache = get_llm_cache()
+    return {
+        "llm": llm_cache.stats() if llm_cache else {"enabled": False},
+        "query_embeddings": vector_store.query_embeddings.stats(),
+        "retrieval": vector_store.retrieval_cache.stats()
+    }
+
+@app.get("/api/models")
+async def model_routing():
+    """Model used by each agent and tool sub-call, and escalations to the large model"""
+    return get_model_router().stats()
+
+@app.get("/api/clients")
+async def client_stats():
+    """Shared HTTP pool settings and the per-model rate-limit state seen in API responses"""
+    return get_client_registry().stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus histograms of stage, tool and search latency and per-request LLM usage"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,141 @@
+from langchain_openai import ChatOpenAI
+from typing import Callable, Dict, Iterable, Optional
+import re
+import threading
+from config import Config
+from llm_cache import get_llm_cache
+from clients import get_client_registry
+from instrumentation import record_retry
+
+# Phrases that mark an answer the small model wasn't sure about
+LOW_CONFIDENCE_PATTERN = re.compile(
+    r"\b(unclear|uncertain|not sure|cannot determine|can't determine|unable to determine|"
+    r"insufficient information|not enough information|confidence:\s*low)\b",
+    re.IGNORECASE
+)
+
+
+def _content(response) -> str:
+    return response.content if hasattr(response, "content") else str(response)
+
+
+def is_low_confidence(response) -> bool:
+    """Default escalation rule: an empty or hedging answer"""
+    content = _content(response).strip()
+    return not content or bool(LOW_CONFIDENCE_PATTERN.search(content))
+
+
+# Tool-specific escalation rules: the answer must contain what the caller parses
+CONFIDENCE_CHECKS: Dict[str, Callable] = {
+    "check_threshold_violation": lambda response: is_low_confidence(response) or not re.search(
+        r"\b(yes|no)\b", _content(response)[:200], re.IGNORECASE
+    ),
+    "verify_claim_against_source": lambda response: is_low_confidence(response) or "VERDICT" not in _content(response).upper(),
+    # Hedging words are legitimate inside extracted requirements; only a missing JSON object is a miss
+    "extract_knowledge": lambda response: "{" not in _content(response),
+}
+
+
+class RoutedLLM:
+    """
+    A tool sub-call routed to its configured model.
+
+    When the tool runs on a different model than LLM_MODEL and escalation is
+    enabled, answers that fail the tool's confidence check are retried once
+    on LLM_MODEL.
+    """
+
+    def __init__(self, router: "ModelRouter", tool: str, llm: ChatOpenAI, fallback: Optional[ChatOpenAI]):
+        self.router = router
+        self.tool = tool
+        self.llm = llm
+        self.fallback = fallback
+        self.model_name = llm.model_name
+        self._low_confidence = CONFIDENCE_CHECKS.get(tool, is_low_confidence)
+
+    def invoke(self, prompt, **kwargs):
+        response = self.llm.invoke(prompt, **kwargs)
+        if self.fallback is not None and self._low_confidence(response):
+            self.router.record_escalation(self.tool)
+            return self.fallback.invoke(prompt, **kwargs)
+        return response
+
+    async def ainvoke(self, prompt, **kwargs):
+        response = await self.llm.ainvoke(prompt, **kwargs)
+        if self.fallback is not None and self._low_confidence(response):
+            self.router.record_escalation(self.tool)
+            return await self.fallback.ainvoke(prompt, **kwargs)
+        return response
+
+
+class ModelRouter:
+    """
+    Builds the chat models for agents and tool sub-calls from Config.
+
+    Agents' planning loops use AGENT_MODELS (LLM_MODEL by default); tool
+    sub-calls use TOOL_MODELS, which sends the simple ones (query rewrites,
+    yes/no checks, formatting) to LLM_SMALL_MODEL. Clients are shared per
+    (model, temperature, cache) through the client registry.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._escalations: Dict[str, int] = {}
+
+    @staticmethod
+    def _client(model: str, temperature: float, cached: bool) -> ChatOpenAI:
+        # Tool sub-calls are plain prompts, so their responses can be cached
+        return get_client_registry().chat(model, temperature, cache=get_llm_cache() if cached else None)
+
+    @staticmethod
+    def model_for_agent(agent: str) -> str:
+        return Config.AGENT_MODELS.get(agent, Config.LLM_MODEL)
+
+    @staticmethod
+    def model_for_tool(tool: str) -> str:
+        return Config.TOOL_MODELS.get(tool, Config.LLM_MODEL)
+
+    def agent_llm(self, agent: str, temperature: float = Config.TEMPERATURE) -> ChatOpenAI:
+        """Chat model driving an agent's tool-calling loop"""
+        return self._client(self.model_for_agent(agent), temperature, cached=False)
+
+    def tool_llm(self, tool: str, temperature: float = Config.TEMPERATURE) -> RoutedLLM:
+        """Chat model for one tool's sub-call, escalating to LLM_MODEL on low confidence"""
+        model = self.model_for_tool(tool)
+        fallback = None
+        if Config.LLM_ESCALATION_ENABLED and model != Config.LLM_MODEL:
+            fallback = self._client(Config.LLM_MODEL, temperature, cached=True)
+        return RoutedLLM(self, tool, self._client(model, temperature, cached=True), fallback)
+
+    def tool_llms(self, tools: Iterable[str], temperature: float = Config.TEMPERATURE) -> Dict[str, RoutedLLM]:
+        return {tool: self.tool_llm(tool, temperature) for tool in tools}
+
+    def record_escalation(self, tool: str):
+        record_retry("escalation")
+        with self._lock:
+            self._escalations[tool] = self._escalations.get(tool, 0) + 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            escalations = dict(self._escalations)
+        return {
+            "default_model": Config.LLM_MODEL,
+            "small_model": Config.LLM_SMALL_MODEL,
+            "agent_models": dict(Config.AGENT_MODELS),
+            "tool_models": dict(Config.TOOL_MODELS),
+            "escalation_enabled": Config.LLM_ESCALATION_ENABLED,
+            "escalations": escalations,
+        }
+
+
+_model_router: Optional[ModelRouter] = None
+_model_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Shared model router for all agents"""
+    global _model_router
+    with _model_router_lock:
+        if _model_router is None:
+            _model_router = ModelRouter()
+        return _model_router
@@ -0,0 +1,100 @@
+from langchain_core.documents import Document
+from typing import List, Optional, Tuple
+import threading
+from config import Config
+from bm25_index import tokenize
+from context_packing import count_tokens
+
+
+class Reranker:
+    """
+    Reorders retrieved chunks by relevance to a query and packs the best of
+    them into a token budget.
+
+    Uses a sentence-transformers CrossEncoder when `model_name` is set and the
+    model loads; otherwise falls back to a lexical heuristic (query term
+    coverage, with extra weight on numbers and section references, plus a
+    small prior for the retriever's original rank).
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name
+        self._model = None
+        self._model_failed = not model_name
+        self._lock = threading.Lock()
+
+    def _cross_encoder(self):
+        if self._model_failed:
+            return None
+        with self._lock:
+            if self._model is None and not self._model_failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+                except Exception:
+                    # Missing package or model download failure: use the heuristic
+                    self._model_failed = True
+            return self._model
+
+    @staticmethod
+    def _heuristic_scores(query: str, docs: List[Document]) -> List[float]:
+        terms = set(tokenize(query))
+        exact = {term for term in terms if any(ch.isdigit() for ch in term)}
+        weight = len(terms) + len(exact)
+        scores = []
+        for rank, doc in enumerate(docs):
+            doc_terms = set(tokenize(doc.page_content))
+            overlap = len(terms & doc_terms) + len(exact & doc_terms)
+            scores.append((overlap / weight if weight else 0.0) + 0.1 / (rank + 1))
+        return scores
+
+    def rerank(self, query: str, docs: List[Document]) -> List[Tuple[Document, float]]:
+        """(Document, score) pairs ordered best first"""
+        if not docs:
+            return []
+        model = self._cross_encoder()
+        if model is not None:
+            scores = [float(s) for s in model.predict([(query, doc.page_content) for doc in docs])]
+        else:
+            scores = self._heuristic_scores(query, docs)
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [(docs[i], scores[i]) for i in order]
+
+    def pack(self, query: str, docs: List[Document], budget_tokens: int) -> List[Document]:
+        """
+        Best chunks for `query` that fit in `budget_tokens`, best first.
+
+        Duplicate chunks are dropped; chunks that would overflow the budget
+        are skipped so smaller, lower-ranked ones can still fill it. The top
+        chunk is always kept.
+        """
+        seen = set()
+        unique = []
+        for doc in docs:
+            key = doc.metadata.get("chunk_id") or doc.page_content
+            if key not in seen:
+                seen.add(key)
+                unique.append(doc)
+
+        packed = []
+        used = 0
+        for doc, _ in self.rerank(query, unique):
+            tokens = count_tokens([doc.page_content])
+            if packed and used + tokens > budget_tokens:
+                continue
+            packed.append(doc)
+            used += tokens
+        return packed
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    """Shared reranker for all agents (the cross-encoder is loaded once, on first use)"""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = Reranker(Config.RERANKER_MODEL if Config.RERANKER_ENABLED else None)
+        return _reranker
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+import threading
+
+
+class RetrievalCache:
+    """
+    Bounded LRU cache of search results keyed on (normalized query, k, index version).
+
+    The index version increases every time the corpus changes, so results
+    cached against an older version are never served again; they are dropped
+    on the next bump rather than waiting for LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.version = 0
+        self._cache: "OrderedDict[tuple, List]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.split())
+
+    def key(self, query: str, k: int, *extra: Hashable) -> tuple:
+        return (self.normalize(query), k, self.version, *extra)
+
+    def get(self, key: tuple) -> Optional[List]:
+        with self._lock:
+            results = self._cache.get(key)
+            if results is None:
+                self._stats["misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._stats["hits"] += 1
+            return list(results)
+
+    def put(self, key: tuple, results: List):
+        if not self.max_entries or key[2] != self.version:
+            return
+        with self._lock:
+            self._cache[key] = list(results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def bump_version(self) -> int:
+        """Invalidate all cached results after the index changed"""
+        with self._lock:
+            self.version += 1
+            self._cache.clear()
+            self._stats["invalidations"] += 1
+            return self.version
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._cache)
+            stats["index_version"] = self.version
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
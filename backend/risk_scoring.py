@@ -0,0 +1,161 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import re
+import numpy as np
+from config import Config
+from document_tags import UNIVERSAL_JURISDICTIONS, normalize_jurisdiction
+from threshold_engine import REGION_CURRENCIES, ThresholdEngine, parse_money
+
+RISK_TIERS = np.array(["LOW", "MEDIUM", "HIGH", "CRITICAL"])
+# Upper bounds of LOW, MEDIUM and HIGH, as in the risk agent's prompt
+TIER_BOUNDARIES = np.array([25.0, 50.0, 75.0])
+COLUMNS = ("amount", "region", "type", "customer_type")
+
+FINAL_TIER_PATTERN = re.compile(
+    r"(?:classification|risk level|risk rating|overall risk)\W{0,10}(LOW|MEDIUM|HIGH|CRITICAL)\b", re.IGNORECASE
+)
+TIER_PATTERN = re.compile(r"\b(LOW|MEDIUM|HIGH|CRITICAL)\b")
+
+
+def to_columns(transactions: Sequence[Dict]) -> Dict[str, np.ndarray]:
+    """Columnar view of transaction dicts: one array per field in COLUMNS"""
+    columns = {
+        field: np.array([str(t.get(field) or "") for t in transactions], dtype=object)
+        for field in ("region", "type", "customer_type")
+    }
+    columns["amount"] = np.array([t.get("amount") for t in transactions], dtype=object)
+    return columns
+
+
+def narrative_tier(text: str) -> Optional[str]:
+    """Tier named in the agent's final classification, else the last tier it mentions"""
+    match = FINAL_TIER_PATTERN.search(text or "")
+    if match:
+        return match.group(1).upper()
+    tiers = TIER_PATTERN.findall(text or "")
+    return tiers[-1] if tiers else None
+
+
+def _factorize(values) -> Tuple[List[str], np.ndarray]:
+    """Distinct values of a column and, per row, the index of its value"""
+    values = np.asarray(values, dtype=object)
+    if len(values) == 0:
+        return [], np.empty(0, dtype=int)
+    uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+    return list(uniques), inverse
+
+
+def _map(column: Tuple[List[str], np.ndarray], func: Callable, dtype=float) -> np.ndarray:
+    """Apply `func` once per distinct value of a factorized column and broadcast back"""
+    uniques, inverse = column
+    return np.array([func(value) for value in uniques], dtype=dtype)[inverse]
+
+
+def _keyword_weight(weights: Dict[str, float]) -> Callable[[str], float]:
+    keywords = {keyword.lower(): weight for keyword, weight in weights.items()}
+
+    def weight(value: str) -> float:
+        value = value.lower()
+        return max((w for keyword, w in keywords.items() if keyword in value), default=0.0)
+    return weight
+
+
+class RiskScorer:
+    """
+    Scores a whole batch of transactions at once.
+
+    Each risk factor (amount size, region, transaction type, customer type,
+    thresholds exceeded or just missed) adds points from Config; the
+    threshold masks are computed per table entry across the batch rather
+    than per transaction. Categorical columns are factorized once, so
+    keyword and region lookups run per distinct value, not per row.
+    """
+
+    def __init__(self, threshold_engine: ThresholdEngine):
+        self.threshold_engine = threshold_engine
+        self.type_weight = _keyword_weight(Config.RISK_TYPE_WEIGHTS)
+        self.customer_weight = _keyword_weight(Config.RISK_CUSTOMER_WEIGHTS)
+
+    @staticmethod
+    def _region_weight(jurisdiction: str) -> float:
+        if not jurisdiction:
+            return 0.0
+        return Config.RISK_REGION_WEIGHTS.get(jurisdiction, Config.RISK_UNLISTED_REGION_WEIGHT)
+
+    def _amounts_usd(self, amounts: np.ndarray, region_currencies: np.ndarray) -> np.ndarray:
+        """Amounts in USD (NaN where unparseable or in an unknown currency); bare amounts
+        are read in the region's currency"""
+        if amounts.dtype.kind in "iuf":
+            values = amounts.astype(float)
+            currencies = region_currencies
+        else:
+            parsed = [parse_money(value) for value in amounts]
+            values = np.array([money[0] if money else np.nan for money in parsed], dtype=float)
+            named = np.array([(money[1] or "") if money else "" for money in parsed], dtype=object)
+            currencies = np.where(named == "", region_currencies, named)
+        rates = _map(_factorize(currencies), lambda c: self.threshold_engine.fx_rates.get(c, np.nan))
+        return values * rates
+
+    def _threshold_masks(self, amounts_usd: np.ndarray, types, jurisdictions):
+        """(exceeds any applicable threshold, just below one without exceeding any), from
+        factorized type and jurisdiction columns"""
+        exceeds = np.zeros(len(amounts_usd), dtype=bool)
+        just_below = np.zeros(len(amounts_usd), dtype=bool)
+        engine = self.threshold_engine
+        for threshold in engine.thresholds:
+            rate = engine.fx_rates.get(threshold["currency"])
+            if not rate:
+                continue
+            keywords = threshold["applies_to"]
+            applies = _map(
+                types, lambda t: not t or not keywords or any(k in t.lower() for k in keywords), dtype=bool
+            ) & _map(
+                jurisdictions, lambda j: not j or threshold["jurisdiction"] in (j, *UNIVERSAL_JURISDICTIONS), dtype=bool
+            )
+            values = amounts_usd / rate
+            limit = threshold["amount"]
+            over = (values >= limit) if threshold["inclusive"] else (values > limit)
+            exceeds |= applies & over
+            just_below |= applies & ~over & (values >= limit * (1 - engine.structuring_band))
+        return exceeds, just_below & ~exceeds
+
+    def score(self, columns: Dict[str, Sequence]) -> Dict[str, np.ndarray]:
+        """
+        Risk scores for a columnar batch (see COLUMNS).
+
+        Returns arrays of `score` (0-100), `tier`, `amount_usd`, the threshold
+        masks `exceeds_threshold` / `structuring`, and `borderline`: scores
+        within RISK_BORDERLINE_MARGIN of a tier boundary or without a usable amount.
+        """
+        amounts = np.asarray(columns["amount"])
+        size = len(amounts)
+        regions = _factorize(columns.get("region", [""] * size))
+        # Aliases ("USA", "us") share a jurisdiction; the lookups below don't need them merged
+        jurisdictions = ([normalize_jurisdiction(region) or "" for region in regions[0]], regions[1])
+        types = _factorize(columns.get("type", [""] * size))
+        customers = _factorize(columns.get("customer_type", [""] * size))
+
+        amounts_usd = self._amounts_usd(
+            amounts, _map(jurisdictions, lambda j: REGION_CURRENCIES.get(j, "USD"), dtype=object)
+        )
+        unscored = np.isnan(amounts_usd)
+        exceeds, structuring = self._threshold_masks(amounts_usd, types, jurisdictions)
+        bands, points = Config.RISK_AMOUNT_BANDS_USD
+
+        scores = (
+            np.where(unscored, 0.0, np.interp(np.nan_to_num(amounts_usd), bands, points))
+            + _map(jurisdictions, self._region_weight)
+            + _map(types, self.type_weight)
+            + _map(customers, self.customer_weight)
+            + exceeds * Config.RISK_THRESHOLD_EXCEEDED_WEIGHT
+            + structuring * Config.RISK_STRUCTURING_WEIGHT
+        )
+        scores = np.clip(scores, 0, 100)
+        distance = np.abs(scores[:, None] - TIER_BOUNDARIES).min(axis=1) if size else np.empty(0)
+        return {
+            "score": scores,
+            "tier": RISK_TIERS[np.searchsorted(TIER_BOUNDARIES, scores, side="left")],
+            "amount_usd": amounts_usd,
+            "exceeds_threshold": exceeds,
+            "structuring": structuring,
+            "borderline": unscored | (distance <= Config.RISK_BORDERLINE_MARGIN),
+        }
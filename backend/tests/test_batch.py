@@ -0,0 +1,199 @@
+import asyncio
+import io
+import tempfile
+from contextlib import contextmanager
+from batch import BatchScreener, detect_format, extracted_thresholds, group_key, group_transactions, parse_transactions
+from jobs import BatchJobStore
+from risk_scoring import RiskScorer
+from threshold_engine import DEFAULT_THRESHOLDS, ThresholdEngine
+
+
+def test_detect_format():
+    assert detect_format("tx.csv") == "csv"
+    assert detect_format("TX.CSV") == "csv"
+    assert detect_format("upload", "text/csv; charset=utf-8") == "csv"
+    assert detect_format("tx.jsonl") == "jsonl"
+    assert detect_format(None) == "jsonl"
+
+
+def test_parse_jsonl_reports_bad_lines():
+    text = '{"id": 1, "amount": 100}\n\nnot json\n[1, 2]\n{"id": 2}\n'
+    records = list(parse_transactions(text, "jsonl"))
+    assert records[0] == {"id": 1, "amount": 100}
+    assert records[1]["_error"].startswith("line 3:")
+    assert records[2] == {"_error": "line 4: not a JSON object"}
+    assert records[3] == {"id": 2}
+
+
+def test_parse_csv_strips_values():
+    text = "id, amount ,region\n1, $15000 , US \n2,,EU\n"
+    assert list(parse_transactions(text, "csv")) == [
+        {"id": "1", "amount": "$15000", "region": "US"},
+        {"id": "2", "amount": "", "region": "EU"},
+    ]
+
+
+def test_parse_from_a_spooled_upload():
+    upload = tempfile.SpooledTemporaryFile(max_size=16)
+    upload.write('\ufeffid,amount,note\n1,$15000,"multi\nline"\n2,$200,\n'.encode("utf-8"))
+    upload.seek(0)
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    assert list(parse_transactions(text, "csv")) == [
+        {"id": "1", "amount": "$15000", "note": "multi\nline"},
+        {"id": "2", "amount": "$200", "note": ""},
+    ]
+
+
+def test_parse_is_lazy():
+    lines = iter(['{"id": 1}\n', '{"id": 2}\n'])
+    records = parse_transactions(lines, "jsonl")
+    assert next(records) == {"id": 1}
+    assert next(lines) == '{"id": 2}\n'
+
+
+def test_group_transactions():
+    batch = group_transactions(iter([
+        {"id": 1, "type": "cash", "region": "US"},
+        {"_error": "line 2: bad"},
+        {"id": 3, "type": "Cash", "region": "usa"},
+        {"id": 4, "type": "wire", "region": "EU"},
+    ]))
+    assert batch["count"] == 4
+    assert batch["invalid"] == [(1, {"_error": "line 2: bad"})]
+    assert {key: [index for index, _ in members] for key, members in batch["groups"].items()} == {
+        ("cash", "US", ""): [0, 2],
+        ("wire", "EU", ""): [3],
+    }
+
+
+def test_group_transactions_stops_past_the_limit():
+    consumed = []
+
+    def transactions():
+        for i in range(100):
+            consumed.append(i)
+            yield {"id": i}
+
+    batch = group_transactions(transactions(), max_transactions=5)
+    assert batch["count"] == 6
+    assert len(consumed) == 6
+    assert group_transactions(iter([{"id": 1}]), max_transactions=1)["count"] == 1
+
+
+def test_group_key_normalizes_fields():
+    assert group_key({"type": " Cash Deposit ", "region": "usa", "customer_type": "Business"}) == (
+        "cash deposit", "US", "business"
+    )
+    assert group_key({}) == ("general", "", "")
+
+
+def test_extracted_thresholds():
+    structured = {"thresholds": [
+        "- **CTR**: cash over $10,000 must be reported\n- Travel rule: $3,000 or more",
+        "1. Duplicate CTR mention: $10,000",
+        "EUR 15,000 is not a USD amount",
+    ]}
+    assert extracted_thresholds(structured) == [
+        {"regulation": "Travel rule: $3,000 or more", "threshold": 3000.0},
+        {"regulation": "CTR: cash over $10,000 must be reported", "threshold": 10000.0},
+    ]
+
+
+def test_extracted_thresholds_without_findings():
+    assert extracted_thresholds({}) == []
+    assert extracted_thresholds({"thresholds": ["$0 and no amounts"]}) == []
+
+
+class FakeVectorStore:
+    @contextmanager
+    def scoped_filter(self, where):
+        yield
+
+
+class FakeRetriever:
+    vector_store = FakeVectorStore()
+
+    async def aretrieve_relevant_context(self, query, transaction):
+        if transaction["type"] == "broken":
+            raise RuntimeError("retrieval failed")
+        return {"context": "", "chunk_ids": [], "document_count": 0,
+                "retrieval_mode": "fast_path", "relevant_documents": []}
+
+
+class FakePolicyExtractor:
+    async def aextract_policies(self, context, query, chunk_ids=None):
+        return {"extraction_mode": "knowledge_base", "extracted_policies": "",
+                "structured_data": {"thresholds": ["CTR: $10,000"]}}
+
+
+class FakeRiskClassifier:
+    def __init__(self):
+        self.threshold_engine = ThresholdEngine(DEFAULT_THRESHOLDS, {"USD": 1.0, "EUR": 1.08, "GBP": 1.27})
+        self.scorer = RiskScorer(self.threshold_engine)
+        self.scored_batches = []
+        self.classified = []
+
+    def screen_thresholds(self, transaction):
+        return self.threshold_engine.screen(transaction)
+
+    def score_batch(self, columns):
+        self.scored_batches.append(len(columns["amount"]))
+        return self.scorer.score(columns)
+
+    async def aclassify_risk(self, context, policies, transaction):
+        self.classified.append(transaction["id"])
+        return {"risk_assessment": "Overall risk: CRITICAL", "risk_factors": []}
+
+
+def screen(transactions, classifier, tmp_path):
+    screener = BatchScreener(FakeRetriever(), FakePolicyExtractor(), classifier,
+                             BatchJobStore(str(tmp_path / "jobs.sqlite")))
+
+    async def collect():
+        return [record async for record in screener.screen_batch(group_transactions(iter(transactions)))]
+    return asyncio.run(collect())
+
+
+def test_screen_batch_scores_whole_batch_once(tmp_path):
+    classifier = FakeRiskClassifier()
+    records = screen([
+        {"id": "a", "amount": "$15,000", "type": "cash", "region": "US"},
+        {"id": "b", "amount": "$500", "type": "wire", "region": "EU"},
+        {"id": "c", "amount": "$20,000", "type": "broken", "region": "US"},
+        {"_error": "line 4: bad"},
+    ], classifier, tmp_path)
+    assert classifier.scored_batches == [3]
+    by_id = {r["id"]: r for r in records if r["kind"] == "transaction" and "id" in r}
+    assert by_id["a"]["status"] == "flagged"
+    assert by_id["b"]["status"] == "clear"
+    # Retrieval failed for this group, but the transaction still has a tier
+    assert by_id["c"]["status"] == "error"
+    assert by_id["c"]["risk_tier"] in ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+    summary = records[-1]
+    assert summary["kind"] == "summary"
+    assert summary["failed_groups"] == 1
+    assert sum(summary["risk_tiers"].values()) == 3
+
+
+class SlowRiskClassifier(FakeRiskClassifier):
+    async def aclassify_risk(self, context, policies, transaction):
+        await asyncio.sleep(0.05)
+        return await super().aclassify_risk(context, policies, transaction)
+
+
+def test_screen_batch_streams_other_groups_during_escalation(tmp_path):
+    classifier = SlowRiskClassifier()
+    records = screen([
+        {"id": "a", "amount": 9500, "type": "cash", "region": "US", "customer_type": "business"},
+        {"id": "b", "amount": "$500", "type": "wire", "region": "EU"},
+    ], classifier, tmp_path)
+    assert classifier.classified == ["a"]
+    transactions = [r["id"] for r in records if r["kind"] == "transaction"]
+    # The borderline record waits for the agent; the other group doesn't
+    assert transactions == ["b", "a"]
+    escalated = next(r for r in records if r.get("id") == "a")
+    assert escalated["risk_source"] == "agent"
+    assert escalated["risk_tier"] == "CRITICAL"
+    summary = records[-1]
+    assert summary["agent_classified"] == 1
+    assert summary["risk_tiers"]["CRITICAL"] == 1
@@ -0,0 +1,72 @@
+import pytest
+from langchain_core.documents import Document
+from bm25_index import BM25Index, tokenize
+
+
+def doc(chunk_id, text, **metadata):
+    return Document(page_content=text, metadata={"chunk_id": chunk_id, **metadata}, id=chunk_id)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.sqlite"))
+    index.add([
+        doc("ctr", "Banks must file a CTR for cash over $10,000 under 31 CFR 1010.311.", jurisdiction="US"),
+        doc("travel", "The travel rule applies to transfers of 3,000.00 or more.", jurisdiction="US"),
+        doc("amld", "Customer due diligence applies to occasional transactions of EUR 15,000.", jurisdiction="EU"),
+    ])
+    return index
+
+
+def test_tokenize_keeps_citations_and_normalizes_amounts():
+    assert "1010.311" in tokenize("31 CFR 1010.311")
+    assert tokenize("$10,000") == ["10000"]
+    assert tokenize("10000.00") == ["10000"]
+    assert tokenize("the amount of a transfer") == ["amount", "transfer"]
+
+
+def test_search_matches_exact_citation(index):
+    results = index.search("1010.311")
+    assert [d.id for d, _ in results] == ["ctr"]
+
+
+def test_search_matches_amounts_however_formatted(index):
+    assert [d.id for d, _ in index.search("10000")] == ["ctr"]
+    assert [d.id for d, _ in index.search("$3,000")] == ["travel"]
+
+
+def test_search_ranks_by_score(index):
+    results = index.search("cash transactions CTR", k=3)
+    assert results[0][0].id == "ctr"
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_applies_metadata_filter(index):
+    results = index.search("applies", k=5, where={"jurisdiction": {"$in": ["EU"]}})
+    assert [d.id for d, _ in results] == ["amld"]
+
+
+def test_search_without_known_terms(index):
+    assert index.search("the of and") == []
+    assert index.search("cryptocurrency") == []
+
+
+def test_add_is_idempotent_and_delete_removes(index):
+    assert len(index) == 3
+    assert index.add([doc("ctr", "Banks must file a CTR")]) == 0
+    index.delete(["ctr"])
+    assert len(index) == 2
+    assert index.search("1010.311") == []
+
+
+def test_update_metadata(index):
+    index.update_metadata("amld", {"chunk_id": "amld", "jurisdiction": "UK"})
+    assert index.search("diligence", where={"jurisdiction": {"$in": ["EU"]}}) == []
+    assert [d.id for d, _ in index.search("diligence", where={"jurisdiction": {"$in": ["UK"]}})] == ["amld"]
+
+
+def test_index_persists(tmp_path, index):
+    reopened = BM25Index(str(tmp_path / "bm25.sqlite"))
+    assert len(reopened) == 3
+    assert [d.id for d, _ in reopened.search("1010.311")] == ["ctr"]
@@ -0,0 +1,72 @@
+from context_packing import CHUNK_SEPARATOR, count_tokens, fit_sections, truncate_to_tokens
+
+CHUNKS = [
+    "The first chunk has one sentence.",
+    "The second chunk starts here. It has a second sentence. And a third one.",
+    "The third chunk is never reached.",
+]
+TEXT = CHUNK_SEPARATOR.join(CHUNKS)
+
+
+def test_count_tokens_sums_lists():
+    assert count_tokens(["abcd efgh", "ijkl"]) == count_tokens("abcd efgh") + count_tokens("ijkl")
+    assert count_tokens([]) == 0
+
+
+def test_truncate_returns_text_within_budget_unchanged():
+    assert truncate_to_tokens(TEXT, count_tokens(TEXT)) == TEXT
+
+
+def test_truncate_empty_budget():
+    assert truncate_to_tokens(TEXT, 0) == ""
+    assert truncate_to_tokens("", 10) == ""
+
+
+def test_truncate_keeps_whole_chunks():
+    budget = count_tokens(CHUNKS[0] + CHUNK_SEPARATOR + CHUNKS[1])
+    assert truncate_to_tokens(TEXT, budget) == CHUNKS[0] + CHUNK_SEPARATOR + CHUNKS[1]
+
+
+def test_truncate_cuts_overflowing_chunk_at_a_sentence():
+    kept = CHUNKS[0] + CHUNK_SEPARATOR + "The second chunk starts here. It has a second sentence."
+    result = truncate_to_tokens(TEXT, count_tokens(kept))
+    assert result == kept
+    assert count_tokens(result) <= count_tokens(kept)
+
+
+def test_truncate_hard_cuts_a_single_long_sentence():
+    text = "word " * 200
+    result = truncate_to_tokens(text, 10)
+    assert result
+    assert text.startswith(result)
+    assert count_tokens(result) <= 10
+
+
+def test_fit_sections_within_budget_unchanged():
+    sections = {"a": "short text.", "b": "another short text."}
+    assert fit_sections(sections, {"a": 0.5, "b": 0.5}, budget=1000) == sections
+
+
+def test_fit_sections_gives_unused_share_to_longer_sections():
+    short = "Brief."
+    long = " ".join(f"Sentence number {i}." for i in range(200))
+    budget = count_tokens(long) // 2
+    fitted = fit_sections({"short": short, "long": long}, {"short": 0.5, "long": 0.5}, budget)
+    assert fitted["short"] == short
+    # More than its half share: the short section's unused tokens move over
+    assert count_tokens(fitted["long"]) > budget // 2
+    assert count_tokens(fitted["short"]) + count_tokens(fitted["long"]) <= budget
+    assert long.startswith(fitted["long"])
+
+
+def test_fit_sections_splits_by_share():
+    text = " ".join(f"Sentence number {i}." for i in range(200))
+    budget = count_tokens(text)
+    fitted = fit_sections({"a": text, "b": text}, {"a": 0.75, "b": 0.25}, budget)
+    assert count_tokens(fitted["a"]) > count_tokens(fitted["b"])
+    assert count_tokens(fitted["a"]) + count_tokens(fitted["b"]) <= budget
+
+
+def test_fit_sections_empty_section():
+    fitted = fit_sections({"a": "", "b": "Some text."}, {"a": 0.9, "b": 0.1}, budget=1000)
+    assert fitted == {"a": "", "b": "Some text."}
@@ -0,0 +1,58 @@
+import pytest
+from document_registry import DocumentRegistry, chunk_id, file_fingerprint
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return DocumentRegistry(str(tmp_path / "registry.sqlite"))
+
+
+def test_chunk_id_is_content_hash():
+    assert chunk_id("text") == chunk_id("text")
+    assert chunk_id("text") != chunk_id("text ")
+
+
+def test_file_fingerprint(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"x" * 3000)
+    original = file_fingerprint(str(path))
+    # Block size only changes how the file is read, not the digest
+    assert file_fingerprint(str(path), block_size=7) == original
+    path.write_bytes(b"x" * 2999 + b"y")
+    assert file_fingerprint(str(path)) != original
+
+
+def test_first_version_has_no_orphans(registry):
+    assert registry.fingerprint("a.pdf") is None
+    assert registry.replace("a.pdf", "v1", ["c1", "c2"]) == set()
+    assert registry.fingerprint("a.pdf") == "v1"
+    assert registry.chunk_ids("a.pdf") == {"c1", "c2"}
+
+
+def test_new_version_orphans_dropped_chunks(registry):
+    registry.replace("a.pdf", "v1", ["c1", "c2", "c3"])
+    assert registry.replace("a.pdf", "v2", ["c2", "c3", "c4"]) == {"c1"}
+    assert registry.chunk_ids("a.pdf") == {"c2", "c3", "c4"}
+    assert registry.fingerprint("a.pdf") == "v2"
+
+
+def test_chunks_shared_with_another_document_are_not_orphaned(registry):
+    registry.replace("a.pdf", "v1", ["shared", "a-only"])
+    registry.replace("b.pdf", "v1", ["shared", "b-only"])
+    assert registry.replace("a.pdf", "v2", []) == {"a-only"}
+    assert registry.replace("b.pdf", "v2", []) == {"shared", "b-only"}
+
+
+def test_registry_persists(tmp_path, registry):
+    registry.replace("a.pdf", "v1", ["c1"])
+    reopened = DocumentRegistry(str(tmp_path / "registry.sqlite"))
+    assert reopened.fingerprint("a.pdf") == "v1"
+    assert reopened.chunk_ids("a.pdf") == {"c1"}
+
+
+def test_migration_marker_persists(tmp_path, registry):
+    assert not registry.migration_done("legacy_chunk_tags")
+    registry.mark_migration_done("legacy_chunk_tags")
+    assert registry.migration_done("legacy_chunk_tags")
+    assert DocumentRegistry(str(tmp_path / "registry.sqlite")).migration_done("legacy_chunk_tags")
+    assert not registry.migration_done("other")
@@ -0,0 +1,51 @@
+import pytest
+from document_tags import detect_tags, jurisdiction_filter, metadata_matches, normalize_jurisdiction
+
+
+@pytest.mark.parametrize("region, expected", [
+    ("US", "US"),
+    ("usa", "US"),
+    ("U.S.", "US"),
+    ("United States of America", "US"),
+    ("New York", "US"),
+    ("Austin, Texas", "US"),
+    ("Washington, D.C.", "US"),
+    ("Germany", "EU"),
+    ("Berlin, Germany", "EU"),
+    ("european union", "EU"),
+    ("Scotland", "UK"),
+    ("Global", "INTL"),
+    ("Japan", "JAPAN"),
+    ("", None),
+    (None, None),
+])
+def test_normalize_jurisdiction(region, expected):
+    assert normalize_jurisdiction(region) == expected
+
+
+def test_jurisdiction_filter_maps_countries_to_their_bloc():
+    assert jurisdiction_filter("Germany") == {"jurisdiction": {"$in": ["EU", "INTL", "GENERAL"]}}
+    assert jurisdiction_filter("New York") == {"jurisdiction": {"$in": ["US", "INTL", "GENERAL"]}}
+    assert jurisdiction_filter("INTL") == {"jurisdiction": {"$in": ["INTL", "GENERAL"]}}
+
+
+def test_jurisdiction_filter_skips_unrecognized_regions():
+    assert jurisdiction_filter("Japan") is None
+    assert jurisdiction_filter(None) is None
+
+
+def test_detect_tags():
+    assert detect_tags("FinCEN guidance under the Bank Secrecy Act on AML programs") == {
+        "jurisdiction": "US", "regulation_family": "AML",
+    }
+    assert detect_tags("Nothing relevant here") == {"jurisdiction": "GENERAL", "regulation_family": "GENERAL"}
+
+
+def test_metadata_matches():
+    metadata = {"jurisdiction": "EU", "page": 3}
+    assert metadata_matches(metadata, None)
+    assert metadata_matches(metadata, jurisdiction_filter("France"))
+    assert not metadata_matches(metadata, jurisdiction_filter("US"))
+    assert metadata_matches(metadata, {"$and": [{"jurisdiction": "EU"}, {"page": {"$gte": 2}}]})
+    assert not metadata_matches(metadata, {"$or": [{"jurisdiction": "US"}, {"page": {"$lt": 2}}]})
+    assert not metadata_matches(metadata, {"missing": {"$gt": 0}})
@@ -0,0 +1,52 @@
+from embedding_cache import CachedQueryEmbeddings
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.query_calls = []
+        self.document_calls = []
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return [float(len(text))]
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_query_embeddings_cached_after_normalizing():
+    client = FakeEmbeddings()
+    embeddings = CachedQueryEmbeddings(client, max_entries=10)
+    first = embeddings.embed_query("cash  reporting")
+    assert embeddings.embed_query(" cash reporting ") == first
+    assert client.query_calls == ["cash reporting"]
+    assert embeddings.stats()["hits"] == 1
+
+
+def test_embed_queries_batches_misses():
+    client = FakeEmbeddings()
+    embeddings = CachedQueryEmbeddings(client, max_entries=10)
+    embeddings.embed_query("a")
+    vectors = embeddings.embed_queries(["a", "bb", "ccc", "bb"])
+    assert vectors == [[1.0], [2.0], [3.0], [2.0]]
+    assert client.document_calls == [["bb", "ccc"]]
+    assert embeddings.stats()["embedding_calls"] == 2
+
+
+def test_query_embeddings_lru_eviction():
+    client = FakeEmbeddings()
+    embeddings = CachedQueryEmbeddings(client, max_entries=2)
+    for text in ["a", "b", "c"]:
+        embeddings.embed_query(text)
+    embeddings.embed_query("a")
+    assert client.query_calls == ["a", "b", "c", "a"]
+
+
+def test_document_embeddings_bypass_cache():
+    client = FakeEmbeddings()
+    embeddings = CachedQueryEmbeddings(client)
+    embeddings.embed_documents(["a"])
+    embeddings.embed_documents(["a"])
+    assert client.document_calls == [["a"], ["a"]]
+    assert embeddings.stats()["entries"] == 0
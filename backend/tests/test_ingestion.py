@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.documents import Document
+from ingestion import EmbeddingPipeline, batched
+
+
+class FakeCollection:
+    def __init__(self, existing=()):
+        self.rows = {doc_id: None for doc_id in existing}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.rows.update(zip(ids, documents))
+
+    def get(self, ids, include):
+        return {"ids": [doc_id for doc_id in ids if doc_id in self.rows]}
+
+
+class FakeStore:
+    def __init__(self, collection):
+        self._collection = collection
+
+
+class FakeEmbeddings:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    def embed_documents(self, texts):
+        if self.fail_on in texts:
+            raise RuntimeError("embedding failed")
+        return [[float(len(text))] for text in texts]
+
+
+def chunks(*names):
+    return [Document(page_content=name, id=name) for name in names]
+
+
+def test_batched():
+    assert [len(batch) for batch in batched(chunks(*"abcde"), 2)] == [2, 2, 1]
+
+
+def test_on_stored_receives_written_and_existing_chunks():
+    collection = FakeCollection(existing=["b"])
+    pipeline = EmbeddingPipeline(FakeEmbeddings(), FakeStore(collection), batch_size=2, concurrency=1)
+    stored = []
+    result = pipeline.run(chunks("a", "b", "c"), skip_existing=True,
+                          on_stored=lambda batch: stored.extend(doc.id for doc in batch))
+    assert result["ids"] == ["a", "b", "c"]
+    assert sorted(stored) == ["a", "b", "c"]
+    assert result["stats"]["chunks"] == 2
+    assert result["stats"]["chunks_skipped"] == 1
+
+
+def test_on_stored_skips_batches_that_failed_to_embed():
+    collection = FakeCollection()
+    pipeline = EmbeddingPipeline(FakeEmbeddings(fail_on="c"), FakeStore(collection), batch_size=2, concurrency=1)
+    stored = []
+    with pytest.raises(RuntimeError):
+        pipeline.run(chunks("a", "b", "c", "d"), on_stored=lambda batch: stored.extend(doc.id for doc in batch))
+    assert stored == ["a", "b"]
+    assert set(collection.rows) == {"a", "b"}
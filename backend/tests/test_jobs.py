@@ -0,0 +1,52 @@
+import os
+import time
+import pytest
+from jobs import BatchJobStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "batch_jobs.sqlite")
+
+
+def test_batch_job_lifecycle(path, tmp_path):
+    store = BatchJobStore(path)
+    job = store.create("b1", str(tmp_path / "b1.jsonl"), 3)
+    assert job["status"] == "running"
+    assert job["transactions"] == 3
+    assert job["summary"] is None
+    store.finish("b1", "completed", summary={"kind": "summary", "transactions": 3})
+    assert store.get("b1")["summary"] == {"kind": "summary", "transactions": 3}
+    store.finish("b1", "failed", error="boom")
+    assert store.get("b1")["error"] == "boom"
+    assert store.get("missing") is None
+
+
+def test_batch_jobs_survive_restart(path, tmp_path):
+    store = BatchJobStore(path)
+    store.create("done", str(tmp_path / "done.jsonl"), 1)
+    store.finish("done", "completed", summary={})
+    store.create("running", str(tmp_path / "running.jsonl"), 1)
+
+    reopened = BatchJobStore(path)
+    assert reopened.get("done")["status"] == "completed"
+    interrupted = reopened.get("running")
+    assert interrupted["status"] == "failed"
+    assert "restart" in interrupted["error"]
+
+
+def test_prune_removes_expired_jobs_and_outputs(path, tmp_path):
+    store = BatchJobStore(path, retention_seconds=60)
+    old_output = tmp_path / "old.jsonl"
+    old_output.write_text("{}\n")
+    store.create("old", str(old_output), 1)
+    store.finish("old", "completed")
+    store.create("running", str(tmp_path / "running.jsonl"), 1)
+    store._conn.execute("UPDATE batch_jobs SET updated_at = ?", (time.time() - 120,))
+    store._conn.commit()
+
+    store.create("new", str(tmp_path / "new.jsonl"), 1)
+    assert store.get("old") is None
+    assert not os.path.exists(old_output)
+    assert store.get("running") is not None
+    assert store.get("new") is not None
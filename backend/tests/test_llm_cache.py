@@ -0,0 +1,59 @@
+import sqlite3
+
+from langchain_core.outputs import Generation
+
+from llm_cache import SQLiteLLMCache
+
+
+class FakeEmbeddings:
+    """Every prompt embeds to the same vector, so only the filters decide a hit"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def cache(tmp_path, **kwargs):
+    return SQLiteLLMCache(str(tmp_path / "llm.sqlite"), embeddings=FakeEmbeddings(),
+                          similarity_threshold=0.9, **kwargs)
+
+
+def test_exact_hit(tmp_path):
+    llm_cache = cache(tmp_path)
+    llm_cache.update("CTR threshold", "gpt", [Generation(text="$10,000")])
+    assert llm_cache.lookup("CTR threshold", "gpt")[0].text == "$10,000"
+    assert llm_cache.lookup("CTR threshold", "other-model") is None
+    assert llm_cache.stats()["hits"] == 1
+
+
+def test_semantic_hit_needs_the_same_numbers(tmp_path):
+    llm_cache = cache(tmp_path)
+    llm_cache.update("Is a $15,000 cash deposit reportable?", "gpt", [Generation(text="yes")])
+    assert llm_cache.lookup("Is a 15000 cash deposit reportable", "gpt")[0].text == "yes"
+    assert llm_cache.lookup("Is a $5,000 cash deposit reportable?", "gpt") is None
+    stats = llm_cache.stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_semantic_lookup_bounded_to_recent_candidates(tmp_path):
+    llm_cache = cache(tmp_path, semantic_candidates=1)
+    llm_cache.update("first prompt", "gpt", [Generation(text="first")])
+    llm_cache.update("second prompt", "gpt", [Generation(text="second")])
+    # Only the most recently used entry is compared
+    assert llm_cache.lookup("another prompt", "gpt")[0].text == "second"
+
+
+def test_entries_without_numbers_column_are_migrated(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE llm_cache (
+            key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, response TEXT NOT NULL,
+            embedding BLOB, created_at REAL NOT NULL, last_access REAL NOT NULL
+        )
+    """)
+    conn.commit()
+    conn.close()
+    llm_cache = SQLiteLLMCache(path, embeddings=FakeEmbeddings(), similarity_threshold=0.9)
+    llm_cache.update("CTR threshold", "gpt", [Generation(text="$10,000")])
+    assert llm_cache.lookup("CTR reporting threshold", "gpt")[0].text == "$10,000"
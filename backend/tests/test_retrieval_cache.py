@@ -0,0 +1,47 @@
+from retrieval_cache import RetrievalCache
+
+
+def test_retrieval_cache_hit_and_normalized_key():
+    cache = RetrievalCache(max_entries=10)
+    cache.put(cache.key("cash  reporting ", 5), ["doc"])
+    assert cache.get(cache.key("cash reporting", 5)) == ["doc"]
+    assert cache.get(cache.key("cash reporting", 3)) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_retrieval_cache_version_bump_invalidates():
+    cache = RetrievalCache(max_entries=10)
+    old_key = cache.key("cash", 5)
+    cache.put(old_key, ["doc"])
+    cache.bump_version()
+    assert cache.get(old_key) is None
+    assert cache.get(cache.key("cash", 5)) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["index_version"] == 1
+
+
+def test_retrieval_cache_ignores_results_for_an_old_version():
+    cache = RetrievalCache(max_entries=10)
+    key = cache.key("cash", 5)
+    # A search that started before an ingest finishes after it
+    cache.bump_version()
+    cache.put(key, ["stale"])
+    assert cache.stats()["entries"] == 0
+
+
+def test_retrieval_cache_lru_eviction():
+    cache = RetrievalCache(max_entries=2)
+    a, b, c = (cache.key(q, 5) for q in "abc")
+    cache.put(a, [1])
+    cache.put(b, [2])
+    cache.get(a)
+    cache.put(c, [3])
+    assert cache.get(a) == [1]
+    assert cache.get(b) is None
+    assert cache.get(c) == [3]
+
+
+def test_retrieval_cache_disabled():
+    cache = RetrievalCache(max_entries=0)
+    cache.put(cache.key("cash", 5), ["doc"])
+    assert cache.get(cache.key("cash", 5)) is None
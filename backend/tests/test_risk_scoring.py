@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from risk_scoring import RiskScorer, narrative_tier, to_columns
+from threshold_engine import DEFAULT_THRESHOLDS, ThresholdEngine
+
+
+@pytest.fixture
+def scorer():
+    return RiskScorer(ThresholdEngine(DEFAULT_THRESHOLDS, {"USD": 1.0, "EUR": 1.08, "GBP": 1.27}))
+
+
+def score(scorer, transactions):
+    return scorer.score(to_columns(transactions))
+
+
+def test_to_columns():
+    columns = to_columns([{"amount": 100, "region": "US"}, {"type": "wire"}])
+    assert list(columns["amount"]) == [100, None]
+    assert list(columns["region"]) == ["US", ""]
+    assert list(columns["type"]) == ["", "wire"]
+
+
+def test_narrative_tier():
+    assert narrative_tier("Some HIGH factors, but overall risk: LOW") == "LOW"
+    assert narrative_tier("Starts LOW, ends CRITICAL") == "CRITICAL"
+    assert narrative_tier("") is None
+
+
+def test_scores_and_tiers(scorer):
+    result = score(scorer, [
+        {"amount": "$15,000", "region": "US", "type": "cash deposit"},
+        {"amount": 9500, "region": "US", "type": "cash deposit", "customer_type": "business"},
+        {"amount": "EUR 500k", "region": "INTL", "type": "crypto transfer", "customer_type": "pep"},
+    ])
+    assert result["score"] == pytest.approx([45.56, 74.72, 100.0], abs=0.01)
+    assert list(result["tier"]) == ["MEDIUM", "HIGH", "CRITICAL"]
+    assert list(result["exceeds_threshold"]) == [True, False, True]
+    assert list(result["structuring"]) == [False, True, False]
+    assert list(result["borderline"]) == [False, True, False]
+    assert result["amount_usd"][2] == pytest.approx(540000)
+
+
+def test_bare_amount_read_in_region_currency(scorer):
+    result = score(scorer, [{"amount": 10000, "region": "EU"}, {"amount": 10000, "region": "US"}])
+    assert result["amount_usd"] == pytest.approx([10800, 10000])
+
+
+def test_unparseable_amount_is_borderline(scorer):
+    result = score(scorer, [{"amount": "n/a", "region": "US", "type": "wire"}])
+    assert np.isnan(result["amount_usd"][0])
+    assert bool(result["borderline"][0])
+    assert not result["exceeds_threshold"][0]
+
+
+def test_matches_row_by_row_scoring(scorer):
+    transactions = [
+        {"amount": amount, "region": region, "type": kind}
+        for amount in ("$500", "$9,200", "$12,000", "GBP 20,000")
+        for region in ("US", "EU", "UK", "")
+        for kind in ("cash", "wire transfer", "")
+    ]
+    batch = score(scorer, transactions)
+    single = [score(scorer, [t])["score"][0] for t in transactions]
+    assert batch["score"] == pytest.approx(single)
+
+
+def test_tier_boundary_goes_to_lower_tier(scorer, monkeypatch):
+    from config import Config
+    monkeypatch.setattr(Config, "RISK_REGION_WEIGHTS", {"US": 25.0})
+    monkeypatch.setattr(Config, "RISK_UNLISTED_REGION_WEIGHT", 0.0)
+    monkeypatch.setattr(Config, "RISK_AMOUNT_BANDS_USD", ([0, 1], [0, 0]))
+    result = score(RiskScorer(scorer.threshold_engine), [{"amount": 1, "region": "US"}])
+    assert result["score"][0] == 25.0
+    assert result["tier"][0] == "LOW"
+
+
+def test_empty_batch(scorer):
+    result = score(scorer, [])
+    assert len(result["score"]) == 0
+    assert len(result["tier"]) == 0
@@ -0,0 +1,121 @@
+import pytest
+from threshold_engine import DEFAULT_THRESHOLDS, ThresholdEngine, format_money, parse_money
+
+FX_RATES = {"USD": 1.0, "EUR": 1.08, "GBP": 1.27}
+
+
+@pytest.fixture
+def engine():
+    return ThresholdEngine(DEFAULT_THRESHOLDS, FX_RATES)
+
+
+@pytest.mark.parametrize("text, expected", [
+    (50000, (50000.0, None)),
+    ("$50,000", (50000.0, "USD")),
+    ("12,500.00 USD", (12500.0, "USD")),
+    ("EUR 2.5k", (2500.0, "EUR")),
+    ("USD10,000", (10000.0, "USD")),
+    ("$1.2 million", (1200000.0, "USD")),
+    ("€15,000 or more", (15000.0, "EUR")),
+    ("15000", (15000.0, None)),
+    ("10,000 per transaction", (10000.0, None)),
+])
+def test_parse_money_amounts(text, expected):
+    assert parse_money(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Citation numbers before the amount are not the amount
+    ("31 CFR 1010.311: $10,000", (10000.0, "USD")),
+    ("Section 5313 requires reports over $10,000", (10000.0, "USD")),
+    ("Section 5313 requires reports over 10,000", (10000.0, None)),
+    ("Directive (EU) 2015/849 sets 15,000 EUR", (15000.0, "EUR")),
+    ("UK MLR 2017 occasional transaction threshold of 15000", (15000.0, None)),
+    # A quantity elsewhere in the text doesn't hide the amount
+    ("report within 15 days for $10,000", (10000.0, "USD")),
+    ("file within 30 calendar days if over 5,000", (5000.0, None)),
+])
+def test_parse_money_prefers_amounts_over_citations_and_quantities(text, expected):
+    assert parse_money(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    None, True, "n/a", "No threshold", "3 business days", "25%", "5 months",
+    "FATF Recommendation 16", "31 CFR 1010.311",
+])
+def test_parse_money_rejects_non_amounts(text):
+    assert parse_money(text) is None
+
+
+def test_format_money():
+    assert format_money(10000, "USD") == "$10,000.00"
+    assert format_money(15000, None) == "$15,000.00"
+    assert format_money(15000, "EUR") == "EUR 15,000.00"
+
+
+def test_convert(engine):
+    assert engine.convert(100, "USD", "USD") == 100
+    assert engine.convert(100, "EUR", "USD") == pytest.approx(108)
+    assert engine.convert(108, "USD", "EUR") == pytest.approx(100)
+    assert engine.convert(100, "JPY", "USD") is None
+
+
+def test_status_inclusive_and_structuring_band(engine):
+    assert engine.status(10000, 10000, inclusive=True) == "exceeds"
+    assert engine.status(10000, 10000, inclusive=False) == "just_below"
+    assert engine.status(9000, 10000) == "just_below"
+    assert engine.status(8999, 10000) is None
+
+
+def test_screen_cash_deposit_over_ctr(engine):
+    flags = engine.screen({"amount": "$15,000", "type": "cash deposit", "region": "US"})
+    assert [(f["regulation"], f["status"]) for f in flags] == [
+        ("BSA Currency Transaction Report (31 CFR 1010.311)", "exceeds"),
+    ]
+    assert flags[0]["action"] == "File CTR"
+
+
+def test_screen_ctr_is_exclusive(engine):
+    flags = engine.screen({"amount": 10000, "type": "cash", "region": "US"})
+    assert [f["status"] for f in flags] == ["just_below"]
+    assert flags[0]["action"] == "Review for structuring"
+
+
+def test_screen_respects_jurisdiction(engine):
+    flags = engine.screen({"amount": 20000, "type": "cash", "region": "EU"})
+    assert {f["jurisdiction"] for f in flags} == {"EU"}
+
+
+def test_screen_bare_amount_uses_region_currency(engine):
+    # 14,000 EUR is over 15,000 EUR's structuring band, not the threshold
+    flags = engine.screen({"amount": 14000, "type": "card", "region": "EU"})
+    assert [(f["currency"], f["status"]) for f in flags] == [("EUR", "just_below")]
+
+
+def test_screen_unparseable_amount(engine):
+    assert engine.screen({"amount": "n/a", "type": "cash", "region": "US"}) == []
+
+
+def test_check_ignores_citation_numbers_in_threshold_text(engine):
+    result = engine.check("$9,500", "31 CFR 1010.311: $10,000", "BSA Currency Transaction Report")
+    assert result["threshold"] == 10000
+    assert result["status"] == "just_below"
+
+
+def test_check_uses_matching_table_entry(engine):
+    result = engine.check("$10,000", "$10,000", "Currency Transaction Report (CTR)")
+    assert result["status"] == "just_below"
+    result = engine.check("$10,001", "$10,000", "Currency Transaction Report (CTR)")
+    assert result["status"] == "exceeds"
+    assert result["action"] == "File CTR"
+
+
+def test_check_converts_currencies(engine):
+    result = engine.check("$20,000", "EUR 15,000", "AMLD CDD")
+    assert result["currency"] == "EUR"
+    assert result["amount"] == pytest.approx(18518.52)
+    assert result["status"] == "exceeds"
+
+
+def test_check_falls_back_when_unparseable(engine):
+    assert engine.check("$9,500", "3 business days") is None
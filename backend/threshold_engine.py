@@ -0,0 +1,265 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import re
+import threading
+from config import Config
+from document_tags import UNIVERSAL_JURISDICTIONS, normalize_jurisdiction
+
+# Amounts within this fraction below a threshold are flagged for structuring
+STRUCTURING_BAND = 0.1
+
+# Structured reporting thresholds, per regulation and jurisdiction.
+# `applies_to` are transaction-type keywords (empty: every type); `inclusive`
+# is whether an amount equal to the threshold triggers it ("or more" vs "more than").
+DEFAULT_THRESHOLDS = [
+    {"regulation": "BSA Currency Transaction Report (31 CFR 1010.311)", "jurisdiction": "US",
+     "amount": 10000, "currency": "USD", "applies_to": ["cash", "deposit", "withdrawal"],
+     "action": "File CTR", "inclusive": False},
+    {"regulation": "BSA Funds Transfer Recordkeeping (31 CFR 1010.410)", "jurisdiction": "US",
+     "amount": 3000, "currency": "USD", "applies_to": ["wire", "transfer"],
+     "action": "Record originator/beneficiary information", "inclusive": True},
+    {"regulation": "FATF Recommendation 16 (Travel Rule)", "jurisdiction": "INTL",
+     "amount": 1000, "currency": "USD", "applies_to": ["wire", "transfer", "crypto"],
+     "action": "Include originator/beneficiary information", "inclusive": True},
+    {"regulation": "EU Transfer of Funds Regulation (EU) 2015/847", "jurisdiction": "EU",
+     "amount": 1000, "currency": "EUR", "applies_to": ["wire", "transfer"],
+     "action": "Verify payer and payee information", "inclusive": False},
+    {"regulation": "EU AMLD occasional transaction CDD (Directive (EU) 2015/849)", "jurisdiction": "EU",
+     "amount": 15000, "currency": "EUR", "applies_to": [],
+     "action": "Apply customer due diligence", "inclusive": True},
+    {"regulation": "UK MLR 2017 occasional transaction CDD", "jurisdiction": "UK",
+     "amount": 15000, "currency": "EUR", "applies_to": [],
+     "action": "Apply customer due diligence", "inclusive": True},
+]
+
+# Currency assumed for a bare amount ("15000") in a known region
+REGION_CURRENCIES = {"US": "USD", "EU": "EUR", "UK": "GBP"}
+
+CURRENCY_ALIASES = {
+    "$": "USD", "us$": "USD", "usd": "USD", "dollar": "USD", "dollars": "USD",
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP", "pound": "GBP", "pounds": "GBP",
+}
+MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mm": 1e6, "mn": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+}
+MONEY_PATTERN = re.compile(
+    r"(?P<pre>US\$|[$€£]|\b(?:USD|EUR|GBP)(?:\b|(?=\d)))?\s*"
+    r"(?P<number>\d[\d,]*(?:\.\d+)?)\s*"
+    r"(?P<unit>thousand|million|billion|bn|mm|mn|k|m|b)?\b\s*"
+    r"(?P<post>USD|EUR|GBP|dollars?|euros?|pounds?)?",
+    re.IGNORECASE
+)
+# A bare number followed by one of these is a quantity, not money ("3 business days", "25%")
+NON_MONEY_UNITS = re.compile(
+    r"\s*(?:%|(?:business|calendar|working|banking|consecutive|separate)?\s*"
+    r"(?:percent|minutes?|hours?|days?|weeks?|months?|years?|transactions?|times)\b)",
+    re.IGNORECASE
+)
+# Bare numbers that are part of a citation or identifier ("31 CFR 1010.311",
+# "Section 5313", "Directive (EU) 2015/849", "R16")
+CITATION_BEFORE = re.compile(
+    r"(?:(?:\bCFR|\bU\.?S\.?C\.?|§|\bsections?|\bsec\.|\barticles?|\bart\.|\brecommendations?|\brec\.|"
+    r"\bdirective|\bregulations?|\brules?|\bparts?|\bparagraphs?|\bpara\.|\bno\.|\bchapters?|\btitles?)\s*\(?|"
+    r"[A-Za-z/.])$",
+    re.IGNORECASE
+)
+CITATION_AFTER = re.compile(r"\s*(?:CFR\b|U\.?S\.?C\b|/)", re.IGNORECASE)
+# The year of a named act ("UK MLR 2017", "Bank Secrecy Act 1970")
+YEAR = re.compile(r"(?:19|20)\d\d")
+YEAR_BEFORE = re.compile(r"(?:\b[A-Z]{2,}|\bActs?|\bRegulations?)\s*$")
+
+
+def _is_bare_quantity(text: str, match: re.Match) -> bool:
+    """Whether a match without a currency is a citation number or a non-money quantity"""
+    before = text[:match.start("number")]
+    after = text[match.end("number"):]
+    if YEAR.fullmatch(match.group("number")) and YEAR_BEFORE.search(before):
+        return True
+    return bool(CITATION_BEFORE.search(before) or CITATION_AFTER.match(after) or NON_MONEY_UNITS.match(after))
+
+
+def parse_money(value) -> Optional[Tuple[float, Optional[str]]]:
+    """
+    (amount, currency) from 50000, "$50,000", "12,500.00 USD", "EUR 2.5k" or
+    "$1.2 million"; currency is None when the text names none.
+
+    In longer text the first amount with a currency wins ("31 CFR 1010.311:
+    $10,000" is $10,000); otherwise the first bare number that isn't part of
+    a citation or a quantity like "3 business days". Returns None when there
+    is no such amount.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value), None
+    text = str(value)
+    bare = None
+    for match in MONEY_PATTERN.finditer(text):
+        marker = match.group("pre") or match.group("post")
+        currency = CURRENCY_ALIASES.get(marker.lower()) if marker else None
+        if currency is None and (bare is not None or _is_bare_quantity(text, match)):
+            continue
+        amount = float(match.group("number").replace(",", ""))
+        unit = (match.group("unit") or "").lower()
+        if currency is not None:
+            return amount * MULTIPLIERS.get(unit, 1.0), currency
+        bare = (amount * MULTIPLIERS.get(unit, 1.0), None)
+    return bare
+
+
+def format_money(amount: float, currency: Optional[str]) -> str:
+    if currency in (None, "USD"):
+        return f"${amount:,.2f}"
+    return f"{currency} {amount:,.2f}"
+
+
+class ThresholdEngine:
+    """
+    Evaluates transaction amounts against a table of structured thresholds.
+
+    The table is compiled once (currencies and jurisdictions normalized,
+    type keywords lower-cased), so screening a transaction is a loop of
+    float comparisons. Amounts in another currency are converted with
+    FX_RATES_TO_USD; a bare amount is taken in the region's currency.
+    """
+
+    def __init__(self, thresholds: List[Dict], fx_rates: Dict[str, float], structuring_band: float = STRUCTURING_BAND):
+        self.fx_rates = {currency.upper(): rate for currency, rate in fx_rates.items()}
+        self.structuring_band = structuring_band
+        self.thresholds = [
+            {
+                **threshold,
+                "currency": threshold.get("currency", "USD").upper(),
+                "jurisdiction": normalize_jurisdiction(threshold.get("jurisdiction")) or "INTL",
+                "applies_to": tuple(keyword.lower() for keyword in threshold.get("applies_to", [])),
+                "inclusive": threshold.get("inclusive", True),
+            }
+            for threshold in thresholds
+        ]
+
+    def _to_usd(self, amount: float, currency: str) -> Optional[float]:
+        rate = self.fx_rates.get(currency.upper())
+        return amount * rate if rate is not None else None
+
+    def convert(self, amount: float, currency: str, target: str) -> Optional[float]:
+        """`amount` in `currency` expressed in `target`, or None for an unknown currency"""
+        if currency == target:
+            return amount
+        usd = self._to_usd(amount, currency)
+        rate = self.fx_rates.get(target.upper())
+        if usd is None or not rate:
+            return None
+        return usd / rate
+
+    def status(self, amount: float, limit: float, inclusive: bool = True) -> Optional[str]:
+        """"exceeds", "just_below" (within the structuring band) or None"""
+        if amount > limit or (inclusive and amount == limit):
+            return "exceeds"
+        if amount >= limit * (1 - self.structuring_band):
+            return "just_below"
+        return None
+
+    def applicable(self, transaction_type: str = "", region: Optional[str] = None) -> List[Dict]:
+        """Thresholds for a transaction type in a region (INTL/GENERAL ones apply everywhere;
+        without a region, every jurisdiction's thresholds apply)"""
+        tx_type = (transaction_type or "").lower()
+        jurisdiction = normalize_jurisdiction(region)
+        return [
+            threshold for threshold in self.thresholds
+            if (not tx_type or not threshold["applies_to"] or any(k in tx_type for k in threshold["applies_to"]))
+            and (not jurisdiction or threshold["jurisdiction"] in (jurisdiction, *UNIVERSAL_JURISDICTIONS))
+        ]
+
+    def screen(self, transaction_data: Dict) -> List[Dict]:
+        """Threshold flags for one transaction: every applicable threshold it meets or falls just below"""
+        money = parse_money(transaction_data.get("amount"))
+        if money is None:
+            return []
+        amount, currency = money
+        region = transaction_data.get("region")
+        currency = currency or REGION_CURRENCIES.get(normalize_jurisdiction(region) or "")
+
+        flags = []
+        for threshold in self.applicable(str(transaction_data.get("type", "")), region):
+            # A bare amount outside a known region is read in the threshold's currency
+            value = self.convert(amount, currency or threshold["currency"], threshold["currency"])
+            if value is None:
+                continue
+            status = self.status(value, threshold["amount"], threshold["inclusive"])
+            if status is None:
+                continue
+            flags.append({
+                "regulation": threshold["regulation"],
+                "jurisdiction": threshold["jurisdiction"],
+                "threshold": threshold["amount"],
+                "currency": threshold["currency"],
+                "amount": round(value, 2),
+                "status": status,
+                "action": threshold["action"] if status == "exceeds" else "Review for structuring",
+            })
+        return flags
+
+    def _matching_threshold(self, regulation: str, limit: float, currency: str) -> Optional[Dict]:
+        """Table entry with the same amount whose name shares a word with `regulation`"""
+        words = set(re.findall(r"[a-z0-9.]{3,}", regulation.lower()))
+        for threshold in self.thresholds:
+            if threshold["currency"] == currency and threshold["amount"] == limit:
+                if words & set(re.findall(r"[a-z0-9.]{3,}", threshold["regulation"].lower())):
+                    return threshold
+        return None
+
+    def check(self, amount_text: str, threshold_text: str, regulation: str = "") -> Optional[Dict]:
+        """
+        Compare a free-text amount with a free-text threshold.
+
+        Returns None when either side can't be parsed as money, so the caller
+        can fall back to the LLM. A side without a currency takes the other's.
+        """
+        amount_money = parse_money(amount_text)
+        limit_money = parse_money(threshold_text)
+        if amount_money is None or limit_money is None:
+            return None
+        amount, amount_currency = amount_money
+        limit, limit_currency = limit_money
+        currency = limit_currency or amount_currency or "USD"
+        value = self.convert(amount, amount_currency or currency, currency)
+        if value is None:
+            return None
+
+        known = self._matching_threshold(regulation, limit, currency)
+        inclusive = known["inclusive"] if known else True
+        status = self.status(value, limit, inclusive)
+        return {
+            "regulation": regulation,
+            "amount": round(value, 2),
+            "threshold": limit,
+            "currency": currency,
+            "status": status or "below",
+            "action": known["action"] if known and status == "exceeds" else None,
+        }
+
+
+def load_thresholds(path: Optional[str]) -> List[Dict]:
+    """Default table, with entries from a JSON file added (or replaced by regulation name)"""
+    thresholds = {threshold["regulation"]: threshold for threshold in DEFAULT_THRESHOLDS}
+    if path:
+        with open(path) as f:
+            for threshold in json.load(f):
+                thresholds[threshold["regulation"]] = threshold
+    return list(thresholds.values())
+
+
+_engine: Optional[ThresholdEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_threshold_engine() -> ThresholdEngine:
+    """Shared threshold engine built from the default table and THRESHOLD_TABLE_PATH"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ThresholdEngine(load_thresholds(Config.THRESHOLD_TABLE_PATH), Config.FX_RATES_TO_USD)
+        return _engine
@@ -1,18 +1,42 @@
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
 from config import Config
+from clients import get_client_registry
+from ingestion import EmbeddingPipeline
+from document_registry import DocumentRegistry, chunk_id, file_fingerprint
+from embedding_cache import CachedQueryEmbeddings
+from retrieval_cache import RetrievalCache
+from bm25_index import BM25Index
+from document_tags import detect_tags
+from instrumentation import timed
+from knowledge_base import KnowledgeBase, KnowledgeExtractor
+from model_router import get_model_router
+from contextlib import contextmanager
+from contextvars import ContextVar
+import asyncio
+import json
 import os
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional
 from langchain_core.documents import Document
 
+# Metadata filter applied to searches that don't pass one explicitly; set per
+# request by the supervisor so every agent's searches stay in the jurisdiction
+_default_filter: ContextVar[Optional[Dict]] = ContextVar("default_search_filter", default=None)
+
+TAG_FIELDS = ("jurisdiction", "regulation_family")
+LEGACY_TAGS_MIGRATION = "legacy_chunk_tags"
+
 class VectorStoreManager:
     def __init__(self):
         # Use environment variable for API key (recommended for newer langchain-openai)
-        # Ensure OPENAI_API_KEY is set in environment
-        self.embeddings = OpenAIEmbeddings(
-            model=Config.EMBEDDING_MODEL
+        # Ensure OPENAI_API_KEY is set in environment. The client shares the
+        # registry's connection pool and rate-limit tracking with the agents.
+        self.embeddings = get_client_registry().embeddings(Config.EMBEDDING_MODEL)
+        # Searches embed their query through an LRU cache; ingestion uses the raw client
+        self.query_embeddings = CachedQueryEmbeddings(
+            self.embeddings,
+            max_entries=Config.QUERY_EMBEDDING_CACHE_SIZE
         )
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
@@ -21,7 +45,79 @@ class VectorStoreManager:
         )
         self.vector_store = None
         self._initialize_vector_store()
+        self.ingestion = EmbeddingPipeline(
+            self.embeddings,
+            self.vector_store,
+            batch_size=Config.EMBEDDING_BATCH_SIZE,
+            concurrency=Config.EMBEDDING_CONCURRENCY,
+            max_retries=Config.EMBEDDING_MAX_RETRIES,
+            backoff_seconds=Config.EMBEDDING_BACKOFF_SECONDS,
+        )
+        self.registry = DocumentRegistry(Config.DOCUMENT_REGISTRY_PATH)
+        # Search results keyed on (query, k, index version); ingest bumps the version
+        self.retrieval_cache = RetrievalCache(max_entries=Config.RETRIEVAL_CACHE_SIZE)
+        # Lexical index for exact tokens (section numbers, amounts) that embeddings blur
+        self.bm25 = BM25Index(Config.BM25_INDEX_PATH)
+        # Regulations, thresholds and citations extracted once per stored chunk, in the background
+        self.knowledge_base = None
+        self.knowledge_extractor = None
+        if Config.KNOWLEDGE_BASE_ENABLED:
+            self.knowledge_base = KnowledgeBase(Config.KNOWLEDGE_BASE_PATH)
+            self.knowledge_extractor = KnowledgeExtractor(
+                self.knowledge_base,
+                get_model_router().tool_llm("extract_knowledge", temperature=0.0),
+                self._load_chunks,
+                concurrency=Config.KNOWLEDGE_EXTRACTION_CONCURRENCY,
+                max_attempts=Config.KNOWLEDGE_EXTRACTION_MAX_ATTEMPTS,
+            )
+        self._tag_legacy_chunks()
+        self._backfill_lexical_index()
+
+    def _tag_legacy_chunks(self, page_size: int = 500):
+        """Add jurisdiction/regulation tags to chunks ingested before tagging existed
+
+        Runs once: new chunks are tagged at ingest, so after a full pass the
+        registry records the migration and later startups skip the scan.
+        """
+        if self.registry.migration_done(LEGACY_TAGS_MIGRATION):
+            return
+        collection = self.vector_store._collection
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            ids, metadatas = [], []
+            for doc_id, content, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                metadata = metadata or {}
+                if all(metadata.get(field) for field in TAG_FIELDS):
+                    continue
+                tags = detect_tags(content or "")
+                metadata = dict(metadata, **{field: metadata.get(field) or tags[field] for field in TAG_FIELDS})
+                ids.append(doc_id)
+                metadatas.append(metadata)
+                self.bm25.update_metadata(doc_id, metadata)
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+            offset += len(page["ids"])
+        self.registry.mark_migration_done(LEGACY_TAGS_MIGRATION)
     
+    def _backfill_lexical_index(self, page_size: int = 500):
+        """Index chunks stored in Chroma before the lexical index existed"""
+        if len(self.bm25):
+            return
+        collection = self.vector_store._collection
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            self.bm25.add(
+                Document(page_content=content or "", metadata=metadata or {}, id=doc_id)
+                for doc_id, content, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+            )
+            offset += len(page["ids"])
+
     def _initialize_vector_store(self):
         """Initialize or load existing vector store"""
         # Ensure directory exists
@@ -30,30 +126,125 @@ class VectorStoreManager:
         # Initialize Chroma vector store
         self.vector_store = Chroma(
             persist_directory=Config.CHROMA_PERSIST_DIRECTORY,
-            embedding_function=self.embeddings
+            embedding_function=self.query_embeddings
         )
     
-    def ingest_pdf(self, file_path: str, metadata: dict = None) -> List[str]:
-        """Ingest a PDF file into the vector store"""
-        try:
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
-            
+    def _split_pages(self, file_path: str, metadata: dict, pages: Dict) -> Iterator[Document]:
+        """Lazily load PDF pages and split each one as it arrives
+
+        Chunks get content-hash IDs; repeated chunk text within the document
+        is only emitted once. Every chunk is tagged with the document's
+        jurisdiction and regulation family: supplied values win, the rest
+        are detected from the filename and first page.
+        """
+        loader = PyPDFLoader(file_path)
+        seen = set()
+        tags = None
+        for page in loader.lazy_load():
+            pages["parsed"] += 1
+            if tags is None:
+                detected = detect_tags(f"{(metadata or {}).get('filename', '')}\n{page.page_content}")
+                tags = {field: (metadata or {}).get(field) or detected[field] for field in TAG_FIELDS}
             if metadata:
-                for doc in documents:
-                    doc.metadata.update(metadata)
-            
-            texts = self.text_splitter.split_documents(documents)
-            
-            # add_documents returns a list of IDs
-            ids = self.vector_store.add_documents(texts)
-            
-            # Handle case where add_documents might return None
-            if ids is None:
-                # Generate IDs based on document count
-                ids = [f"doc_{i}" for i in range(len(texts))]
-            
-            return ids if isinstance(ids, list) else []
+                page.metadata.update(metadata)
+            page.metadata.update(tags)
+            for chunk in self.text_splitter.split_documents([page]):
+                cid = chunk_id(chunk.page_content)
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                chunk.id = cid
+                chunk.metadata["chunk_id"] = cid
+                yield chunk
+
+    def _load_chunks(self, ids: List[str]) -> List[Document]:
+        """Stored chunks by ID (missing IDs are left out)"""
+        page = self.vector_store._collection.get(ids=ids, include=["documents", "metadatas"])
+        return [
+            Document(page_content=content or "", metadata=metadata or {}, id=doc_id)
+            for doc_id, content, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+        ]
+
+    def _unextracted_chunk_ids(self, page_size: int = 500) -> Iterator[str]:
+        """Stored chunk IDs, when some chunks have no knowledge base row (failed, or
+        ingested before the knowledge base existed); nothing when every chunk has one"""
+        collection = self.vector_store._collection
+        if self.knowledge_base.stats()["kb_chunks"] >= collection.count():
+            return
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=[])
+            if not page["ids"]:
+                break
+            yield from page["ids"]
+            offset += len(page["ids"])
+
+    def start_knowledge_extraction(self):
+        """Start background extraction, backfilling chunks that have no knowledge base row"""
+        if self.knowledge_extractor is not None:
+            self.knowledge_extractor.start(backfill=self._unextracted_chunk_ids)
+
+    def stop_knowledge_extraction(self):
+        if self.knowledge_extractor is not None:
+            self.knowledge_extractor.stop()
+
+    @timed("ingest", "ingest_pdf")
+    def ingest_pdf(self, file_path: str, metadata: dict = None,
+                   on_progress: Optional[Callable[[Dict], None]] = None) -> List[str]:
+        """Ingest a PDF file into the vector store
+
+        Pages are loaded lazily and split as they arrive, and the chunks are
+        embedded and persisted in rolling batches by the ingestion pipeline,
+        so memory use is bounded by the batch size rather than the document
+        size. `on_progress` receives a progress dict (pages parsed, chunks
+        embedded) after each stored batch and the run statistics at the end.
+
+        Each batch is added to the BM25 index once it is stored in Chroma, so
+        a failed embedding batch never leaves chunks that only the lexical
+        index can find. Once the chunks are stored, they are scheduled for
+        background extraction of their regulations, thresholds and citations
+        into the knowledge base.
+
+        Ingestion is idempotent: chunk IDs are content hashes, an unchanged
+        document (same file fingerprint) is skipped entirely, chunks already
+        in the store are not embedded again, and a new version of a document
+        only deletes the chunks that no longer appear in it.
+        """
+        try:
+            doc_key = (metadata or {}).get("filename") or os.path.basename(file_path)
+            fingerprint = file_fingerprint(file_path)
+            if self.registry.fingerprint(doc_key) == fingerprint:
+                ids = sorted(self.registry.chunk_ids(doc_key))
+                if self.knowledge_extractor is not None:
+                    # Retries chunks whose extraction failed last time
+                    self.knowledge_extractor.schedule(ids)
+                if on_progress:
+                    on_progress({"status": "unchanged", "chunks_total": len(ids), "chunks_embedded": 0})
+                return ids
+
+            pages = {"parsed": 0}
+
+            def report(progress: Dict):
+                if on_progress:
+                    on_progress(dict(progress, pages_parsed=pages["parsed"]))
+
+            result = self.ingestion.run(
+                self._split_pages(file_path, metadata, pages),
+                on_progress=report,
+                skip_existing=True,
+                on_stored=self.bm25.add
+            )
+            stale = self.registry.replace(doc_key, fingerprint, result["ids"])
+            if stale:
+                self.vector_store._collection.delete(ids=list(stale))
+                self.bm25.delete(stale)
+                if self.knowledge_base is not None:
+                    self.knowledge_base.delete(stale)
+            if stale or result["stats"]["chunks"]:
+                self.retrieval_cache.bump_version()
+            if self.knowledge_extractor is not None:
+                self.knowledge_extractor.schedule(result["ids"])
+            return result["ids"]
         except Exception as e:
             error_msg = str(e)
             # Check for OpenAI quota/billing errors
@@ -64,11 +255,158 @@ class VectorStoreManager:
                 )
             raise Exception(f"Error ingesting PDF {file_path}: {error_msg}")
     
-    def search(self, query: str, k: int = 5) -> List[Document]:
+    def knowledge_stats(self) -> Dict:
+        if self.knowledge_base is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.knowledge_base.stats(), "extraction": self.knowledge_extractor.stats()}
+
+    def ingestion_stats(self) -> Dict:
+        """Cumulative embedding throughput across ingestions"""
+        return self.ingestion.metrics.snapshot()
+
+    @staticmethod
+    @contextmanager
+    def scoped_filter(where: Optional[Dict]):
+        """Apply `where` to every search in this context that doesn't pass its own filter"""
+        token = _default_filter.set(where or None)
+        try:
+            yield
+        finally:
+            _default_filter.reset(token)
+
+    @staticmethod
+    def _resolve_filter(filter: Optional[Dict]) -> Optional[Dict]:
+        """Explicit filter, else the scoped default; an explicit {} means unfiltered"""
+        if filter is None:
+            filter = _default_filter.get()
+        return filter or None
+
+    def search(self, query: str, k: int = 5, filter: Optional[Dict] = None) -> List[Document]:
         """Search for relevant documents"""
-        return self.vector_store.similarity_search(query, k=k)
+        return [doc for doc, _ in self.search_with_score(query, k=k, filter=filter)]
     
-    def search_with_score(self, query: str, k: int = 5):
+    def search_with_score(self, query: str, k: int = 5, filter: Optional[Dict] = None):
         """Search with similarity scores"""
-        return self.vector_store.similarity_search_with_score(query, k=k)
+        return self.search_many_with_score([query], k=k, filter=filter)[0]
+
+    async def asearch(self, query: str, k: int = 5, filter: Optional[Dict] = None) -> List[Document]:
+        """Async variant of search"""
+        return await asyncio.to_thread(self.search, query, k, filter)
+
+    async def asearch_with_score(self, query: str, k: int = 5, filter: Optional[Dict] = None):
+        """Async variant of search_with_score"""
+        return await asyncio.to_thread(self.search_with_score, query, k, filter)
+
+    @timed("search", "vector")
+    def search_many_with_score(self, queries: List[str], k: int = 5,
+                               filter: Optional[Dict] = None) -> List[List[tuple]]:
+        """Search several queries at once.
+
+        Results are served from the retrieval cache when the index hasn't
+        changed since they were computed; for the rest, query embedding
+        misses are embedded in one batched call and all lookups go to Chroma
+        in a single query. Returns one list of (Document, distance) per
+        query, in order.
+
+        `filter` is a Chroma `where` clause on chunk metadata (e.g.
+        {"jurisdiction": {"$in": ["EU", "INTL", "GENERAL"]}}) evaluated
+        inside Chroma. Queries the filter leaves without any hit fall back
+        to an unfiltered search.
+        """
+        if not queries:
+            return []
+        where = self._resolve_filter(filter)
+        filter_key = json.dumps(where, sort_keys=True) if where else ""
+        keys = {query: self.retrieval_cache.key(query, k, filter_key) for query in dict.fromkeys(queries)}
+        by_query = {}
+        for query, key in keys.items():
+            cached = self.retrieval_cache.get(key)
+            if cached is not None:
+                by_query[query] = cached
+        misses = [query for query in keys if query not in by_query]
+
+        if misses:
+            vectors = self.query_embeddings.embed_queries(misses)
+            results = self.vector_store._collection.query(
+                query_embeddings=vectors,
+                n_results=k,
+                include=["documents", "metadatas", "distances"],
+                **({"where": where} if where else {})
+            )
+            for i, query in enumerate(misses):
+                by_query[query] = [
+                    (Document(page_content=content, metadata=metadata or {}, id=doc_id), distance)
+                    for doc_id, content, metadata, distance in zip(
+                        results["ids"][i],
+                        results["documents"][i],
+                        results["metadatas"][i],
+                        results["distances"][i]
+                    )
+                ]
+
+            empty = [query for query in misses if not by_query[query]]
+            if where and empty:
+                for query, fallback in zip(empty, self.search_many_with_score(empty, k=k, filter={})):
+                    by_query[query] = fallback
+            for query in misses:
+                self.retrieval_cache.put(keys[query], by_query[query])
+        return [list(by_query[query]) for query in queries]
+
+    async def asearch_many_with_score(self, queries: List[str], k: int = 5,
+                                      filter: Optional[Dict] = None) -> List[List[tuple]]:
+        """Async variant of search_many_with_score"""
+        return await asyncio.to_thread(self.search_many_with_score, queries, k, filter)
+
+    def search_many(self, queries: List[str], k: int = 5, filter: Optional[Dict] = None) -> List[List[Document]]:
+        """Batched variant of search: one list of documents per query"""
+        return [[doc for doc, _ in results] for results in self.search_many_with_score(queries, k=k, filter=filter)]
+
+    async def asearch_many(self, queries: List[str], k: int = 5,
+                           filter: Optional[Dict] = None) -> List[List[Document]]:
+        """Async variant of search_many"""
+        return await asyncio.to_thread(self.search_many, queries, k, filter)
+
+    @timed("search", "hybrid")
+    def hybrid_search_with_score(self, query: str, k: int = 5, filter: Optional[Dict] = None) -> List[tuple]:
+        """Fuse vector and BM25 rankings with reciprocal-rank fusion
+
+        Each retriever contributes 1 / (rrf_k + rank) for every chunk it
+        ranks among its candidates, so chunks that only match on exact
+        tokens (e.g. "31 CFR 1010.311") still surface next to semantic
+        hits. Returns (Document, fused score) pairs, higher is better.
+        Both retrievers apply the same metadata filter, and either one falls
+        back to an unfiltered search when the filter leaves it without a hit.
+        """
+        where = self._resolve_filter(filter)
+        key = self.retrieval_cache.key(query, k, "hybrid", json.dumps(where, sort_keys=True) if where else "")
+        cached = self.retrieval_cache.get(key)
+        if cached is not None:
+            return cached
+
+        candidates = max(k * Config.HYBRID_CANDIDATE_MULTIPLIER, k)
+        lexical = self.bm25.search(query, k=candidates, where=where)
+        if where and not lexical:
+            lexical = self.bm25.search(query, k=candidates)
+        rankings = [
+            [doc for doc, _ in self.search_many_with_score([query], k=candidates, filter=where or {})[0]],
+            [doc for doc, _ in lexical],
+        ]
+        fused: Dict[str, float] = {}
+        docs: Dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking, start=1):
+                doc_key = doc.id or doc.metadata.get("chunk_id") or doc.page_content
+                docs.setdefault(doc_key, doc)
+                fused[doc_key] = fused.get(doc_key, 0.0) + 1.0 / (Config.HYBRID_RRF_K + rank)
+        top = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        results = [(docs[doc_key], score) for doc_key, score in top]
+        self.retrieval_cache.put(key, results)
+        return results
+
+    def hybrid_search(self, query: str, k: int = 5, filter: Optional[Dict] = None) -> List[Document]:
+        """Hybrid lexical + vector search"""
+        return [doc for doc, _ in self.hybrid_search_with_score(query, k=k, filter=filter)]
 
+    async def ahybrid_search(self, query: str, k: int = 5, filter: Optional[Dict] = None) -> List[Document]:
+        """Async variant of hybrid_search"""
+        return await asyncio.to_thread(self.hybrid_search, query, k, filter)
@@ -33,7 +33,7 @@ export default function DocumentUpload() {
         }
       )
       setUploadedFiles([...uploadedFiles, file.name])
-      toast.success(`Document "${file.name}" uploaded successfully!`)
+      toast.success(`Document "${file.name}" uploaded and queued for ingestion`)
     } catch (error: any) {
       toast.error(error.response?.data?.detail || 'Upload failed')
     } finally {